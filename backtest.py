@@ -0,0 +1,355 @@
+# backtest.py
+import argparse
+import glob
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from config import CONFIGS
+from settings import SYMBOLS, DATA_WINDOW, BASE_TIMEFRAME
+from utils import pivots_batch
+from indicators import rolling_extreme
+from kline_cache import KlineCache, INTERVAL_MS
+from bar_aggregator import config_timeframe, resample
+from fake_exchange import NullNotifier, NullPlotter, kline_message
+
+KLINE_COLUMNS = ['open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore']
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+TRADE_COLUMNS = [
+    'type', 'pivot_idx', 'pivot_price', 'sweep_idx', 'sweep_time', 'sweep_price', 'entry_idx', 'entry_time', 'entry_price',
+    'sl', 'tp', 'size', 'risk_amount', 'manip_low', 'manip_high', 'exit_idx', 'exit_time', 'exit_price', 'reason', 'profit'
+]
+
+def _read_kline_file(path):
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+        if 'open_time' not in df.columns:
+            # Binance veri arşivindeki başlıksız dosyalar
+            df = pd.read_csv(path, header=None)
+            df.columns = KLINE_COLUMNS[:len(df.columns)]
+    return df
+
+def load_klines(*paths):
+    # Bir veya daha fazla CSV/Parquet dosyası (dizin veya glob da olabilir) -> open_time (ms) sıralı DataFrame
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '*.csv')) + glob.glob(os.path.join(path, '*.parquet')))
+        else:
+            files += sorted(glob.glob(path)) or [path]
+    df = pd.concat([_read_kline_file(f) for f in files], ignore_index=True)
+    open_time = df['open_time']
+    if pd.api.types.is_datetime64_any_dtype(open_time):
+        open_time = open_time.astype('datetime64[ms]').astype('int64')
+    else:
+        open_time = open_time.astype('int64')
+        open_time = open_time.where(open_time < 10**14, open_time // 1000)  # Mikrosaniye zaman damgaları
+    df = pd.DataFrame({'open_time': open_time, **{col: df[col].astype('float64') for col in PRICE_COLUMNS}})
+    return df.drop_duplicates('open_time', keep='last').sort_values('open_time').reset_index(drop=True)
+
+def resample_klines(klines, timeframe, end=None):
+    # Taban barlar config zaman dilimine toplanır; canlı BarAggregator gibi yalnızca sondaki yarım bar atılır
+    # end: yalnızca ilk end taban bar kullanılır (start'ın üst zaman dilimindeki karşılığı için)
+    columns = [np.asarray(klines[col])[:end] for col in ['open_time', *PRICE_COLUMNS]]
+    if timeframe == BASE_TIMEFRAME:
+        return dict(zip(['open_time', *PRICE_COLUMNS], columns))
+    *columns, complete = resample(*columns, BASE_TIMEFRAME, timeframe)
+    if len(complete) and not complete[-1]:
+        columns = [values[:-1] for values in columns]
+    return dict(zip(['open_time', *PRICE_COLUMNS], columns))
+
+def _padded_windows(series, idx, width, fill=np.nan):
+    # Satır r: series[idx[r]:idx[r] + width]; seri sonunu aşan hücreler fill ile doldurulur
+    padded = np.concatenate([series, np.full(width, fill)])
+    return sliding_window_view(padded, width)[idx]
+
+def pivot_arrays(pivots):
+    # pivot_high/pivot_low çıktısı [(bar, fiyat), ...] -> (bar dizisi, fiyat dizisi)
+    return np.array([k for k, _ in pivots], dtype='int64'), np.array([p for _, p in pivots], dtype='float64')
+
+def _find_sweeps(series, pivots, start, lo_offset, hi_offset, threshold, is_high):
+    # Her pivot için aktif olduğu bar aralığında ilk sweep barı; sweep olmayan pivot için -1
+    idx, price = pivots
+    if not len(idx):
+        return idx, price, np.zeros(0, dtype='int64')
+    first = np.maximum(idx + lo_offset, start)
+    last = np.minimum(idx + hi_offset, len(series) - 1)
+    width = int(max(1, (last - first + 1).max()))
+    windows = _padded_windows(series, np.clip(first, 0, len(series) - 1), width)
+    p = price[:, None]
+    if is_high:
+        hit = (windows > p) & ((windows - p) / p >= threshold)
+    else:
+        hit = (windows < p) & ((p - windows) / p >= threshold)
+    hit &= np.arange(width)[None, :] < (last - first + 1)[:, None]
+    sweep = np.where(hit.any(axis=1), first + hit.argmax(axis=1), -1)
+    return idx, price, sweep
+
+def _find_entries(bars, pivot_price, sweep_idx, config, is_long):
+    # Sweep sonrası 0..MAX_CANDLES barlık matris üzerinde run_strategy giriş koşulları
+    width = config["MAX_CANDLES"] + 1
+    close = _padded_windows(bars['close'], sweep_idx, width)
+    open_ = _padded_windows(bars['open'], sweep_idx, width)
+    low = _padded_windows(bars['low'], sweep_idx, width)
+    high = _padded_windows(bars['high'], sweep_idx, width)
+    p = pivot_price[:, None]
+    # Manipülasyon bölgesi yalnızca kapanış pivotun yanlış tarafındayken genişler
+    inside = close <= p if is_long else close >= p
+    manip_low = np.minimum(low[:, :1], np.minimum.accumulate(np.where(inside, low, np.inf), axis=1))
+    manip_high = np.maximum(high[:, :1], np.maximum.accumulate(np.where(inside, high, -np.inf), axis=1))
+    back = close > p if is_long else close < p  # Pivotun doğru tarafına dönüş
+    d = np.broadcast_to(np.arange(width), close.shape)
+    # Kapanış pencereleri canlı motordaki göstergelerle aynı tanımlardan (indicators.rolling_extreme) okunur
+    consecutive = config["CONSECUTIVE_CANDLES"]
+    second_min = config["MIN_CANDLES_FOR_SECOND_CONDITION"]
+    second_max = config["MAX_CANDLES_FOR_SECOND_CONDITION"]
+    mode, worst_mode = ('min', 'max') if is_long else ('max', 'min')
+    recent = _padded_windows(rolling_extreme(bars['close'], consecutive, mode), sweep_idx, width)
+    cond1 = (d >= consecutive) & ((recent > p) if is_long else (recent < p))
+    # İkinci koşul penceresi [max(sweep, giriş - MAX), giriş - MIN]: MAX bardan genç sweep'lerde sweep barından birikimli
+    sliding = _padded_windows(rolling_extreme(bars['close'], second_max - second_min + 1, worst_mode, second_min), sweep_idx, width)
+    running = np.maximum.accumulate(close, axis=1) if is_long else np.minimum.accumulate(close, axis=1)
+    since = np.take_along_axis(running, np.clip(d - second_min, 0, width - 1), axis=1)
+    worst = np.where(d > second_max, sliding, since)
+    cond2 = (d >= second_min) & ((worst < p) if is_long else (worst > p)) & back
+    sl = manip_low if is_long else manip_high
+    distance = open_ - sl if is_long else sl - open_
+    entry = (cond1 | cond2) & (distance > 0)
+    has = entry.any(axis=1)
+    rows = np.flatnonzero(has)
+    cols = entry[rows].argmax(axis=1)
+    return rows, sweep_idx[rows] + cols, open_[rows, cols], sl[rows, cols], distance[rows, cols], manip_low[rows, cols], manip_high[rows, cols]
+
+def _sparse_table(series, reduce):
+    # table[j][x] = reduce(series[x:x + 2**j])
+    table = [series]
+    step = 1
+    while 2 * step <= len(series):
+        prev = table[-1]
+        table.append(reduce(prev[:-step], prev[step:]))
+        step *= 2
+    return table
+
+def _first_touch(table, start, level, below):
+    # start'tan itibaren seriye level'a değen (below: <=, değilse >=) ilk konum; yoksa len(series)
+    n = len(table[0])
+    pos = np.asarray(start, dtype='int64').copy()
+    for j in range(len(table) - 1, -1, -1):
+        size = 1 << j
+        fits = pos + size <= n
+        block = table[j][np.minimum(pos, len(table[j]) - 1)]
+        clear = block > level if below else block < level
+        pos = np.where(fits & clear, pos + size, pos)
+    return pos
+
+def exit_tables(klines):
+    # SL/TP aramasında kullanılan low/high tabloları; aynı veri üzerindeki tüm backtestlerde paylaşılabilir
+    return _sparse_table(np.ascontiguousarray(klines['low'], dtype='float64'), np.minimum), \
+        _sparse_table(np.ascontiguousarray(klines['high'], dtype='float64'), np.maximum)
+
+def backtest(klines, config, start=DATA_WINDOW, window=DATA_WINDOW, pivots=None, tables=None, frame=None):
+    # Canlı motorun işlemleri: klines taban barlarıdır, start'tan önceki barlar yalnızca geçmiş olarak kullanılır
+    # Sinyaller config'in TIMEFRAME barlarında (frame: resample_klines() çıktısı) aranır; SL/TP canlıdaki gibi taban barlarında
+    # pivots: frame barlarının (ph, pl) çifti, her biri (bar dizisi, fiyat dizisi); tables: taban barlarının exit_tables() çıktısı
+    # pivot_idx/sweep_idx/entry_idx frame barlarına, exit_idx taban barlarına göredir
+    timeframe = config_timeframe(config)
+    if frame is None:
+        frame = resample_klines(klines, timeframe)
+    if timeframe != BASE_TIMEFRAME:
+        start = len(resample_klines(klines, timeframe, start)['open_time'])  # Geçmişte tamamlanmış üst barlar
+    bars = {col: np.ascontiguousarray(frame[col], dtype='float64') for col in PRICE_COLUMNS}
+    open_time = np.asarray(frame['open_time'], dtype='int64')
+    base_time = np.asarray(klines['open_time'], dtype='int64')
+    left, right = config["LEFT"], config["RIGHT"]
+    if pivots is None:
+        pivots = tuple(pivot_arrays(p) for p in pivots_batch(bars['high'], bars['low'], [(left, right)])[(left, right)])
+    ph, pl = pivots
+    # Pivot k, [k + RIGHT, k + pencere - 1 - LEFT] barlarında run_strategy'nin aktif pivotları arasındadır
+    lo_offset = max(right, 1)
+    hi_offset = window - 1 - left
+    threshold = config["MANIPULATION_THRESHOLD"]
+    ph_idx, ph_price, ph_sweep = _find_sweeps(bars['high'], ph, start, lo_offset, hi_offset, threshold, True)
+    pl_idx, pl_price, pl_sweep = _find_sweeps(bars['low'], pl, start, lo_offset, hi_offset, threshold, False)
+    # used_pivots iki yön için ortak: aynı bar hem PH hem PL ise önce süpürülen (eşitlikte PH) diğerini kapatır
+    common, ph_pos, pl_pos = np.intersect1d(ph_idx, pl_idx, return_indices=True)
+    if len(common):
+        a, b = ph_sweep[ph_pos], pl_sweep[pl_pos]
+        ph_first = (a >= 0) & ((b < 0) | (a <= b))
+        pl_sweep[pl_pos[ph_first]] = -1
+        ph_sweep[ph_pos[(b >= 0) & ~ph_first]] = -1
+    low_table, high_table = tables if tables is not None else exit_tables(klines)
+    risk_amount = config["INITIAL_BALANCE"] * config["MAX_RISK"]
+    rr = config["RISK_REWARD_RATIO"]
+    parts = []
+    for side, (idx, price, sweep) in enumerate(((pl_idx, pl_price, pl_sweep), (ph_idx, ph_price, ph_sweep))):
+        is_long = side == 0
+        swept = np.flatnonzero(sweep >= 0)
+        rows, entry_idx, entry_price, sl, distance, manip_low, manip_high = _find_entries(bars, price[swept], sweep[swept], config, is_long)
+        swept = swept[rows]
+        tp = entry_price + distance * rr if is_long else entry_price - distance * rr
+        # Pozisyon giriş barı kapandıktan sonraki taban barlarında kontrol edilir; aynı barda ikisi de değerse SL önceliklidir
+        exit_from = np.searchsorted(base_time, open_time[entry_idx] + INTERVAL_MS[timeframe])
+        if is_long:
+            sl_hit = _first_touch(low_table, exit_from, sl, True)
+            tp_hit = _first_touch(high_table, exit_from, tp, False)
+        else:
+            sl_hit = _first_touch(high_table, exit_from, sl, False)
+            tp_hit = _first_touch(low_table, exit_from, tp, True)
+        exit_idx = np.minimum(sl_hit, tp_hit)
+        is_sl = sl_hit <= tp_hit
+        closed = exit_idx < len(base_time)
+        sweep_price = bars['low'][sweep[swept]] if is_long else bars['high'][sweep[swept]]
+        parts.append(pd.DataFrame({
+            'type': 'long' if is_long else 'short', 'side': side, 'pivot_idx': idx[swept], 'pivot_price': price[swept],
+            'sweep_idx': sweep[swept], 'sweep_price': sweep_price, 'entry_idx': entry_idx, 'entry_price': entry_price,
+            'sl': sl, 'tp': tp, 'size': risk_amount / distance, 'risk_amount': risk_amount,
+            'manip_low': manip_low, 'manip_high': manip_high,
+            'exit_idx': np.where(closed, exit_idx, -1),
+            'exit_price': np.where(closed, np.where(is_sl, sl, tp), np.nan),
+            'reason': np.where(closed, np.where(is_sl, 'sl', 'tp'), None),
+            'profit': np.where(closed, np.where(is_sl, -risk_amount, risk_amount * rr), np.nan),
+        }))
+    trades = pd.concat(parts, ignore_index=True)
+    # Canlı sıralama: giriş barı, önce long (PL) döngüsü, sweep eklenme sırası, pivot sırası
+    trades = trades.sort_values(['entry_idx', 'side', 'sweep_idx', 'pivot_idx'], kind='stable').reset_index(drop=True)
+    times = pd.to_datetime(open_time, unit='ms')
+    trades['sweep_time'] = times[trades['sweep_idx'].values]
+    trades['entry_time'] = times[trades['entry_idx'].values]
+    base_times = pd.to_datetime(base_time, unit='ms')
+    trades['exit_time'] = pd.Series(base_times[np.maximum(trades['exit_idx'].values, 0)]).where(trades['exit_idx'].values >= 0)
+    return trades[TRADE_COLUMNS]
+
+def backtest_all(klines, configs=CONFIGS, start=DATA_WINDOW, window=DATA_WINDOW):
+    # Barlar zaman dilimi başına bir kez toplanır; aynı zaman dilimindeki aynı (LEFT, RIGHT) pivotları bir kez hesaplanır
+    frames, pivots = {}, {}
+    for timeframe in {config_timeframe(config) for config in configs.values()}:
+        frame = frames[timeframe] = resample_klines(klines, timeframe)
+        pairs = {(config["LEFT"], config["RIGHT"]) for config in configs.values() if config_timeframe(config) == timeframe}
+        for pair, found in pivots_batch(frame['high'], frame['low'], pairs).items():
+            pivots[(timeframe, pair)] = tuple(pivot_arrays(p) for p in found)
+    tables = exit_tables(klines)
+    return {
+        name: backtest(klines, config, start, window, pivots[(config_timeframe(config), (config["LEFT"], config["RIGHT"]))], tables,
+                       frames[config_timeframe(config)])
+        for name, config in configs.items()
+    }
+
+def summarize(trades, initial_balance=0.0):
+    closed = trades[trades['exit_idx'] >= 0].sort_values('exit_idx', kind='stable')
+    equity = initial_balance + closed['profit'].cumsum().values
+    peak = np.maximum.accumulate(np.r_[initial_balance, equity])[1:]
+    tp_count = int((closed['reason'] == 'tp').sum())
+    return {
+        'trades': len(trades),
+        'closed': len(closed),
+        'tp': tp_count,
+        'sl': len(closed) - tp_count,
+        'win_rate': tp_count / len(closed) * 100 if len(closed) else 0.0,
+        'profit': float(closed['profit'].sum()),
+        'max_drawdown': float((peak - equity).max()) if len(closed) else 0.0,
+    }
+
+class _OfflinePriceFeed:
+    def add_listener(self, listener):
+        pass
+
+class _OfflineDataManager:
+    # Parite kontrolünde TradingEngine'in beklediği arayüz; kalıcılık ve ağ yok
+    def __init__(self):
+        self.price_feed = _OfflinePriceFeed()
+        self.bar = None
+        self.closed = []
+
+    def get_current_futures_price(self, symbol):
+        return None
+
+    def record_sweep(self, symbol, config_name, event, side, sweep):
+        pass
+
+    def record_position_opened(self, symbol, config_name, trade):
+        pass
+
+    def close_position(self, symbol, config_name, trade, engine):
+        self.closed.append((config_name, self.bar, trade))
+
+def parity_check(klines, symbol=SYMBOLS[0], history=DATA_WINDOW):
+    # Motorun kline önbelleği geçici dizinde açılır; sentetik/geçmiş barlar canlı önbelleğe yazılmaz
+    with tempfile.TemporaryDirectory(prefix='parity_') as cache_dir:
+        return _parity_check(klines, symbol, history, cache_dir)
+
+def _parity_check(klines, symbol, history, cache_dir):
+    # Aynı barlar TradingEngine'e kapanmış kline mesajları olarak verilir; SL/TP her barın low/high aralığıyla kontrol edilir
+    from engine import TradingEngine
+    data_manager = _OfflineDataManager()
+    engine = TradingEngine(None, None, data_manager, NullNotifier(), NullPlotter(), kline_cache_dir=cache_dir)
+    open_time = klines['open_time'].values
+    columns = {col: klines[col].values for col in PRICE_COLUMNS}
+    # Geçmiş load_initial_data gibi yüklenir: taban barlar, onlardan toplanan üst zaman dilimleri, göstergeler ve pivotlar
+    past = [open_time[:history]] + [columns[col][:history] for col in PRICE_COLUMNS]
+    engine.candles[symbol].load(*past)
+    for timeframe, aggregator in engine.aggregators[symbol].items():
+        engine.bars[symbol][timeframe].load(*aggregator.load(*past))
+    for timeframe in engine.frame_configs:
+        engine.indicators[symbol][timeframe].reset(engine.bars[symbol][timeframe])
+        engine.update_pivot_history(symbol, timeframe, reset=True)
+    engine.last_closed_time[symbol] = engine.candles[symbol].last_open_time()
+    engine.initial_data_loaded[symbol] = True
+    opened = {name: [] for name in CONFIGS}
+    for i in range(history, len(open_time)):
+        data_manager.bar = i
+        for pos_id, (_, config_name, pos), reason in engine.position_book.check(symbol, columns['low'][i], columns['high'][i]):
+            engine.close_position(symbol, config_name, pos_id, pos, reason)
+        counts = {name: len(engine.positions[symbol][name]) for name in CONFIGS}
+        engine.process_candle(kline_message(symbol, open_time[i], *(columns[col][i] for col in PRICE_COLUMNS)))
+        for name in CONFIGS:
+            opened[name] += engine.positions[symbol][name][counts[name]:]
+    exits = {}
+    for config_name, bar, trade in data_manager.closed:
+        exits[(config_name, trade['entry_time'], trade['type'], trade['pivot_price'])] = (bar, 'sl' if trade['profit'] < 0 else 'tp')
+    results = {}
+    for name, trades in backtest_all(klines, start=history).items():
+        live = []
+        for trade in opened[name]:
+            bar, reason = exits.get((name, trade['entry_time'], trade['type'], trade['pivot_price']), (-1, None))
+            live.append((trade['type'], trade['entry_time'], trade['entry_price'], trade['sl'], trade['tp'], trade['pivot_price'], bar, reason))
+        offline = [
+            (row.type, row.entry_time, row.entry_price, row.sl, row.tp, row.pivot_price, row.exit_idx, row.reason if row.exit_idx >= 0 else None)
+            for row in trades.itertuples()
+        ]
+        mismatch = next((pair for pair in zip(live, offline) if pair[0] != pair[1]), None)
+        results[name] = {'live': len(live), 'backtest': len(offline), 'match': live == offline, 'first_mismatch': mismatch}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep/manipülasyon stratejisi için çevrimdışı backtest")
+    parser.add_argument('paths', nargs='*', help="15m kline dosyaları (CSV/Parquet), dizin veya glob")
+    parser.add_argument('--cached', action='store_true', help="Dosyalar yerine --symbol için kline önbelleğini kullan")
+    parser.add_argument('--config', action='append', help="Yalnızca bu config(ler)")
+    parser.add_argument('--start', type=int, default=DATA_WINDOW, help="İşlem aranmaya başlanacak bar (öncesi geçmiş veri)")
+    parser.add_argument('--parity', action='store_true', help="Sonuçları TradingEngine.run_strategy ile karşılaştır")
+    parser.add_argument('--symbol', default=SYMBOLS[0], help="Önbellekten okunacak / parite kontrolünde kullanılacak sembol")
+    parser.add_argument('--out', help="İşlemlerin yazılacağı CSV dosyası")
+    args = parser.parse_args()
+    klines = KlineCache(args.symbol, readonly=True).klines() if args.cached else load_klines(*args.paths)
+    configs = {name: CONFIGS[name] for name in (args.config or CONFIGS)}
+    began = time.perf_counter()
+    results = backtest_all(klines, configs, start=args.start)
+    elapsed = time.perf_counter() - began
+    print(f"{len(klines)} bar, {len(configs)} config: {elapsed * 1000:.1f} ms")
+    for name, trades in results.items():
+        stats = summarize(trades, configs[name]["INITIAL_BALANCE"])
+        print(f"{name}: {stats['trades']} işlem, TP: {stats['tp']}, SL: {stats['sl']}, Kazanma: %{stats['win_rate']:.2f}, "
+              f"Kâr: {stats['profit']:.2f}, Maks. Düşüş: {stats['max_drawdown']:.2f}")
+    if args.out:
+        pd.concat([trades.assign(config=name) for name, trades in results.items()]).to_csv(args.out, index=False)
+    if args.parity:
+        for name, result in parity_check(klines, args.symbol, args.start).items():
+            status = "OK" if result['match'] else f"FARKLI: {result['first_mismatch']}"
+            print(f"Parite {name}: canlı {result['live']}, backtest {result['backtest']} -> {status}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
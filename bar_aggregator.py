@@ -0,0 +1,71 @@
+# bar_aggregator.py
+import numpy as np
+from kline_cache import INTERVAL_MS
+from settings import BASE_TIMEFRAME
+
+def config_timeframe(config):
+    # Bot kendi zaman dilimini TIMEFRAME ile seçebilir; verilmezse taban akışın barları kullanılır
+    return config.get("TIMEFRAME", BASE_TIMEFRAME)
+
+def resample(open_time, open_, high, low, close, base_interval, interval):
+    # Taban barlar borsa sınırlarına (epoch'tan itibaren interval katları) hizalı gruplara toplanır; son grup yarım olabilir
+    interval_ms = INTERVAL_MS[interval]
+    open_time = np.asarray(open_time, dtype='int64')
+    if not len(open_time):
+        return (np.empty(0, dtype='int64'),) + tuple(np.empty(0) for _ in range(4)) + (np.empty(0, dtype=bool),)
+    buckets = open_time // interval_ms * interval_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(open_time)]
+    complete = open_time[ends - 1] + INTERVAL_MS[base_interval] >= buckets[starts] + interval_ms
+    return (
+        buckets[starts], np.asarray(open_)[starts], np.maximum.reduceat(np.asarray(high), starts),
+        np.minimum.reduceat(np.asarray(low), starts), np.asarray(close)[ends - 1], complete,
+    )
+
+class BarAggregator:
+    # Kapanmış taban barlardan tek bir üst zaman dilimi; ek websocket akışı veya REST isteği gerektirmez
+    def __init__(self, base_interval, interval):
+        self.base_interval = base_interval
+        self.interval = interval
+        self.base_ms = INTERVAL_MS[base_interval]
+        self.interval_ms = INTERVAL_MS[interval]
+        if self.interval_ms < self.base_ms or self.interval_ms % self.base_ms:
+            raise ValueError(f"{interval} barları {base_interval} barlarından üretilemez")
+        self.partial = None  # [open_time, open, high, low, close]; henüz kapanmamış üst bar
+        self.emitted = None  # Son tamamlanan üst barın open_time değeri
+
+    def load(self, open_time, open_, high, low, close):
+        # Geçmiş taban barlardan tamamlanmış üst barlar döner; sondaki yarım bar canlı akışla tamamlanmak üzere tutulur
+        columns = resample(open_time, open_, high, low, close, self.base_interval, self.interval)
+        self.partial = None
+        if len(columns[0]) and not columns[-1][-1]:
+            self.partial = [int(columns[0][-1])] + [float(values[-1]) for values in columns[1:5]]
+            columns = tuple(values[:-1] for values in columns)
+        self.emitted = int(columns[0][-1]) if len(columns[0]) else None
+        return columns[:5]
+
+    def add(self, open_time, open_, high, low, close):
+        # Kapanan taban bar eklenir; tamamlanan üst barlar döner (taban barlarda boşluk varsa yarım kalan önceki bar da)
+        bucket = int(open_time) // self.interval_ms * self.interval_ms
+        if self.emitted is not None and bucket <= self.emitted:
+            return []  # Zaten tamamlanmış üst bara ait tekrar/eski bar
+        completed = []
+        partial = self.partial
+        if partial is not None and bucket < partial[0]:
+            return []
+        if partial is not None and partial[0] != bucket:
+            completed.append(tuple(partial))
+            partial = None
+        if partial is None:
+            partial = [bucket, float(open_), float(high), float(low), float(close)]
+        else:
+            partial[2] = max(partial[2], float(high))
+            partial[3] = min(partial[3], float(low))
+            partial[4] = float(close)
+        if int(open_time) + self.base_ms >= bucket + self.interval_ms:
+            completed.append(tuple(partial))
+            partial = None
+        self.partial = partial
+        if completed:
+            self.emitted = completed[-1][0]
+        return completed
\ No newline at end of file
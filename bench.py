@@ -0,0 +1,299 @@
+# bench.py
+import argparse
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config import CONFIGS, DATA_FILES
+from kline_cache import INTERVAL_MS
+from settings import BASE_TIMEFRAME
+from candle_buffer import CandleBuffer
+from fake_exchange import kline_message, synthetic_klines
+from replay import build
+from utils import pivot_high
+
+BASELINE = {'symbols': 5, 'window': 250, 'configs': 3, 'positions': 0, 'trades': 1000}
+SCALES = {
+    'symbols': [5, 50, 500],
+    'window': [250, 1000, 10000],
+    'configs': [1, 3, 10],
+    'positions': [0, 100, 1000],
+    'trades': [0, 10000, 100000],
+}
+STAGES = ['setup', 'pivot_high', 'update_pivot_history', 'check_manipulation_zones', 'run_strategy', 'process_candle', 'save_data']
+INNER_STAGES = ['update_pivot_history', 'check_manipulation_zones', 'run_strategy']
+REGRESSION_THRESHOLD = 0.2  # Ops/sn'de bu orandan fazla düşüş veya p99/bellekte bu orandan fazla artış regresyon sayılır
+MIN_MEMORY_KB = 64  # Bunun altındaki tepe bellek farkları gürültü sayılır
+
+def scenarios(baseline=BASELINE, scales=SCALES):
+    # Her parametre diğerleri temel değerde tutularak tek tek ölçeklenir
+    result = [('baseline', dict(baseline))]
+    for key, values in scales.items():
+        for value in values:
+            if value != baseline[key]:
+                result.append((f"{key}={value}", baseline | {key: value}))
+    return result
+
+@contextmanager
+def _configs(count):
+    # CONFIGS modül düzeyinde paylaşıldığı için yerinde genişletilir/daraltılır, çıkışta geri yüklenir
+    saved_configs, saved_files = dict(CONFIGS), dict(DATA_FILES)
+    names = list(saved_configs)
+    selected = {}
+    for k in range(count):
+        base = names[k % len(names)]
+        name = base if k < len(names) else f"{base}_{k // len(names) + 1}"
+        selected[name] = saved_configs[base]
+        DATA_FILES.setdefault(name, f"{name}_data.json")
+    CONFIGS.clear()
+    CONFIGS.update(selected)
+    try:
+        yield list(selected)
+    finally:
+        CONFIGS.clear()
+        CONFIGS.update(saved_configs)
+        DATA_FILES.clear()
+        DATA_FILES.update(saved_files)
+
+class _Timings:
+    def __init__(self):
+        self.samples = {}
+        self.memory = {}
+        self.trace_memory = False
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def call(self, stage, func, *args):
+        if self.trace_memory:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        began = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - began
+        if self.trace_memory:
+            self.memory[stage] = max(self.memory.get(stage, 0), tracemalloc.get_traced_memory()[1] - before)
+        else:
+            self.add(stage, elapsed)
+        return result
+
+    def wrap(self, stage, func):
+        return lambda *args: self.call(stage, func, *args)
+
+    def summary(self, stage):
+        samples = np.array(self.samples.get(stage, []))
+        if not len(samples):
+            return None
+        return {
+            'ops': len(samples),
+            'ops_per_s': float(len(samples) / samples.sum()) if samples.sum() else float('inf'),
+            'p50_us': float(np.percentile(samples, 50) * 1e6),
+            'p99_us': float(np.percentile(samples, 99) * 1e6),
+            'peak_kb': self.memory.get(stage, 0) / 1024,
+        }
+
+def _load(engine, history):
+    # load_initial_data ile aynı adımlar; pencere boyu motora verilir, veri REST/önbellek yerine doğrudan yüklenir
+    for symbol, df in history.items():
+        candles = engine.candles[symbol]
+        columns = [df[col].values for col in CandleBuffer.COLUMNS]
+        candles.load(*columns)
+        for timeframe, aggregator in engine.aggregators[symbol].items():
+            engine.bars[symbol][timeframe].load(*aggregator.load(*columns))
+        for timeframe in engine.frame_configs:
+            engine.indicators[symbol][timeframe].reset(engine.bars[symbol][timeframe])
+            engine.update_pivot_history(symbol, timeframe, reset=True)
+        engine.last_closed_time[symbol] = candles.last_open_time()
+        engine.initial_data_loaded[symbol] = True
+
+def _bots(symbols, config_names, count):
+    bots = [(symbol, name) for symbol in symbols for name in config_names]
+    return [bots[k % len(bots)] for k in range(count)]
+
+def _open_positions(engine, count):
+    # SL/TP fiyattan uzak tutulur; pozisyonlar ölçüm boyunca açık kalır
+    for k, (symbol, config_name) in enumerate(_bots(engine.symbols, list(CONFIGS), count)):
+        price = float(engine.candles[symbol].view('close')[-1])
+        pos = {
+            'type': 'long', 'entry_time': engine.candles[symbol].time_at(-1) - pd.Timedelta(minutes=k), 'entry_price': price,
+            'sl': price * 0.5, 'tp': price * 2, 'size': 1.0, 'pivot_price': price, 'sweep_low': price,
+            'sweep_time': engine.candles[symbol].time_at(-1), 'manip_low': price, 'manip_high': price, 'risk_amount': 100.0
+        }
+        engine.positions[symbol][config_name].append(pos)
+        engine.position_book.add(symbol, config_name, pos)
+        engine.data_manager.record_position_opened(symbol, config_name, pos)
+
+def _trade_history(data_manager, symbols, count, seed):
+    rng = np.random.default_rng(seed)
+    exit_times = pd.Timestamp.now() - pd.to_timedelta(np.sort(rng.integers(0, 365 * 24 * 60, count))[::-1], unit='min')
+    profits = np.where(rng.random(count) < 0.4, 150.0, -100.0)
+    trades = {}
+    for k, (symbol, config_name) in enumerate(_bots(symbols, list(CONFIGS), count)):
+        exit_time = exit_times[k]
+        trades.setdefault((symbol, config_name), []).append({
+            'type': 'long', 'entry_time': exit_time - pd.Timedelta(hours=1), 'exit_time': exit_time, 'entry_price': 100.0,
+            'exit_price': 100.0, 'pivot_price': 100.0 + k * 1e-6, 'profit': float(profits[k])
+        })
+    for (symbol, config_name), bot_trades in trades.items():
+        data_manager.trade_store.add_many(symbol, config_name, bot_trades)
+        for trade in bot_trades:
+            data_manager.aggregates[symbol][config_name].add(trade['exit_time'], trade['profit'])
+    data_manager.trade_store.flush()
+
+def _feed(engine, timings, history, bar, stage=None):
+    # Her sembol için bir kapanmış bar; fiyat barın kapanışı olarak güncellenir
+    for symbol, df in history.items():
+        open_time, open_, high, low, close = (df[col].values[bar] for col in CandleBuffer.COLUMNS)
+        engine.data_manager.price_feed.set_price(symbol, float(close))
+        msg = kline_message(symbol, open_time, open_, high, low, close, True)
+        if stage:
+            timings.call(stage, engine.process_candle, msg)
+        else:
+            engine.process_candle(msg)
+
+def run_scenario(params, iterations=2000, memory_iterations=20, seed=0, workdir=None):
+    timings = _Timings()
+    with _configs(params['configs']) as config_names:
+        symbols = [f"S{i:04d}USDT" for i in range(params['symbols'])]
+        stream_bars = max(1, -(-iterations // len(symbols)))
+        memory_bars = max(1, -(-memory_iterations // len(symbols)))
+        interval_ms = INTERVAL_MS[BASE_TIMEFRAME]
+        end_ms = (int(time.time() * 1000) // interval_ms - stream_bars - 2 * memory_bars) * interval_ms
+        history = synthetic_klines(symbols, params['window'], end_ms, seed=seed)
+        stream = synthetic_klines(symbols, stream_bars + 2 * memory_bars, end_ms + (stream_bars + 2 * memory_bars) * interval_ms, seed=seed + 1)
+        for symbol in symbols:
+            # Stream, geçmişin son kapanışından devam eder
+            scale = history[symbol]['close'].iloc[-1] / stream[symbol]['open'].iloc[0]
+            stream[symbol][['open', 'high', 'low', 'close']] *= scale
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        began = time.perf_counter()
+        engine, _ = build(symbols, workdir=workdir, window=params['window'])
+        _load(engine, history)
+        timings.add('setup', time.perf_counter() - began)
+        timings.memory['setup'] = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        data_manager = engine.data_manager
+        _open_positions(engine, params['positions'])
+        _trade_history(data_manager, symbols, params['trades'], seed)
+
+        first = config_names[0]
+        gc.collect()
+        for k in range(iterations):
+            high = engine.candles[symbols[k % len(symbols)]].view('high')
+            timings.call('pivot_high', pivot_high, high, CONFIGS[first]["LEFT"], CONFIGS[first]["RIGHT"])
+
+        # İç aşamalar, process_candle akışı içinde örnek başına ölçülür
+        for stage in INNER_STAGES:
+            setattr(engine, stage, timings.wrap(stage, getattr(engine, stage)))
+        for bar in range(stream_bars):
+            _feed(engine, timings, stream, bar, 'process_candle')
+        save_iterations = max(10, iterations // 20)
+        bots = _bots(symbols, config_names, save_iterations)
+        for symbol, config_name in bots:
+            timings.call('save_data', data_manager.save_data, symbol, config_name)
+
+        # Bellek: tracemalloc süreleri bozduğu için ayrı, kısa bir geçişte ölçülür
+        tracemalloc.start()
+        timings.trace_memory = True
+        high = engine.candles[symbols[0]].view('high')
+        timings.call('pivot_high', pivot_high, high, CONFIGS[first]["LEFT"], CONFIGS[first]["RIGHT"])
+        for bar in range(stream_bars, stream_bars + memory_bars):
+            _feed(engine, timings, stream, bar)
+        for stage in INNER_STAGES:
+            delattr(engine, stage)
+        for bar in range(stream_bars + memory_bars, stream_bars + 2 * memory_bars):
+            _feed(engine, timings, stream, bar, 'process_candle')
+        timings.call('save_data', data_manager.save_data, symbols[0], first)
+        timings.trace_memory = False
+        tracemalloc.stop()
+        data_manager.close()
+    return {stage: timings.summary(stage) for stage in STAGES if timings.summary(stage)}
+
+def run(iterations=2000, seed=0, baseline=BASELINE, scales=SCALES, only=None, progress=print):
+    root = tempfile.mkdtemp(prefix='bench_')
+    results = []
+    for name, params in scenarios(baseline, scales):
+        if only and name not in only:
+            continue
+        began = time.perf_counter()
+        stages = run_scenario(params, iterations, seed=seed, workdir=os.path.join(root, name.replace('=', '_')))
+        results.append({'name': name, 'params': params, 'stages': stages})
+        if progress:
+            progress(f"{name}: {time.perf_counter() - began:.1f} sn")
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'iterations': iterations,
+        'seed': seed,
+        'scenarios': results,
+    }
+
+def format_results(results):
+    rows = []
+    for scenario in results['scenarios']:
+        for stage, s in scenario['stages'].items():
+            rows.append({'senaryo': scenario['name'], 'aşama': stage, 'ops/sn': round(s['ops_per_s'], 1),
+                         'p50 µs': round(s['p50_us'], 1), 'p99 µs': round(s['p99_us'], 1), 'bellek KB': round(s['peak_kb'], 1)})
+    return pd.DataFrame(rows).to_string(index=False)
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    # İki çalıştırmada ortak senaryo/aşamalar karşılaştırılır; regresyonlar 'regression' ile işaretlenir
+    old_stages = {(s['name'], stage): v for s in old['scenarios'] for stage, v in s['stages'].items()}
+    rows = []
+    for scenario in new['scenarios']:
+        for stage, v in scenario['stages'].items():
+            base = old_stages.get((scenario['name'], stage))
+            if base is None:
+                continue
+            ops = v['ops_per_s'] / base['ops_per_s'] - 1 if base['ops_per_s'] else 0.0
+            p99 = v['p99_us'] / base['p99_us'] - 1 if base['p99_us'] else 0.0
+            memory = v['peak_kb'] / base['peak_kb'] - 1 if max(base['peak_kb'], v['peak_kb']) >= MIN_MEMORY_KB else 0.0
+            rows.append({
+                'scenario': scenario['name'], 'stage': stage, 'ops_change': ops, 'p99_change': p99, 'memory_change': memory,
+                'regression': ops < -threshold or p99 > threshold or memory > threshold,
+            })
+    return pd.DataFrame(rows, columns=['scenario', 'stage', 'ops_change', 'p99_change', 'memory_change', 'regression'])
+
+def _parse_scale(values):
+    scales = {}
+    for item in values or []:
+        key, _, numbers = item.partition('=')
+        scales[key] = [int(n) for n in numbers.split(',')]
+    return scales
+
+def main():
+    parser = argparse.ArgumentParser(description="Motorun sıcak yolları için sentetik veriyle ölçeklenen benchmark")
+    parser.add_argument('--out', default="bench_results.json", help="Sonuçların yazılacağı JSON dosyası")
+    parser.add_argument('--compare', help="Karşılaştırılacak önceki sonuç dosyası")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--iterations', type=int, default=2000, help="Senaryo başına işlenen kline mesajı")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', nargs='*', help="Ölçek değerlerini değiştir, ör. symbols=5,50 window=250,2000")
+    parser.add_argument('--only', nargs='*', help="Yalnızca bu senaryolar (ör. baseline symbols=500)")
+    args = parser.parse_args()
+    out = os.path.abspath(args.out)
+    results = run(args.iterations, args.seed, scales=SCALES | _parse_scale(args.scale), only=args.only)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(format_results(results))
+    if args.compare:
+        with open(args.compare) as f:
+            diff = compare(json.load(f), results, args.threshold)
+        print(diff.to_string(index=False, float_format=lambda x: f"{x:+.1%}"))
+        regressions = diff[diff['regression']]
+        if len(regressions):
+            print(f"{len(regressions)} regresyon bulundu (eşik {args.threshold:.0%})")
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
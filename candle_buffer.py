@@ -0,0 +1,68 @@
+# candle_buffer.py
+import numpy as np
+import pandas as pd
+
+class CandleBuffer:
+    COLUMNS = ('open_time', 'open', 'high', 'low', 'close')
+
+    def __init__(self, capacity, interval=None):
+        self.capacity = capacity
+        self.interval = interval  # Zaman dilimi ('15m', '1h', ...); grafik penceresi bununla hesaplanır
+        self.count = 0  # Şimdiye kadar eklenen toplam bar
+        # Her değer i ve i + capacity konumlarına yazılır; böylece pencere her zaman bitişik bir dilimdir
+        self._arrays = {
+            col: np.zeros(2 * capacity, dtype='int64' if col == 'open_time' else 'float64') for col in self.COLUMNS
+        }
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def _write(self, pos, values):
+        for col, value in zip(self.COLUMNS, values):
+            arr = self._arrays[col]
+            arr[pos] = value
+            arr[pos + self.capacity] = value
+
+    def append(self, open_time, open_, high, low, close):
+        self._write(self.count % self.capacity, (open_time, open_, high, low, close))
+        self.count += 1
+
+    def update_last(self, open_time, open_, high, low, close):
+        if self.count == 0:
+            self.append(open_time, open_, high, low, close)
+            return
+        self._write((self.count - 1) % self.capacity, (open_time, open_, high, low, close))
+
+    def load(self, open_time, open_, high, low, close):
+        self.count = 0
+        columns = [np.asarray(col)[-self.capacity:] for col in (open_time, open_, high, low, close)]
+        n = len(columns[0])
+        for col, values in zip(self.COLUMNS, columns):
+            arr = self._arrays[col]
+            arr[:n] = values
+            arr[self.capacity:self.capacity + n] = values
+        self.count = n
+
+    def view(self, col):
+        n = len(self)
+        start = (self.count - n) % self.capacity
+        view = self._arrays[col][start:start + n]
+        view.flags.writeable = False
+        return view
+
+    def last_open_time(self):
+        if self.count == 0:
+            return None
+        return int(self._arrays['open_time'][(self.count - 1) % self.capacity])
+
+    def first_bar(self):
+        # Penceredeki ilk barın mutlak sırası; mutlak sıra - first_bar() = pencere konumu
+        return self.count - len(self)
+
+    def time_at(self, i):
+        return pd.Timestamp(int(self.view('open_time')[i]), unit='ms')
+
+    def to_frame(self):
+        df = pd.DataFrame({col: self.view(col) for col in self.COLUMNS})
+        df['open_time'] = df['open_time'].astype('datetime64[ms]')
+        return df
@@ -1,10 +1,14 @@
 # data_manager.py
 from binance.client import Client
-import pandas as pd
 from config import CONFIGS, DATA_FILES
-from settings import SYMBOLS
-from utils import save_data, load_data
+from settings import SYMBOLS, PRICE_MAX_AGE, PRICE_CHECK_INTERVAL, JOURNAL_SNAPSHOT_EVERY, JOURNAL_FSYNC_INTERVAL, TRADE_DB_FILE
+from price_feed import PriceFeed
+from journal import TradeJournal
+from trade_store import TradeStore
+from trade_stats import TradeAggregates
+from metrics import registry
 from datetime import datetime, timedelta
+import os
 import threading
 import time
 import logging
@@ -17,55 +21,112 @@ logging.basicConfig(
 )
 
 class DataManager:
-    def __init__(self, api_key, api_secret):
-        self.client = Client(api_key, api_secret)
-        self.client.API_URL = 'https://fapi.binance.com'
-        self.trades = {symbol: {name: [] for name in CONFIGS} for symbol in SYMBOLS}
-        self.balances = {symbol: {name: CONFIGS[name]["INITIAL_BALANCE"] for name in CONFIGS} for symbol in SYMBOLS}
-        self.stats = {symbol: {name: {"total_trades": 0, "monthly_trades": 0, "tp_count": 0, "sl_count": 0, "last_month": datetime.now().month} for name in CONFIGS} for symbol in SYMBOLS}
-        self.current_prices = {symbol: 0.0 for symbol in SYMBOLS}
-        self.load_data()
-        self.start_price_updater()
+    def __init__(self, api_key, api_secret, client=None, symbols=None, data_dir=None, forward_trades=False, offline=False):
+        # forward_trades: işlemler veritabanına yazılmaz, shard worker'ı gibi tek yazıcıya iletilmek üzere bekletilir
+        # offline: durumu başka süreçlerden alan okuyucu (shard supervisor); REST istemcisi, journal ve fiyat güncelleyici açılmaz
+        self.symbols = list(symbols or SYMBOLS)
+        self.data_dir = data_dir or ''  # Journal ve veritabanı dosyalarının dizini (varsayılan: çalışma dizini)
+        if client is None and not offline:
+            client = Client(api_key, api_secret)
+            client.API_URL = 'https://fapi.binance.com'
+        self.client = client  # Test/replay için sahte bir istemci verilebilir
+        self.balances = {symbol: {name: CONFIGS[name]["INITIAL_BALANCE"] for name in CONFIGS} for symbol in self.symbols}
+        self.stats = {symbol: {name: {"total_trades": 0, "monthly_trades": 0, "tp_count": 0, "sl_count": 0, "last_month": datetime.now().month} for name in CONFIGS} for symbol in self.symbols}
+        self.price_feed = PriceFeed(self.client, self.symbols, PRICE_MAX_AGE)  # Websocket ile beslenen fiyat önbelleği
+        self.journals = {symbol: {} for symbol in self.symbols}
+        # İşlem geçmişi indeksli SQLite tablosunda tutulur
+        self.trade_store = TradeStore(os.path.join(self.data_dir, TRADE_DB_FILE), forward=forward_trades)
+        self.aggregates = {symbol: {name: TradeAggregates() for name in CONFIGS} for symbol in self.symbols}
+        if not offline:
+            self.load_data()
+            self.start_price_updater()
+            self.start_journal_syncer()
 
     def load_data(self):
-        for symbol in SYMBOLS:
+        for symbol in self.symbols:
             for name in CONFIGS:
                 default_data = {
+                    "positions": [],
                     "trades": [],
                     "balance": CONFIGS[name]["INITIAL_BALANCE"],
+                    "used_pivots": [],
+                    "sweeps_pl": [],
+                    "sweeps_ph": [],
                     "stats": {"total_trades": 0, "monthly_trades": 0, "tp_count": 0, "sl_count": 0, "last_month": datetime.now().month}
                 }
-                filename = DATA_FILES[name].replace(".json", f"_{symbol}.json")
-                data = load_data(filename, default_data)
-                self.trades[symbol][name] = data["trades"]
+                filename = os.path.join(self.data_dir, DATA_FILES[name].replace(".json", f"_{symbol}.json"))
+                # Anlık görüntü + journal tekrar oynatılarak son durum elde edilir
+                journal = TradeJournal(filename, default_data, JOURNAL_SNAPSHOT_EVERY, JOURNAL_FSYNC_INTERVAL)
+                self.journals[symbol][name] = journal
+                data = journal.state
+                self.migrate_trades(symbol, name, filename)
+                for exit_time, profit in self.trade_store.profits(symbol, name):
+                    self.aggregates[symbol][name].add(exit_time, profit)
                 self.balances[symbol][name] = data["balance"]
                 self.stats[symbol][name] = data["stats"]
 
-    def save_data(self, symbol, config_name, engine):
-        data = {
-            "positions": engine.positions[symbol][config_name],
-            "trades": self.trades[symbol][config_name],
-            "balance": self.balances[symbol][config_name],
-            "used_pivots": list(engine.used_pivots[symbol][config_name]),
-            "sweeps_pl": engine.sweeps_pl[symbol][config_name],
-            "sweeps_ph": engine.sweeps_ph[symbol][config_name],
-            "stats": self.stats[symbol][config_name]
-        }
-        filename = DATA_FILES[config_name].replace(".json", f"_{symbol}.json")
-        save_data(filename, data)
+    def migrate_trades(self, symbol, config_name, filename):
+        journal = self.journals[symbol][config_name]
+        if journal.state.get("trades_in_store"):
+            # Çökme öncesi veritabanına yazılamamış olabilecek işlemler (tekrarlar yok sayılır)
+            self.trade_store.add_many(symbol, config_name, journal.replayed_trades)
+            return
+        if self.trade_store.migrate(filename, symbol, config_name, journal.state["trades"]):
+            logging.info(f"{len(journal.state['trades'])} işlem veritabanına aktarıldı: {symbol}/{config_name}")
+        journal.state["trades"] = []
+        journal.state["trades_in_store"] = True
+        journal.snapshot()
+
+    def save_data(self, symbol, config_name):
+        # Journal'ı sıkıştırıp tam anlık görüntü yazar
+        with registry.timer('save_data', symbol=symbol, config=config_name):
+            self.journals[symbol][config_name].snapshot()
         logging.info(f"Veriler kaydedildi: {symbol}/{config_name}")
 
+    def record_position_opened(self, symbol, config_name, position):
+        self.journals[symbol][config_name].record("position_opened", position=position)
+
+    def record_sweep(self, symbol, config_name, event, side, sweep):
+        # event: added, updated veya removed; side: pl veya ph
+        self.journals[symbol][config_name].record(f"sweep_{event}", side=side, sweep=list(sweep))
+
+    def start_journal_syncer(self):
+        def sync_journals():
+            # fsync işlemleri olay başına değil, aralıklarla toplu yapılır
+            while True:
+                time.sleep(JOURNAL_FSYNC_INTERVAL)
+                for symbol in self.symbols:
+                    for journal in self.journals[symbol].values():
+                        try:
+                            journal.sync()
+                        except Exception as e:
+                            registry.inc('errors_total', source='journal')
+                            logging.error(f"Journal senkronizasyon hatası ({journal.journal_path}): {e}")
+
+        sync_thread = threading.Thread(target=sync_journals)
+        sync_thread.daemon = True
+        sync_thread.start()
+
+    def close(self):
+        self.trade_store.close()
+        for symbol in self.symbols:
+            for journal in self.journals[symbol].values():
+                journal.close()
+
     def start_price_updater(self):
         def update_prices():
+            # Fiyatlar stream'den gelir; yalnızca bayatlayan sembol varsa tek bir toplu REST çağrısı yapılır
             while True:
-                for symbol in SYMBOLS:
+                stale = self.price_feed.stale_symbols()
+                if stale:
                     try:
-                        ticker = self.client.futures_symbol_ticker(symbol=symbol)
-                        price = float(ticker['price'])
-                        self.current_prices[symbol] = price
+                        with registry.timer('rest_ticker'):
+                            self.price_feed.refresh()
+                        registry.inc('rest_requests_total', endpoint='ticker')
                     except Exception as e:
-                        logging.error(f"Futures fiyat güncelleme hatası ({symbol}): {e}")
-                time.sleep(0.5)
+                        registry.inc('errors_total', source='rest_ticker')
+                        logging.error(f"Futures fiyat güncelleme hatası ({', '.join(stale)}): {e}")
+                time.sleep(PRICE_CHECK_INTERVAL)
 
         price_thread = threading.Thread(target=update_prices)
         price_thread.daemon = True
@@ -73,9 +134,12 @@ class DataManager:
 
     def close_position(self, symbol, config_name, trade, engine):
         self.balances[symbol][config_name] += trade['profit']
-        self.trades[symbol][config_name].append(trade)
         self.update_stats(symbol, config_name, trade)
-        self.save_data(symbol, config_name, engine)
+        self.trade_store.add(symbol, config_name, trade)
+        self.aggregates[symbol][config_name].add(trade['exit_time'], trade['profit'])
+        self.journals[symbol][config_name].record(
+            "trade_closed", trade=trade, balance=self.balances[symbol][config_name], stats=dict(self.stats[symbol][config_name])
+        )
 
     def update_stats(self, symbol, config_name, trade):
         self.stats[symbol][config_name]["total_trades"] += 1
@@ -89,33 +153,39 @@ class DataManager:
         else:
             self.stats[symbol][config_name]["sl_count"] += 1
 
+    def _period_start(self, period):
+        if period == "1ay":
+            return datetime.now() - timedelta(days=30)
+        elif period == "3ay":
+            return datetime.now() - timedelta(days=90)
+        elif period == "6ay":
+            return datetime.now() - timedelta(days=180)
+        return None
+
     def get_stats(self, symbol, config_name, period=None):
-        trades = pd.DataFrame(self.trades[symbol][config_name])
-        if trades.empty:
-            return f"[{symbol}/{config_name}] Henüz işlem yok.", trades
-        
-        if period:
-            now = datetime.now()
-            if period == "1ay":
-                start = now - timedelta(days=30)
-            elif period == "3ay":
-                start = now - timedelta(days=90)
-            elif period == "6ay":
-                start = now - timedelta(days=180)
-            trades['exit_time'] = pd.to_datetime(trades['exit_time'])
-            trades = trades[trades['exit_time'] >= start]
-
-        total_trades = len(trades)
-        tp_count = len(trades[trades['profit'] > 0])
-        sl_count = len(trades[trades['profit'] < 0])
-        total_profit = trades['profit'].sum()
-        return (f"[{symbol}/{config_name}] Performans ({period or 'Tüm Zaman'}):\n"
-                f"Toplam İşlem: {total_trades}\n"
-                f"TP: {tp_count}, SL: {sl_count}\n"
-                f"Toplam Kâr/Zarar: {total_profit:.2f} USD"), trades
+        aggregates = self.aggregates[symbol][config_name]
+        if not len(aggregates):
+            return f"[{symbol}/{config_name}] Henüz işlem yok."
+        total_trades, tp_count, sl_count, total_profit = aggregates.window(self._period_start(period))
+        result = (f"[{symbol}/{config_name}] Performans ({period or 'Tüm Zaman'}):\n"
+                  f"Toplam İşlem: {total_trades}\n"
+                  f"TP: {tp_count}, SL: {sl_count}\n"
+                  f"Toplam Kâr/Zarar: {total_profit:.2f} USD")
+        if period is None:
+            result += f"\nMaks. Düşüş: {aggregates.max_drawdown:.2f} USD"
+        return result
+
+    def get_equity_curve(self, symbol, config_name, period=None):
+        return self.aggregates[symbol][config_name].curve(self._period_start(period))
+
+    def get_trade_count(self, symbol, config_name):
+        return self.trade_store.count(symbol, config_name)
+
+    def get_trade(self, symbol, config_name, index):
+        return self.trade_store.get(symbol, config_name, index)
 
     def get_last_trades(self, symbol, config_name, count=5):
-        trades = self.trades[symbol][config_name][-count:]
+        trades = self.trade_store.last(symbol, config_name, count)
         if not trades:
             return f"[{symbol}/{config_name}] Henüz işlem yok."
         result = f"[{symbol}/{config_name}] Son {min(count, len(trades))} İşlem:\n"
@@ -126,19 +196,14 @@ class DataManager:
         return result
 
     def get_current_price(self, symbol):
-        return self.current_prices.get(symbol, 0.0)
+        return self.price_feed.latest(symbol) or 0.0
 
     def get_current_futures_price(self, symbol):
-        try:
-            ticker = self.client.futures_symbol_ticker(symbol=symbol)
-            return float(ticker['price'])
-        except Exception as e:
-            logging.error(f"Futures fiyat alınamadı [{symbol}]: {e}")
-            return None
+        return self.price_feed.get(symbol)
 
     def handle_query(self, symbol, bot_name, command, engine):
-        if symbol not in SYMBOLS:
-            return f"Geçersiz symbol ({', '.join(SYMBOLS)})."
+        if symbol not in self.symbols:
+            return f"Geçersiz symbol ({', '.join(self.symbols)})."
         if bot_name not in CONFIGS:
             return "Geçersiz bot adı (safe, mid, agresif)."
         
@@ -152,8 +217,7 @@ class DataManager:
             period = command.split()[-1] if len(command.split()) > 1 else None
             if period not in ["1ay", "3ay", "6ay", None]:
                 return "Geçersiz dönem (1ay, 3ay, 6ay)."
-            stats, _ = self.get_stats(symbol, bot_name, period)
-            return stats
+            return self.get_stats(symbol, bot_name, period)
         elif command == "durum":
             open_pos = len(engine.positions[symbol][bot_name])
             pending_sweeps = len(engine.sweeps_pl[symbol][bot_name]) + len(engine.sweeps_ph[symbol][bot_name])
@@ -161,6 +225,7 @@ class DataManager:
                     f"Anlık Fiyat: {self.get_current_price(symbol):.2f} USDT\n"
                     f"Açık Pozisyon: {open_pos}\n"
                     f"Bekleyen Sweep: {pending_sweeps}\n"
+                    f"Geçmiş Veri: {engine.warmup.describe(symbol)}\n"
                     f"Aylık İşlem: {self.stats[symbol][bot_name]['monthly_trades']}")
         else:
             return "Geçersiz komut (kasa, işlem, performans, durum)."
\ No newline at end of file
@@ -0,0 +1,55 @@
+# dedupe_store.py
+import heapq
+import itertools
+import sys
+import threading
+
+class DedupeStore:
+    # Son kullanma zamanlı anahtar kümesi; süresi dolan anahtarlar expire() ile, sınır aşılırsa en erken dolacak olan atılır
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.expires = {}  # anahtar -> son kullanma (bar open_time, ms)
+        self.heap = []  # (son kullanma, sıra, anahtar); güncellenen anahtarların eski kayıtları geç silinir
+        self.order = itertools.count()  # Aynı son kullanmada anahtarlar karşılaştırılmaz
+        self.lock = threading.Lock()  # Strateji ve pozisyon izleme thread'leri aynı kümeye yazar
+
+    def __contains__(self, key):
+        return key in self.expires
+
+    def __len__(self):
+        return len(self.expires)
+
+    def add(self, key, expires_at):
+        with self.lock:
+            if self.expires.get(key) == expires_at:
+                return
+            self.expires[key] = expires_at
+            heapq.heappush(self.heap, (expires_at, next(self.order), key))
+            while len(self.expires) > self.max_entries:
+                self._pop()
+            if len(self.heap) > 2 * len(self.expires) + 16:
+                self._compact()
+
+    def _pop(self):
+        expires_at, _, key = heapq.heappop(self.heap)
+        if self.expires.get(key) == expires_at:
+            del self.expires[key]
+
+    def _compact(self):
+        self.heap = [(expires_at, next(self.order), key) for key, expires_at in self.expires.items()]
+        heapq.heapify(self.heap)
+
+    def expire(self, now):
+        removed = 0
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                expires_at, _, key = self.heap[0]
+                removed += self.expires.get(key) == expires_at
+                self._pop()
+        return removed
+
+    def memory(self):
+        # Yaklaşık bayt: sözlük + heap + anahtarlar
+        with self.lock:
+            keys = sum(sys.getsizeof(key) for key in self.expires)
+            return sys.getsizeof(self.expires) + sys.getsizeof(self.heap) + keys + len(self.heap) * 80
\ No newline at end of file
@@ -0,0 +1,123 @@
+# dispatcher.py
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from metrics import registry
+
+class SymbolDispatcher:
+    def __init__(self, handler, workers=4, max_queue=500):
+        self.handler = handler
+        self.worker_count = workers
+        self.max_queue = max_queue
+        self.queues = {}
+        self.scheduled = set()  # Kuyruğu bir worker'a atanmış semboller
+        self.ready = queue.Queue()
+        self.lock = threading.Lock()
+        self.lag_ms = {}  # Sembol başına son mesajın kuyrukta bekleme süresi
+        self.counters = {"received": 0, "processed": 0, "coalesced": 0, "dropped": 0, "errors": 0}
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        for n in range(self.worker_count):
+            thread = threading.Thread(target=self._work, name=f"dispatch-{n}")
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def dispatch(self, msg):
+        data = msg.get('data') if isinstance(msg, dict) else None
+        if not isinstance(data, dict) or 's' not in data:
+            self.handler(msg)  # Hata/bilinmeyen mesajlar sıraya alınmadan işlenir
+            return
+        symbol = data['s']
+        with self.lock:
+            self.counters["received"] += 1
+            pending = self.queues.setdefault(symbol, deque())
+            if pending and self._is_stale_update(pending[-1][1], msg):
+                # Worker geride: aynı barın işlenmemiş kapanmamış güncellemesi yenisiyle değiştirilir
+                pending[-1] = (pending[-1][0], msg)
+                self.counters["coalesced"] += 1
+            else:
+                if len(pending) >= self.max_queue:
+                    self._drop_live_update(symbol, pending)
+                pending.append((time.monotonic(), msg))
+            if symbol not in self.scheduled:
+                self.scheduled.add(symbol)
+                self.ready.put(symbol)
+
+    def _is_stale_update(self, queued, msg):
+        old = queued['data'].get('k')
+        new = msg['data'].get('k')
+        return old is not None and new is not None and not old['x'] and old['t'] == new['t']
+
+    def _drop_live_update(self, symbol, pending):
+        # Kapanış mesajları asla atılmaz; kuyruk yalnızca kapanış doluysa sınırı aşar
+        for n, (_, queued) in enumerate(pending):
+            kline = queued['data'].get('k')
+            if kline is None or not kline['x']:
+                del pending[n]
+                self.counters["dropped"] += 1
+                return
+        logging.warning(f"[{symbol}] Dağıtım kuyruğu dolu ({len(pending)} mesaj)")
+
+    def _work(self):
+        while self.running:
+            try:
+                symbol = self.ready.get(timeout=1)
+            except queue.Empty:
+                continue
+            with self.lock:
+                pending = self.queues[symbol]
+                enqueued_at, msg = pending.popleft()
+                self.lag_ms[symbol] = (time.monotonic() - enqueued_at) * 1000
+            try:
+                with registry.timer('process_candle', symbol=symbol):
+                    self.handler(msg)
+            except Exception as e:
+                with self.lock:
+                    self.counters["errors"] += 1
+                registry.inc('errors_total', source='dispatch')
+                logging.error(f"Mesaj işleme hatası [{symbol}]: {e}")
+            registry.inc('messages_total', symbol=symbol)
+            with self.lock:
+                self.counters["processed"] += 1
+                if pending:
+                    self.ready.put(symbol)  # Sembol sırası korunur, diğer semboller arada işlenebilir
+                else:
+                    self.scheduled.discard(symbol)
+
+    def queue_depths(self):
+        with self.lock:
+            return {symbol: len(pending) for symbol, pending in self.queues.items()}
+
+    def counts(self):
+        # Sayaçlar worker thread'lerinde güncellenir; okuyanlar kilit altında alınmış kopyayı kullanır
+        with self.lock:
+            return dict(self.counters)
+
+    def max_lag_ms(self):
+        with self.lock:
+            return max(self.lag_ms.values(), default=0.0)
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+            depths = {symbol: len(pending) for symbol, pending in self.queues.items()}
+            lag_ms = dict(self.lag_ms)
+        return {
+            **counters,
+            "queue_depth": depths,
+            "max_queue_depth": max(depths.values(), default=0),
+            "lag_ms": lag_ms,
+            "max_lag_ms": max(lag_ms.values(), default=0.0),
+        }
@@ -1,13 +1,24 @@
 # engine.py
 from binance import ThreadedWebsocketManager
-import pandas as pd
 import logging
 import threading
 import time
+import numpy as np
+import pandas as pd
 from config import CONFIGS
-from settings import SYMBOLS, DATA_WINDOW, PROXIMITY_THRESHOLD
-from utils import pivot_high, pivot_low
-from datetime import datetime, timedelta
+from settings import SYMBOLS, DATA_WINDOW, BASE_TIMEFRAME, PROXIMITY_THRESHOLD, CLOSED_BARS_ONLY, DISPATCH_WORKERS, DISPATCH_QUEUE_SIZE, PRICE_STREAM, DEDUPE_MAX_ENTRIES, KLINE_CACHE_DIR
+from pivot_tracker import PivotSet
+from candle_buffer import CandleBuffer
+from kline_cache import KlineCache, INTERVAL_MS
+from dedupe_store import DedupeStore
+from sweep_table import SweepTable
+from indicators import CandleIndicators
+from bar_aggregator import BarAggregator, config_timeframe
+from dispatcher import SymbolDispatcher
+from position_book import PositionBook
+from warmup import Warmup, WeightBudget
+from metrics import registry
+from datetime import datetime
 
 logging.basicConfig(
     filename='trades.log',
@@ -17,156 +28,340 @@ logging.basicConfig(
 )
 
 class TradingEngine:
-    def __init__(self, api_key, api_secret, data_manager, notifier, plotter):
-        self.twm = ThreadedWebsocketManager(api_key=api_key, api_secret=api_secret, testnet=False)
-        self.twm.start()
-        self.data = {
-            symbol: {
-                name: pd.DataFrame(columns=['open_time', 'open', 'high', 'low', 'close']).astype({
-                    'open_time': 'datetime64[ns]', 'open': 'float64', 'high': 'float64', 'low': 'float64', 'close': 'float64'
-                }) for name in CONFIGS
-            } for symbol in SYMBOLS
-        }
-        self.positions = {symbol: {name: [] for name in CONFIGS} for symbol in SYMBOLS}
-        self.sweeps_pl = {symbol: {name: [] for name in CONFIGS} for symbol in SYMBOLS}
-        self.sweeps_ph = {symbol: {name: [] for name in CONFIGS} for symbol in SYMBOLS}
-        self.used_pivots = {symbol: {name: set() for name in CONFIGS} for symbol in SYMBOLS}
-        self.pivot_history = {symbol: {name: {'ph': {}, 'pl': {}} for name in CONFIGS} for symbol in SYMBOLS}
-        self.notified_events = {symbol: {name: set() for name in CONFIGS} for symbol in SYMBOLS}
+    def __init__(self, api_key, api_secret, data_manager, notifier, plotter, twm=None, symbols=None, kline_cache_dir=KLINE_CACHE_DIR,
+                 window=DATA_WINDOW):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.symbols = list(symbols or SYMBOLS)
+        self.window = window  # Stratejinin geriye baktığı bar sayısı: mum penceresi ve pivot yaşı sınırı
+        self.twm = twm  # Verilmezse start() içinde gerçek websocket yöneticisi açılır (test/replay için sahte yönetici verilebilir)
+        # Sembol başına tek taban akış; aynı zaman dilimindeki botlar aynı mum verisini, göstergeleri ve pivotları paylaşır
+        self.timeframes = {name: config_timeframe(config) for name, config in CONFIGS.items()}
+        self.frame_configs = {}  # Zaman dilimi -> o barlarla çalışan botlar (taban önce, sonra artan sırada)
+        for name, timeframe in sorted(self.timeframes.items(), key=lambda item: (item[1] != BASE_TIMEFRAME, INTERVAL_MS[item[1]])):
+            self.frame_configs.setdefault(timeframe, []).append(name)
+        self.history_bars = window * max(INTERVAL_MS[tf] for tf in [BASE_TIMEFRAME, *self.frame_configs]) // INTERVAL_MS[BASE_TIMEFRAME]
+        self.bars = {symbol: {tf: CandleBuffer(window, tf) for tf in [BASE_TIMEFRAME, *self.frame_configs]} for symbol in self.symbols}
+        self.candles = {symbol: self.bars[symbol][BASE_TIMEFRAME] for symbol in self.symbols}  # Taban zaman dilimi
+        self.aggregators = {symbol: {tf: BarAggregator(BASE_TIMEFRAME, tf) for tf in self.frame_configs if tf != BASE_TIMEFRAME} for symbol in self.symbols}
+        # Kapanmış taban barların kalıcı kopyası; çevrimdışı motorlar (parity, replay) kendi dizinini verir
+        self.kline_caches = {symbol: KlineCache(symbol, BASE_TIMEFRAME, kline_cache_dir) for symbol in self.symbols}
+        self.positions = {symbol: {name: [] for name in CONFIGS} for symbol in self.symbols}
+        self.sweeps_pl = {symbol: {name: SweepTable('max') for name in CONFIGS} for symbol in self.symbols}
+        self.sweeps_ph = {symbol: {name: SweepTable('min') for name in CONFIGS} for symbol in self.symbols}
+        self.indicators = {symbol: {tf: self.register_indicators(CandleIndicators(), names) for tf, names in self.frame_configs.items()} for symbol in self.symbols}  # Kapanmış barlarla güncellenir
+        # Pivotlar open_time ile tanınır; kayıtlar pivot pencere dışına çıkınca düşer, kümeler sınırlıdır
+        self.used_pivots = {symbol: {name: DedupeStore(DEDUPE_MAX_ENTRIES) for name in CONFIGS} for symbol in self.symbols}
+        self.pivot_history = {symbol: {name: {'ph': {}, 'pl': {}} for name in CONFIGS} for symbol in self.symbols}
+        # Botlar sembol başına tek pivot kümesini paylaşır; aynı (LEFT, RIGHT) çifti bir kez hesaplanır
+        self.pivot_sets = {symbol: {tf: PivotSet((CONFIGS[name]["LEFT"], CONFIGS[name]["RIGHT"]) for name in names) for tf, names in self.frame_configs.items()} for symbol in self.symbols}
+        self.pivot_times = {symbol: {tf: {} for tf in self.frame_configs} for symbol in self.symbols}  # Mutlak bar sırası -> pivot barının open_time değeri
+        self.notified_events = {symbol: {name: DedupeStore(DEDUPE_MAX_ENTRIES) for name in CONFIGS} for symbol in self.symbols}
+        self.dedupe_ttl = {name: (window + 1) * INTERVAL_MS[tf] for name, tf in self.timeframes.items()}  # Pivotun pivot geçmişinde kalabileceği en uzun süre (ms)
         self.data_manager = data_manager
         self.notifier = notifier
         self.plotter = plotter
-        self.position_monitors = {symbol: {name: [] for name in CONFIGS} for symbol in SYMBOLS}
+        self.position_book = PositionBook()  # Açık pozisyonlar SL/TP seviyelerine göre indekslenir
+        self.pending_ticks = {}  # Sembol başına son kontrolden bu yana (en düşük, en yüksek) fiyat
+        self.tick_lock = threading.Lock()
+        self.tick_event = threading.Event()
+        self.monitor_thread = None
+        self.data_manager.price_feed.add_listener(self.on_price_tick)
         self.running = True
-        self.streams = {}
-        self.initial_data_loaded = {symbol: {name: False for name in CONFIGS} for symbol in SYMBOLS}  # Yeni: Veri yükleme kontrolü
+        self.socket = None
+        self.price_socket = None
+        self.dispatcher = SymbolDispatcher(self.process_candle, DISPATCH_WORKERS, DISPATCH_QUEUE_SIZE)  # Mesajlar sembol başına kuyruklara dağıtılır
+        self.initial_data_loaded = {symbol: False for symbol in self.symbols}  # Yeni: Veri yükleme kontrolü
+        self.last_closed_time = {symbol: None for symbol in self.symbols}  # Strateji çalıştırılan son kapanmış barın open_time değeri
+        self.weight_budget = WeightBudget()  # REST isteklerinin dakikalık ağırlık bütçesi
+        self.warmup = Warmup(self.load_initial_data, self.symbols, self.weight_budget)  # Semboller birbirini beklemeden yüklenir
+        self.restore_positions()
+
+    def register_indicators(self, indicators, config_names):
+        # Giriş koşullarının kapanış pencereleri: son CONSECUTIVE_CANDLES bar ve MIN..MAX bar gerisi
+        for config in (CONFIGS[name] for name in config_names):
+            window = config["MAX_CANDLES_FOR_SECOND_CONDITION"] - config["MIN_CANDLES_FOR_SECOND_CONDITION"] + 1
+            for mode in ('min', 'max'):
+                indicators.add('close', mode, config["CONSECUTIVE_CANDLES"])
+                indicators.add('close', mode, window, config["MIN_CANDLES_FOR_SECOND_CONDITION"])
+        return indicators
 
-    def load_initial_data(self, symbol, config_name):
-        if self.initial_data_loaded[symbol][config_name]:
+    def get_dataframe(self, symbol):
+        # DataFrame yalnızca plotter/panel ihtiyaç duyduğunda üretilir
+        return self.candles[symbol].to_frame()
+
+    def load_initial_data(self, symbol):
+        # Hatalar Warmup'a bırakılır; sembol kendi geri çekilme süresiyle tekrar denenir
+        if self.initial_data_loaded[symbol]:
             return  # Veri zaten yüklendiyse tekrar çekme
+        # Önbellekte yalnızca kapanmış barlar var; API'den sadece son kayıtlı bardan bu yana eksik kısım çekilir
+        cache = self.kline_caches[symbol]
+        with registry.timer('load_initial_data', symbol=symbol):
+            # Üst zaman dilimlerinin de pencere boyu bar dolsun diye taban geçmiş en büyük oranla çekilir
+            added = cache.backfill(self.data_manager.client, self.history_bars, self.weight_budget)
+            bars = cache.tail(self.history_bars)
+            columns = [bars[col] for col in CandleBuffer.COLUMNS]
+            self.candles[symbol].load(*columns)
+            for timeframe, aggregator in self.aggregators[symbol].items():
+                self.bars[symbol][timeframe].load(*aggregator.load(*columns))
+            for timeframe in self.frame_configs:
+                self.indicators[symbol][timeframe].reset(self.bars[symbol][timeframe])
+                self.update_pivot_history(symbol, timeframe, reset=True)
+        self.last_closed_time[symbol] = self.candles[symbol].last_open_time()
+        self.restore_sweeps(symbol)
+        self.initial_data_loaded[symbol] = True  # Bu noktadan sonra stream mesajları işlenir
+        logging.info(f"[{symbol}] {len(self.candles[symbol])} barlık geçmiş veri yüklendi ({added} yeni bar çekildi).")
+
+    def fill_gap(self, symbol, open_time):
+        # Isınma sırasında veya bağlantı kopukken kapanan barlar önbellek üzerinden sırayla işlenir
+        candles = self.candles[symbol]
+        cache = self.kline_caches[symbol]
         try:
-            start_time = int((datetime.now() - timedelta(minutes=3750)).timestamp() * 1000)  # Yaklaşık 62 saatlik veri (15m * 250)
-            klines = self.data_manager.client.futures_historical_klines(
-                symbol=symbol, interval='15m', start_str=str(start_time), limit=250
-            )
-            df = pd.DataFrame(klines, columns=['open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'])
-            df = df[['open_time', 'open', 'high', 'low', 'close']].astype({
-                'open_time': 'datetime64[ms]', 'open': 'float64', 'high': 'float64', 'low': 'float64', 'close': 'float64'
-            })
-            self.data[symbol][config_name] = df
-            self.update_pivot_history(symbol, config_name, CONFIGS[config_name])
-            self.initial_data_loaded[symbol][config_name] = True
-            logging.info(f"[{symbol}/{config_name}] 250 barlık geçmiş veri yüklendi.")
+            with registry.timer('fill_gap', symbol=symbol):
+                cache.backfill(self.data_manager.client, self.history_bars, self.weight_budget)
         except Exception as e:
-            logging.error(f"Geçmiş veri yükleme hatası [{symbol}/{config_name}]: {e}")
+            registry.inc('errors_total', source='fill_gap')
+            logging.error(f"Eksik bar tamamlama hatası [{symbol}]: {e}")
+            return
+        bars = cache.klines(candles.last_open_time() + 1, open_time - 1)
+        for row in bars[list(CandleBuffer.COLUMNS)].itertuples(index=False):
+            candles.append(*row)
+            self.process_closed_bar(symbol)
 
     def process_candle(self, msg):
         if isinstance(msg, dict) and 'data' in msg:
             kline = msg['data']
             symbol = kline['s']
             candle = kline['k']
-            timestamp = pd.to_datetime(int(candle['t']), unit='ms')
-            new_row = {
-                'open_time': timestamp,
-                'open': float(candle['o']),
-                'high': float(candle['h']),
-                'low': float(candle['l']),
-                'close': float(candle['c'])
-            }
-            for config_name, config in CONFIGS.items():
-                # İlk veri yüklenmediyse önce yükle
-                if not self.initial_data_loaded[symbol][config_name]:
-                    self.load_initial_data(symbol, config_name)
-                self.data[symbol][config_name] = pd.concat(
-                    [self.data[symbol][config_name], pd.DataFrame([new_row])],
-                    ignore_index=True
-                )
-                self.data[symbol][config_name] = self.data[symbol][config_name].tail(DATA_WINDOW)
-                self.update_pivot_history(symbol, config_name, config)
-                self.check_manipulation_zones(symbol, config_name, config)
-                self.run_strategy(symbol, config_name, config)
+            if not self.initial_data_loaded[symbol]:
+                return  # Sembol henüz ısınıyor; bu sürede kapanan barlar yükleme veya fill_gap ile gelir
+            row = (int(candle['t']), float(candle['o']), float(candle['h']), float(candle['l']), float(candle['c']))
+            candles = self.candles[symbol]
+            if not CLOSED_BARS_ONLY:
+                candles.append(*row)
+                self.process_closed_bar(symbol)
+                return
+            last_time = candles.last_open_time()
+            if last_time == row[0]:
+                candles.update_last(*row)  # Aynı bar: canlı barın üzerine yaz
+            elif last_time is None or row[0] > last_time:
+                if last_time is not None and self.last_closed_time[symbol] != last_time:
+                    # Önceki barın kapanış mesajı kaçırıldı, yeni bar eklenmeden önce kapanmış say; son canlı değerler
+                    # kesinleşmediği için önbelleğe yazılmaz, bar sonraki kapanışta REST'ten tamamlanır
+                    self.process_closed_bar(symbol, confirmed=False)
+                if last_time is not None and row[0] - last_time > self.kline_caches[symbol].interval_ms:
+                    self.fill_gap(symbol, row[0])
+                candles.append(*row)
+            else:
+                return  # Geç gelen eski bar güncellemesi
+            if candle['x'] and self.last_closed_time[symbol] != row[0]:
+                self.process_closed_bar(symbol)
+            else:
+                self.process_live_bar(symbol)
         else:
             logging.warning(f"Beklenmeyen WebSocket mesajı: {msg}")
 
-    def update_pivot_history(self, symbol, config_name, config):
-        df = self.data[symbol][config_name]
-        if len(df) < (config["LEFT"] + config["RIGHT"] + 1):
+    def process_closed_bar(self, symbol, confirmed=True):
+        # Pivot, sweep ve giriş kontrolleri bar başına yalnızca bir kez çalışır
+        # confirmed: bar kapanış mesajından (x=True) ya da REST'ten geldi; yalnızca bu barlar önbelleğe yazılır
+        candles = self.candles[symbol]
+        self.last_closed_time[symbol] = candles.last_open_time()
+        if CLOSED_BARS_ONLY and confirmed:
+            self.store_closed_bar(symbol)
+        if BASE_TIMEFRAME in self.frame_configs:
+            self.evaluate(symbol, BASE_TIMEFRAME)
+        bar = [candles.view(col)[-1] for col in CandleBuffer.COLUMNS]
+        for timeframe, aggregator in self.aggregators[symbol].items():
+            # Üst zaman dilimi barı, son taban barı kapandığında tamamlanır ve aynı adımlarla değerlendirilir
+            for row in aggregator.add(*bar):
+                self.bars[symbol][timeframe].append(*row)
+                self.evaluate(symbol, timeframe)
+
+    def store_closed_bar(self, symbol):
+        # Önbellek boşluksuz büyür: geride kalmışsa (kaçırılan kapanış, yazma hatası) eksik barlar kapanış mesajı
+        # yerine REST'ten çekilir; hata olursa bir sonraki kapanışta tekrar denenir
+        cache = self.kline_caches[symbol]
+        bar = [self.candles[symbol].view(col)[-1] for col in CandleBuffer.COLUMNS]
+        last = cache.last_open_time()
+        try:
+            if last is None or bar[0] - last == cache.interval_ms:
+                with registry.timer('kline_cache_append', symbol=symbol):
+                    cache.append(*bar)
+            elif bar[0] > last:
+                with registry.timer('fill_gap', symbol=symbol):
+                    cache.backfill(self.data_manager.client, self.history_bars, self.weight_budget)
+        except Exception as e:
+            registry.inc('errors_total', source='kline_cache')
+            logging.error(f"Kline önbelleği yazma hatası [{symbol}]: {e}")
+
+    def evaluate(self, symbol, timeframe):
+        # Mum, göstergeler, pivotlar ve fiyat zaman dilimi başına bir kez işlenir; botlar yalnızca kendi eşiklerini uygular
+        self.indicators[symbol][timeframe].update(self.bars[symbol][timeframe])
+        with registry.timer('update_pivot_history', symbol=symbol):
+            self.update_pivot_history(symbol, timeframe)
+        current_price = self.data_manager.get_current_futures_price(symbol)
+        now = self.last_closed_time[symbol]
+        for config_name in self.frame_configs[timeframe]:
+            config = CONFIGS[config_name]
+            self.used_pivots[symbol][config_name].expire(now)
+            self.notified_events[symbol][config_name].expire(now)
+            with registry.timer('check_manipulation_zones', symbol=symbol, config=config_name):
+                self.check_manipulation_zones(symbol, config_name, config, current_price)
+            with registry.timer('run_strategy', symbol=symbol, config=config_name):
+                self.run_strategy(symbol, config_name, config)
+
+    def process_live_bar(self, symbol):
+        # Bar içi güncellemelerde yalnızca fiyata bağlı manipülasyon uyarıları kontrol edilir
+        current_price = self.data_manager.get_current_futures_price(symbol)
+        for config_name, config in CONFIGS.items():
+            with registry.timer('check_manipulation_zones', symbol=symbol, config=config_name):
+                self.check_manipulation_zones(symbol, config_name, config, current_price)
+
+    def update_pivot_history(self, symbol, timeframe=BASE_TIMEFRAME, reset=False):
+        candles = self.bars[symbol][timeframe]
+        pivots = self.pivot_sets[symbol][timeframe]
+        high = candles.view('high')
+        low = candles.view('low')
+        if reset:
+            pivots.reset(high, low, candles.count)
+        else:
+            pivots.update(high, low, candles.count)
+        # Pivotlar mutlak bar sırası ile tutulur; pencere kaysa da aynı sayı aynı barı gösterir
+        current_idx = candles.count - 1
+        history = {pair: {
+            'ph': {k: v for k, v in pivots.ph[pair].items() if current_idx - k <= self.window},
+            'pl': {k: v for k, v in pivots.pl[pair].items() if current_idx - k <= self.window},
+        } for pair in pivots.pairs}
+        for config_name in self.frame_configs[timeframe]:
+            config = CONFIGS[config_name]
+            self.pivot_history[symbol][config_name] = history[(config["LEFT"], config["RIGHT"])]
+        times = {} if reset else self.pivot_times[symbol][timeframe]  # load() bar sırasını baştan başlatır
+        self.pivot_times[symbol][timeframe] = {k: times[k] if k in times else self.bar_time(symbol, timeframe, k)
+                                               for pair in history.values() for side in pair.values() for k in side}
+
+    def bar_time(self, symbol, timeframe, k):
+        # Mutlak bar sırasındaki barın open_time değeri; pencereden yeni çıkmışsa son bardan geriye sayılır
+        candles = self.bars[symbol][timeframe]
+        pos = k - candles.first_bar()
+        if pos >= 0:
+            return int(candles.view('open_time')[pos])
+        return candles.last_open_time() + (pos - len(candles) + 1) * INTERVAL_MS[timeframe]
+
+    def record_sweep(self, symbol, config_name, event, side, sweep):
+        # Journal'a sweep barının open_time değeri yazılır; mutlak bar sırası yalnızca bu süreç içinde anlamlıdır
+        sweep = list(sweep)
+        sweep[3] = self.bar_time(symbol, self.timeframes[config_name], sweep[3])
+        self.data_manager.record_sweep(symbol, config_name, event, side, sweep)
+
+    def restore_positions(self):
+        # Yeniden başlatılan süreç (ör. çöken shard) açık pozisyonları ve kullanılmış pivotları journal'dan geri alır;
+        # aksi halde açık işlemler hiç kapanmaz, bakiye ve istatistikler kesinleşmez
+        journals = getattr(self.data_manager, 'journals', None)
+        if not journals:
             return
-        high = df['high'].values
-        low = df['low'].values
-        ph = pivot_high(high, config["LEFT"], config["RIGHT"])
-        pl = pivot_low(low, config["LEFT"], config["RIGHT"])
-        ph_dict = {idx: price for idx, price in ph}
-        pl_dict = {idx: price for idx, price in pl}
-        current_idx = len(df) - 1
-        self.pivot_history[symbol][config_name]['ph'] = {k: v for k, v in ph_dict.items() if current_idx - k <= 250}
-        self.pivot_history[symbol][config_name]['pl'] = {k: v for k, v in pl_dict.items() if current_idx - k <= 250}
+        for symbol in self.symbols:
+            for config_name in CONFIGS:
+                state = journals[symbol][config_name].state
+                for pos in state["positions"]:
+                    pos = pos | {key: pd.Timestamp(pos[key]) for key in ('entry_time', 'sweep_time') if pos.get(key) is not None}
+                    self.positions[symbol][config_name].append(pos)
+                    self.position_book.add(symbol, config_name, pos)
+                used = self.used_pivots[symbol][config_name]
+                for pivot_time in state["used_pivots"]:
+                    used.add(pivot_time, pivot_time + self.dedupe_ttl[config_name])
+                if state["positions"]:
+                    logging.info(f"[{symbol}/{config_name}] {len(state['positions'])} açık pozisyon journal'dan geri yüklendi.")
 
-    def check_manipulation_zones(self, symbol, config_name, config):
-        df = self.data[symbol][config_name]
-        if len(df) < 1:
+    def restore_sweeps(self, symbol):
+        # Bekleyen sweep'ler bar zamanıyla saklanır; yüklenen pencerenin mutlak bar sırasına çevrilir ve ikinci koşulun
+        # en kötü kapanışı pencereden yeniden hesaplanır
+        journals = getattr(self.data_manager, 'journals', None)
+        if not journals:
             return
-        current_price = self.data_manager.get_current_futures_price(symbol)
-        if current_price is None:
+        for config_name, config in CONFIGS.items():
+            timeframe = self.timeframes[config_name]
+            candles = self.bars[symbol][timeframe]
+            if not len(candles):
+                continue
+            state = journals[symbol][config_name].state
+            close = candles.view('close')
+            first = candles.first_bar()
+            last = candles.count - 1
+            second_min = config["MIN_CANDLES_FOR_SECOND_CONDITION"]
+            for side, tables in (('pl', self.sweeps_pl), ('ph', self.sweeps_ph)):
+                table = tables[symbol][config_name]
+                for pivot_time, pivot_price, sweep_extreme, sweep_time, manip_low, manip_high in state[f"sweeps_{side}"]:
+                    seq = last - (candles.last_open_time() - int(sweep_time)) // INTERVAL_MS[timeframe]
+                    lo, hi = max(seq, first) - first, last - second_min - first + 1
+                    seen = close[lo:hi] if hi > lo else close[:0]
+                    worst = (seen.max() if table.worst == 'max' else seen.min()) if len(seen) else None
+                    table.append((pivot_time, pivot_price, sweep_extreme, seq, manip_low, manip_high), worst)
+
+    def notify_once(self, symbol, config_name, key, message, expires_at):
+        notified = self.notified_events[symbol][config_name]
+        if key not in notified:
+            self.notifier.send_message(message)
+            notified.add(key, expires_at)
+
+    def check_manipulation_zones(self, symbol, config_name, config, current_price):
+        timeframe = self.timeframes[config_name]
+        if len(self.bars[symbol][timeframe]) < 1 or current_price is None:
             return
+        ttl = self.dedupe_ttl[config_name]
         ph_dict = self.pivot_history[symbol][config_name]['ph']
         pl_dict = self.pivot_history[symbol][config_name]['pl']
+        used = self.used_pivots[symbol][config_name]
+        times = self.pivot_times[symbol][timeframe]
         for ph_idx, ph_price in ph_dict.items():
-            if ph_idx in self.used_pivots[symbol][config_name]:
+            ph_time = times[ph_idx]
+            if ph_time in used:
                 continue
-            proximity_key = f"ph_proximity_{ph_price}"
-            manip_key = f"ph_manip_{ph_price}"
+            expires_at = ph_time + ttl
             proximity = abs(current_price - ph_price) / ph_price
-            if proximity < PROXIMITY_THRESHOLD and proximity_key not in self.notified_events[symbol][config_name]:
-                self.notifier.send_message(f"[{symbol}/{config_name}] UYARI: Fiyat Pivot High ({ph_price}) manipülasyon bölgesine yakın! (Mesafe: {proximity*100:.2f}%)")
-                self.notified_events[symbol][config_name].add(proximity_key)
+            if proximity < PROXIMITY_THRESHOLD:
+                self.notify_once(symbol, config_name, ('ph_proximity', ph_time), f"[{symbol}/{config_name}] UYARI: Fiyat Pivot High ({ph_price}) manipülasyon bölgesine yakın! (Mesafe: {proximity*100:.2f}%)", expires_at)
             if current_price > ph_price:
                 manip_ratio = (current_price - ph_price) / ph_price
-                if manip_ratio >= config["MANIPULATION_THRESHOLD"] and manip_key not in self.notified_events[symbol][config_name]:
-                    self.notifier.send_message(f"[{symbol}/{config_name}] DİKKAT: Manipülasyon olabilir! Pivot High ({ph_price}) aşıldı, oran: {manip_ratio*100:.2f}%")
-                    self.notified_events[symbol][config_name].add(manip_key)
+                if manip_ratio >= config["MANIPULATION_THRESHOLD"]:
+                    self.notify_once(symbol, config_name, ('ph_manip', ph_time), f"[{symbol}/{config_name}] DİKKAT: Manipülasyon olabilir! Pivot High ({ph_price}) aşıldı, oran: {manip_ratio*100:.2f}%", expires_at)
         for pl_idx, pl_price in pl_dict.items():
-            if pl_idx in self.used_pivots[symbol][config_name]:
+            pl_time = times[pl_idx]
+            if pl_time in used:
                 continue
-            proximity_key = f"pl_proximity_{pl_price}"
-            manip_key = f"pl_manip_{pl_price}"
+            expires_at = pl_time + ttl
             proximity = abs(pl_price - current_price) / pl_price
-            if proximity < PROXIMITY_THRESHOLD and proximity_key not in self.notified_events[symbol][config_name]:
-                self.notifier.send_message(f"[{symbol}/{config_name}] UYARI: Fiyat Pivot Low ({pl_price}) manipülasyon bölgesine yakın! (Mesafe: {proximity*100:.2f}%)")
-                self.notified_events[symbol][config_name].add(proximity_key)
+            if proximity < PROXIMITY_THRESHOLD:
+                self.notify_once(symbol, config_name, ('pl_proximity', pl_time), f"[{symbol}/{config_name}] UYARI: Fiyat Pivot Low ({pl_price}) manipülasyon bölgesine yakın! (Mesafe: {proximity*100:.2f}%)", expires_at)
             if current_price < pl_price:
                 manip_ratio = (pl_price - current_price) / pl_price
-                if manip_ratio >= config["MANIPULATION_THRESHOLD"] and manip_key not in self.notified_events[symbol][config_name]:
-                    self.notifier.send_message(f"[{symbol}/{config_name}] DİKKAT: Manipülasyon olabilir! Pivot Low ({pl_price}) altına inildi, oran: {manip_ratio*100:.2f}%")
-                    self.notified_events[symbol][config_name].add(manip_key)
+                if manip_ratio >= config["MANIPULATION_THRESHOLD"]:
+                    self.notify_once(symbol, config_name, ('pl_manip', pl_time), f"[{symbol}/{config_name}] DİKKAT: Manipülasyon olabilir! Pivot Low ({pl_price}) altına inildi, oran: {manip_ratio*100:.2f}%", expires_at)
+
+    def on_price_tick(self, symbol, price):
+        # Fiyat stream thread'inde çağrılır: yalnızca aralık güncellenir, kontrol izleme thread'inde yapılır
+        with self.tick_lock:
+            low, high = self.pending_ticks.get(symbol, (price, price))
+            self.pending_ticks[symbol] = (min(low, price), max(high, price))
+        self.tick_event.set()
 
-    def monitor_position(self, symbol, config_name, pos):
-        while self.running and pos in self.positions[symbol][config_name]:
-            try:
-                current_price = self.data_manager.get_current_futures_price(symbol)
-                if current_price is None:
-                    time.sleep(1)
-                    continue
-                if pos['type'] == 'long':
-                    if current_price <= pos['sl']:
-                        self.close_position(symbol, config_name, pos, 'sl')
-                        break
-                    elif current_price >= pos['tp']:
-                        self.close_position(symbol, config_name, pos, 'tp')
-                        break
-                elif pos['type'] == 'short':
-                    if current_price >= pos['sl']:
-                        self.close_position(symbol, config_name, pos, 'sl')
-                        break
-                    elif current_price <= pos['tp']:
-                        self.close_position(symbol, config_name, pos, 'tp')
-                        break
-                time.sleep(1)
-            except Exception as e:
-                logging.error(f"Pozisyon izleme hatası [{symbol}/{config_name}]: {e}")
-                time.sleep(1)
+    def monitor_positions(self):
+        # Açık pozisyon sayısından bağımsız tek izleme thread'i
+        while self.running:
+            if not self.tick_event.wait(timeout=1):
+                continue
+            with self.tick_lock:
+                ticks = self.pending_ticks
+                self.pending_ticks = {}
+                self.tick_event.clear()
+            for symbol, (low, high) in ticks.items():
+                try:
+                    for pos_id, (_, config_name, pos), reason in self.position_book.check(symbol, low, high):
+                        self.close_position(symbol, config_name, pos_id, pos, reason)
+                except Exception as e:
+                    registry.inc('errors_total', source='monitor')
+                    logging.error(f"Pozisyon izleme hatası [{symbol}]: {e}")
 
-    def close_position(self, symbol, config_name, pos, reason):
+    def close_position(self, symbol, config_name, pos_id, pos, reason):
         if reason == 'sl':
             profit = -pos['risk_amount']
             exit_price = pos['sl']
@@ -176,225 +371,226 @@ class TradingEngine:
             exit_price = pos['tp']
             message = f"[{symbol}/{config_name}] {pos['type'].capitalize()} işlem kapandı (TP): Entry: {pos['entry_price']}, Exit: {exit_price}, Profit: {profit}"
         trade = pos | {'exit_time': datetime.now(), 'exit_price': exit_price, 'profit': profit}
-        event_key = f"close_{pos['entry_time']}_{reason}"
-        if event_key not in self.notified_events[symbol][config_name]:
-            self.notifier.send_message(message)
-            self.notified_events[symbol][config_name].add(event_key)
-        self.data_manager.close_position(symbol, config_name, trade, self)
-        self.plotter.save_trade_graph(symbol, config_name, trade, self.data[symbol][config_name], is_opening=False)
+        # Yan etkilerden biri hata verse de pozisyon bir sonraki tick'te ikinci kez kapatılmasın
         self.positions[symbol][config_name].remove(pos)
+        self.position_book.remove(pos_id)
+        candles = self.bars[symbol][self.timeframes[config_name]]
+        self.notify_once(symbol, config_name, ('close', str(pos['entry_time']), reason), message, candles.last_open_time() + self.dedupe_ttl[config_name])
+        self.data_manager.close_position(symbol, config_name, trade, self)
+        self.plotter.save_trade_graph(symbol, config_name, trade, candles, is_opening=False)
+        registry.inc('trades_total', symbol=symbol, config=config_name, event='closed', side=pos['type'], reason=reason)
         logging.info(f"Trade closed: {trade}")
 
     def run_strategy(self, symbol, config_name, config):
-        df = self.data[symbol][config_name]
-        if len(df) < (config["LEFT"] + config["RIGHT"] + 1):
+        timeframe = self.timeframes[config_name]
+        candles = self.bars[symbol][timeframe]
+        ttl = self.dedupe_ttl[config_name]
+        if len(candles) < (config["LEFT"] + config["RIGHT"] + 1):
             return
-        high = df['high'].values
-        low = df['low'].values
-        close = df['close'].values
-        open_ = df['open'].values
-        index = df['open_time']
-        ph = pivot_high(high, config["LEFT"], config["RIGHT"])
-        pl = pivot_low(low, config["LEFT"], config["RIGHT"])
-        ph_dict = {idx: price for idx, price in ph}
-        pl_dict = {idx: price for idx, price in pl}
-        i = len(df) - 1
-        current_high = float(high[i])
-        current_low = float(low[i])
-        current_close = float(close[i])
-        active_ph = {k: v for k, v in ph_dict.items() if k > i - DATA_WINDOW and k < i}
-        active_pl = {k: v for k, v in pl_dict.items() if k > i - DATA_WINDOW and k < i}
+        ph_dict = self.pivot_history[symbol][config_name]['ph']
+        pl_dict = self.pivot_history[symbol][config_name]['pl']
+        i = candles.count - 1  # Mutlak bar sırası; dizilerdeki konum i - offset
+        offset = candles.first_bar()
+        current_high = float(candles.view('high')[i - offset])
+        current_low = float(candles.view('low')[i - offset])
+        active_ph = {k: v for k, v in ph_dict.items() if k > i - self.window and k < i}
+        active_pl = {k: v for k, v in pl_dict.items() if k > i - self.window and k < i}
+        used = self.used_pivots[symbol][config_name]
+        times = self.pivot_times[symbol][timeframe]
         
         for ph_idx, ph_price in active_ph.items():
-            if ph_idx in self.used_pivots[symbol][config_name]:
+            ph_time = times[ph_idx]
+            if ph_time in used:
                 continue
             if current_high > ph_price:
                 manipulation_ratio = (current_high - ph_price) / ph_price
                 if manipulation_ratio >= config["MANIPULATION_THRESHOLD"]:
-                    self.sweeps_ph[symbol][config_name].append((ph_idx, ph_price, current_high, i, current_low, current_high))
-                    self.used_pivots[symbol][config_name].add(ph_idx)
-                    event_key = f"sweep_ph_{ph_price}"
-                    if event_key not in self.notified_events[symbol][config_name]:
-                        self.notifier.send_message(f"[{symbol}/{config_name}] Sell side sweep: Pivot High: {ph_price}, Sweep High: {current_high}")
-                        self.notified_events[symbol][config_name].add(event_key)
+                    sweep = (ph_time, ph_price, current_high, i, current_low, current_high)
+                    self.sweeps_ph[symbol][config_name].append(sweep)
+                    used.add(ph_time, ph_time + ttl)
+                    self.record_sweep(symbol, config_name, 'added', 'ph', sweep)
+                    registry.inc('sweeps_total', symbol=symbol, config=config_name, side='ph')
+                    self.notify_once(symbol, config_name, ('sweep_ph', ph_time), f"[{symbol}/{config_name}] Sell side sweep: Pivot High: {ph_price}, Sweep High: {current_high}", ph_time + ttl)
         
         for pl_idx, pl_price in active_pl.items():
-            if pl_idx in self.used_pivots[symbol][config_name]:
+            pl_time = times[pl_idx]
+            if pl_time in used:
                 continue
             if current_low < pl_price:
                 manipulation_ratio = (pl_price - current_low) / pl_price
                 if manipulation_ratio >= config["MANIPULATION_THRESHOLD"]:
-                    self.sweeps_pl[symbol][config_name].append((pl_idx, pl_price, current_low, i, current_low, current_high))
-                    self.used_pivots[symbol][config_name].add(pl_idx)
-                    event_key = f"sweep_pl_{pl_price}"
-                    if event_key not in self.notified_events[symbol][config_name]:
-                        self.notifier.send_message(f"[{symbol}/{config_name}] Buy side sweep: Pivot Low: {pl_price}, Sweep Low: {current_low}")
-                        self.notified_events[symbol][config_name].add(event_key)
-        
-        for sweep in self.sweeps_pl[symbol][config_name][:]:
-            pl_idx, pl_price, sweep_low, sweep_idx, manip_low, manip_high = sweep
-            bars_since_sweep = i - sweep_idx
-            if bars_since_sweep > config["MAX_CANDLES"]:
-                self.sweeps_pl[symbol][config_name].remove(sweep)
-                continue
-            if current_close <= pl_price:
-                manip_low = min(manip_low, current_low)
-                manip_high = max(manip_high, current_high)
-                self.sweeps_pl[symbol][config_name][self.sweeps_pl[symbol][config_name].index(sweep)] = (pl_idx, pl_price, sweep_low, sweep_idx, manip_low, manip_high)
-            if bars_since_sweep >= config["CONSECUTIVE_CANDLES"]:
-                closes_above = all(float(close[i - j]) > pl_price for j in range(config["CONSECUTIVE_CANDLES"]))
-                if closes_above:
-                    entry_price = float(open_[i])
-                    sl_price = manip_low
-                    sl_distance = entry_price - sl_price
-                    if sl_distance > 0:
-                        risk_amount = config["INITIAL_BALANCE"] * config["MAX_RISK"]
-                        position_size = risk_amount / sl_distance
-                        tp_price = entry_price + sl_distance * config["RISK_REWARD_RATIO"]
-                        trade = {
-                            'type': 'long', 'entry_time': index[i], 'entry_price': entry_price,
-                            'sl': sl_price, 'tp': tp_price, 'size': position_size,
-                            'pivot_price': pl_price, 'sweep_low': sweep_low, 'sweep_time': index[sweep_idx],
-                            'manip_low': manip_low, 'manip_high': manip_high, 'risk_amount': risk_amount
-                        }
-                        event_key = f"long_open_{index[i]}"
-                        if event_key not in self.notified_events[symbol][config_name]:
-                            self.notifier.send_message(f"[{symbol}/{config_name}] Long işlem açıldı: Entry: {entry_price}, SL: {sl_price}, TP: {tp_price}")
-                            self.notified_events[symbol][config_name].add(event_key)
-                        self.positions[symbol][config_name].append(trade)
-                        self.plotter.save_trade_graph(symbol, config_name, trade, self.data[symbol][config_name], is_opening=True)
-                        self.sweeps_pl[symbol][config_name].remove(sweep)
-                        self.data_manager.save_data(symbol, config_name, self)
-                        monitor_thread = threading.Thread(target=self.monitor_position, args=(symbol, config_name, trade))
-                        monitor_thread.daemon = True
-                        monitor_thread.start()
-                        self.position_monitors[symbol][config_name].append(monitor_thread)
-            if bars_since_sweep >= config["MIN_CANDLES_FOR_SECOND_CONDITION"]:
-                closes_below = all(float(close[i - j]) < pl_price for j in range(config["MIN_CANDLES_FOR_SECOND_CONDITION"], min(bars_since_sweep + 1, config["MAX_CANDLES_FOR_SECOND_CONDITION"] + 1)))
-                if closes_below and current_close > pl_price:
-                    entry_price = float(open_[i])
-                    sl_price = manip_low
-                    sl_distance = entry_price - sl_price
-                    if sl_distance > 0:
-                        risk_amount = config["INITIAL_BALANCE"] * config["MAX_RISK"]
-                        position_size = risk_amount / sl_distance
-                        tp_price = entry_price + sl_distance * config["RISK_REWARD_RATIO"]
-                        trade = {
-                            'type': 'long', 'entry_time': index[i], 'entry_price': entry_price,
-                            'sl': sl_price, 'tp': tp_price, 'size': position_size,
-                            'pivot_price': pl_price, 'sweep_low': sweep_low, 'sweep_time': index[sweep_idx],
-                            'manip_low': manip_low, 'manip_high': manip_high, 'risk_amount': risk_amount
-                        }
-                        event_key = f"long_open_{index[i]}"
-                        if event_key not in self.notified_events[symbol][config_name]:
-                            self.notifier.send_message(f"[{symbol}/{config_name}] Long işlem açıldı: Entry: {entry_price}, SL: {sl_price}, TP: {tp_price}")
-                            self.notified_events[symbol][config_name].add(event_key)
-                        self.positions[symbol][config_name].append(trade)
-                        self.plotter.save_trade_graph(symbol, config_name, trade, self.data[symbol][config_name], is_opening=True)
-                        self.sweeps_pl[symbol][config_name].remove(sweep)
-                        self.data_manager.save_data(symbol, config_name, self)
-                        monitor_thread = threading.Thread(target=self.monitor_position, args=(symbol, config_name, trade))
-                        monitor_thread.daemon = True
-                        monitor_thread.start()
-                        self.position_monitors[symbol][config_name].append(monitor_thread)
+                    sweep = (pl_time, pl_price, current_low, i, current_low, current_high)
+                    self.sweeps_pl[symbol][config_name].append(sweep)
+                    used.add(pl_time, pl_time + ttl)
+                    self.record_sweep(symbol, config_name, 'added', 'pl', sweep)
+                    registry.inc('sweeps_total', symbol=symbol, config=config_name, side='pl')
+                    self.notify_once(symbol, config_name, ('sweep_pl', pl_time), f"[{symbol}/{config_name}] Buy side sweep: Pivot Low: {pl_price}, Sweep Low: {current_low}", pl_time + ttl)
         
-        for sweep in self.sweeps_ph[symbol][config_name][:]:
-            ph_idx, ph_price, sweep_high, sweep_idx, manip_low, manip_high = sweep
-            bars_since_sweep = i - sweep_idx
-            if bars_since_sweep > config["MAX_CANDLES"]:
-                self.sweeps_ph[symbol][config_name].remove(sweep)
-                continue
-            if current_close >= ph_price:
-                manip_low = min(manip_low, current_low)
-                manip_high = max(manip_high, current_high)
-                self.sweeps_ph[symbol][config_name][self.sweeps_ph[symbol][config_name].index(sweep)] = (ph_idx, ph_price, sweep_high, sweep_idx, manip_low, manip_high)
-            if bars_since_sweep >= config["CONSECUTIVE_CANDLES"]:
-                closes_below = all(float(close[i - j]) < ph_price for j in range(config["CONSECUTIVE_CANDLES"]))
-                if closes_below:
-                    entry_price = float(open_[i])
-                    sl_price = manip_high
-                    sl_distance = sl_price - entry_price
-                    if sl_distance > 0:
-                        risk_amount = config["INITIAL_BALANCE"] * config["MAX_RISK"]
-                        position_size = risk_amount / sl_distance
-                        tp_price = entry_price - sl_distance * config["RISK_REWARD_RATIO"]
-                        trade = {
-                            'type': 'short', 'entry_time': index[i], 'entry_price': entry_price,
-                            'sl': sl_price, 'tp': tp_price, 'size': position_size,
-                            'pivot_price': ph_price, 'sweep_high': sweep_high, 'sweep_time': index[sweep_idx],
-                            'manip_low': manip_low, 'manip_high': manip_high, 'risk_amount': risk_amount
-                        }
-                        event_key = f"short_open_{index[i]}"
-                        if event_key not in self.notified_events[symbol][config_name]:
-                            self.notifier.send_message(f"[{symbol}/{config_name}] Short işlem açıldı: Entry: {entry_price}, SL: {sl_price}, TP: {tp_price}")
-                            self.notified_events[symbol][config_name].add(event_key)
-                        self.positions[symbol][config_name].append(trade)
-                        self.plotter.save_trade_graph(symbol, config_name, trade, self.data[symbol][config_name], is_opening=True)
-                        self.sweeps_ph[symbol][config_name].remove(sweep)
-                        self.data_manager.save_data(symbol, config_name, self)
-                        monitor_thread = threading.Thread(target=self.monitor_position, args=(symbol, config_name, trade))
-                        monitor_thread.daemon = True
-                        monitor_thread.start()
-                        self.position_monitors[symbol][config_name].append(monitor_thread)
-            if bars_since_sweep >= config["MIN_CANDLES_FOR_SECOND_CONDITION"]:
-                closes_above = all(float(close[i - j]) > ph_price for j in range(config["MIN_CANDLES_FOR_SECOND_CONDITION"], min(bars_since_sweep + 1, config["MAX_CANDLES_FOR_SECOND_CONDITION"] + 1)))
-                if closes_above and current_close < ph_price:
-                    entry_price = float(open_[i])
-                    sl_price = manip_high
-                    sl_distance = sl_price - entry_price
-                    if sl_distance > 0:
-                        risk_amount = config["INITIAL_BALANCE"] * config["MAX_RISK"]
-                        position_size = risk_amount / sl_distance
-                        tp_price = entry_price - sl_distance * config["RISK_REWARD_RATIO"]
-                        trade = {
-                            'type': 'short', 'entry_time': index[i], 'entry_price': entry_price,
-                            'sl': sl_price, 'tp': tp_price, 'size': position_size,
-                            'pivot_price': ph_price, 'sweep_high': sweep_high, 'sweep_time': index[sweep_idx],
-                            'manip_low': manip_low, 'manip_high': manip_high, 'risk_amount': risk_amount
-                        }
-                        event_key = f"short_open_{index[i]}"
-                        if event_key not in self.notified_events[symbol][config_name]:
-                            self.notifier.send_message(f"[{symbol}/{config_name}] Short işlem açıldı: Entry: {entry_price}, SL: {sl_price}, TP: {tp_price}")
-                            self.notified_events[symbol][config_name].add(event_key)
-                        self.positions[symbol][config_name].append(trade)
-                        self.plotter.save_trade_graph(symbol, config_name, trade, self.data[symbol][config_name], is_opening=True)
-                        self.sweeps_ph[symbol][config_name].remove(sweep)
-                        self.data_manager.save_data(symbol, config_name, self)
-                        monitor_thread = threading.Thread(target=self.monitor_position, args=(symbol, config_name, trade))
-                        monitor_thread.daemon = True
-                        monitor_thread.start()
-                        self.position_monitors[symbol][config_name].append(monitor_thread)
+        self.process_sweeps(symbol, config_name, config, 'pl')
+        self.process_sweeps(symbol, config_name, config, 'ph')
+
+    def process_sweeps(self, symbol, config_name, config, side):
+        # Bekleyen tüm sweep'ler tek adımda değerlendirilir; long (pl) ve short (ph) aynı yolu aynalanmış karşılaştırmalarla izler
+        table = (self.sweeps_pl if side == 'pl' else self.sweeps_ph)[symbol][config_name]
+        if not len(table):
+            return
+        is_long = side == 'pl'
+        timeframe = self.timeframes[config_name]
+        candles = self.bars[symbol][timeframe]
+        indicators = self.indicators[symbol][timeframe]
+        close = candles.view('close')
+        i = candles.count - 1
+        pos = i - candles.first_bar()
+        current_close = float(close[pos])
+        current_low = float(candles.view('low')[pos])
+        current_high = float(candles.view('high')[pos])
+        entry_price = float(candles.view('open')[pos])
+        consecutive = config["CONSECUTIVE_CANDLES"]
+        second_min = config["MIN_CANDLES_FOR_SECOND_CONDITION"]
+        second_max = config["MAX_CANDLES_FOR_SECOND_CONDITION"]
+        pivot_price = table.column('pivot_price')
+        bars_since_sweep = i - table.column('sweep_idx')
+        # Kapanış koşulları bar başına güncellenen göstergelerden okunur; her sweep tek karşılaştırma yapar.
+        # İkinci koşul penceresi [max(sweep, i - MAX), i - MIN]: sweep MAX bardan gençse sweep başına izlenen değer,
+        # değilse tüm sweep'ler için ortak kayan pencere kullanılır
+        if pos >= second_min:
+            table.track_worst(bars_since_sweep >= second_min, float(close[pos - second_min]))
+        window = second_max - second_min + 1
+        if is_long:
+            first = indicators.value('close', 'min', consecutive) > pivot_price
+            beyond = current_close <= pivot_price
+            reclaimed = current_close > pivot_price
+            sliding = indicators.value('close', 'max', window, second_min)
+        else:
+            first = indicators.value('close', 'max', consecutive) < pivot_price
+            beyond = current_close >= pivot_price
+            reclaimed = current_close < pivot_price
+            sliding = indicators.value('close', 'min', window, second_min)
+        worst = np.where(bars_since_sweep > second_max, sliding, table.column('second_worst'))
+        expired = bars_since_sweep > config["MAX_CANDLES"]
+        live = ~expired
+        extended = live & beyond
+        table.extend_manip(extended, current_low, current_high)
+        second = (bars_since_sweep >= second_min) & reclaimed & ((worst < pivot_price) if is_long else (worst > pivot_price))
+        sl_price = table.column('manip_low' if is_long else 'manip_high')
+        sl_distance = entry_price - sl_price if is_long else sl_price - entry_price
+        entered = live & (((bars_since_sweep >= consecutive) & first) | second) & (sl_distance > 0)
+        for n in np.flatnonzero(expired | extended | entered):
+            sweep = table.row(n)
+            if expired[n]:
+                self.record_sweep(symbol, config_name, 'removed', side, sweep)
+            elif extended[n]:
+                self.record_sweep(symbol, config_name, 'updated', side, sweep)
+            else:
+                self.open_position(symbol, config_name, config, side, sweep, entry_price)
+        table.remove(expired | entered)
+
+    def open_position(self, symbol, config_name, config, side, sweep, entry_price):
+        pivot_time, pivot_price, sweep_extreme, sweep_idx, manip_low, manip_high = sweep
+        candles = self.bars[symbol][self.timeframes[config_name]]
+        offset = candles.first_bar()
+        i = candles.count - 1
+        is_long = side == 'pl'
+        sl_price = manip_low if is_long else manip_high
+        sl_distance = abs(entry_price - sl_price)
+        risk_amount = config["INITIAL_BALANCE"] * config["MAX_RISK"]
+        position_size = risk_amount / sl_distance
+        tp_price = entry_price + sl_distance * config["RISK_REWARD_RATIO"] * (1 if is_long else -1)
+        trade = {
+            'type': 'long' if is_long else 'short', 'entry_time': candles.time_at(i - offset), 'entry_price': entry_price,
+            'sl': sl_price, 'tp': tp_price, 'size': position_size,
+            'pivot_price': pivot_price, 'sweep_low' if is_long else 'sweep_high': sweep_extreme, 'sweep_time': candles.time_at(sweep_idx - offset),
+            'manip_low': manip_low, 'manip_high': manip_high, 'risk_amount': risk_amount
+        }
+        entry_ms = int(candles.view('open_time')[i - offset])
+        self.notify_once(symbol, config_name, (f"{trade['type']}_open", entry_ms), f"[{symbol}/{config_name}] {trade['type'].capitalize()} işlem açıldı: Entry: {entry_price}, SL: {sl_price}, TP: {tp_price}", entry_ms + self.dedupe_ttl[config_name])
+        self.positions[symbol][config_name].append(trade)
+        self.plotter.save_trade_graph(symbol, config_name, trade, candles, is_opening=True)
+        self.record_sweep(symbol, config_name, 'removed', side, sweep)
+        self.data_manager.record_position_opened(symbol, config_name, trade)
+        self.position_book.add(symbol, config_name, trade)
+        registry.inc('trades_total', symbol=symbol, config=config_name, event='opened', side=trade['type'])
 
     def start(self):
-        for symbol in SYMBOLS:
-            for config_name in CONFIGS:
-                self.load_initial_data(symbol, config_name)  # Sadece bir kez başlangıç verisi çek
-            stream = f"{symbol.lower()}@kline_15m"
-            try:
-                self.streams[symbol] = self.twm.start_multiplex_socket(callback=self.process_candle, streams=[stream], timeout=30)  # Zaman aşımı artırıldı
-            except Exception as e:
-                logging.error(f"WebSocket başlatma hatası [{symbol}]: {e}")
-                time.sleep(5)  # Hata sonrası 5 saniye bekle ve tekrar dene
-                self.restart_websocket(symbol)
-        self.notifier.send_message(f"Futures sistemi başlatıldı: {', '.join(SYMBOLS)} için Safe, Mid, Agresif botlar aktif.")
+        if self.twm is None:
+            self.twm = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret, testnet=False)
+            self.twm.start()
+        self.plotter.start()
+        self.dispatcher.start()
+        self.monitor_thread = threading.Thread(target=self.monitor_positions)
+        self.monitor_thread.daemon = True
+        self.monitor_thread.start()
+        registry.add_collector(self.collect_metrics)
+        self.warmup.start()  # Geçmiş arka planda yüklenir; hazır olan sembol stream'den gelen ilk barla işlem görmeye başlar
+        try:
+            self.socket = self.twm.start_multiplex_socket(callback=self.dispatcher.dispatch, streams=self.kline_streams(), timeout=30)  # Zaman aşımı artırıldı
+            self.price_socket = self.twm.start_futures_multiplex_socket(callback=self.data_manager.price_feed.on_message, streams=self.price_streams())
+        except Exception as e:
+            registry.inc('errors_total', source='websocket')
+            logging.error(f"WebSocket başlatma hatası: {e}")
+            time.sleep(5)  # Hata sonrası 5 saniye bekle ve tekrar dene
+            self.restart_websocket()
+        self.notifier.send_message(f"Futures sistemi başlatıldı: {', '.join(self.symbols)} için Safe, Mid, Agresif botlar aktif.")
+
+    def kline_streams(self):
+        # Tüm semboller tek bir birleşik bağlantı üzerinden gelir
+        return [f"{symbol.lower()}@kline_{BASE_TIMEFRAME}" for symbol in self.symbols]
 
-    def restart_websocket(self, symbol):
-        if symbol in self.streams:
-            self.twm.stop_socket(self.streams[symbol])
-            del self.streams[symbol]
-        stream = f"{symbol.lower()}@kline_15m"
+    def price_streams(self):
+        return [f"{symbol.lower()}@{PRICE_STREAM}" for symbol in self.symbols]
+
+    def restart_websocket(self):
+        for socket in (self.socket, self.price_socket):
+            if socket is not None:
+                self.twm.stop_socket(socket)
+        self.socket = None
+        self.price_socket = None
         try:
-            self.streams[symbol] = self.twm.start_multiplex_socket(callback=self.process_candle, streams=[stream], timeout=30)
-            logging.info(f"[{symbol}] WebSocket yeniden bağlandı.")
+            self.socket = self.twm.start_multiplex_socket(callback=self.dispatcher.dispatch, streams=self.kline_streams(), timeout=30)
+            self.price_socket = self.twm.start_futures_multiplex_socket(callback=self.data_manager.price_feed.on_message, streams=self.price_streams())
+            logging.info("WebSocket yeniden bağlandı.")
         except Exception as e:
-            logging.error(f"[{symbol}] WebSocket yeniden bağlanma hatası: {e}")
+            registry.inc('errors_total', source='websocket')
+            logging.error(f"WebSocket yeniden bağlanma hatası: {e}")
             time.sleep(10)  # Hata sonrası daha uzun bekle
 
+    def collect_metrics(self):
+        # /metrics okunurken anlık değerler buradan alınır; işlem döngüsüne ek yük getirmez
+        for symbol, depth in self.dispatcher.queue_depths().items():
+            yield 'dispatch_queue_depth', {'symbol': symbol}, depth
+        yield 'dispatch_max_lag_ms', {}, self.dispatcher.max_lag_ms()
+        for symbol in self.symbols:
+            for config_name in CONFIGS:
+                yield 'open_positions', {'symbol': symbol, 'config': config_name}, len(self.positions[symbol][config_name])
+        yield 'warmup_ready_symbols', {}, len(self.warmup.ready())
+        yield 'rest_weight_used', {}, self.weight_budget.used()
+        for (symbol, config_name, store), (entries, size) in self.memory_report().items():
+            labels = {'symbol': symbol, 'config': config_name, 'store': store}
+            yield 'dedupe_entries', labels, entries
+            yield 'dedupe_bytes', labels, size
+        if hasattr(self.notifier, 'queue'):
+            yield 'notify_queue_depth', {}, len(self.notifier.queue)
+        if hasattr(self.plotter, 'pending'):
+            yield 'render_queue_depth', {}, self.plotter.pending
+
+    def memory_report(self):
+        # (sembol, bot, küme) -> (kayıt sayısı, yaklaşık bayt); uzun çalışmada sabit kalmalı
+        report = {}
+        for symbol in self.symbols:
+            for config_name in CONFIGS:
+                stores = {'used_pivots': self.used_pivots[symbol][config_name], 'notified_events': self.notified_events[symbol][config_name]}
+                for store, dedupe in stores.items():
+                    report[(symbol, config_name, store)] = (len(dedupe), dedupe.memory())
+        return report
+
     def stop(self):
         self.running = False
-        self.twm.stop()
-        for symbol in SYMBOLS:
-            for config_name in CONFIGS:
-                for thread in self.position_monitors[symbol][config_name]:
-                    if thread.is_alive():
-                        thread.join()
\ No newline at end of file
+        registry.remove_collector(self.collect_metrics)
+        self.warmup.stop()
+        if self.twm is not None:
+            self.twm.stop()
+        self.dispatcher.stop()
+        self.plotter.stop()
+        self.data_manager.close()
+        if self.monitor_thread is not None and self.monitor_thread.is_alive():
+            self.monitor_thread.join()
\ No newline at end of file
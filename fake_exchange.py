@@ -0,0 +1,126 @@
+# fake_exchange.py
+import itertools
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from kline_cache import INTERVAL_MS, KLINES_REQUEST_WEIGHT
+from settings import PRICE_STREAM, BASE_TIMEFRAME
+
+class FakeResponse:
+    def __init__(self, weight):
+        self.headers = {'x-mbx-used-weight-1m': str(weight)}
+
+class FakeClient:
+    # Yerel veriden cevap veren Binance istemcisi; DataManager'a client olarak verilir
+    def __init__(self, klines=None, clock=time.time):
+        self.klines = klines or {}  # sembol -> open_time (ms), open, high, low, close sütunlu DataFrame
+        self.clock = clock
+        self.prices = {}
+        self.response = None
+        self.requests = 0
+        self.weights = deque()  # Son 60 sn'deki (zaman, ağırlık); yanıt başlığında bildirilir
+
+    def _respond(self, weight):
+        now = time.monotonic()
+        self.requests += 1
+        self.weights.append((now, weight))
+        while self.weights[0][0] <= now - 60:
+            self.weights.popleft()
+        self.response = FakeResponse(sum(w for _, w in self.weights))
+
+    def futures_historical_klines(self, symbol, interval, start_str, end_str=None, limit=1000):
+        self._respond(KLINES_REQUEST_WEIGHT)
+        df = self.klines.get(symbol)
+        if df is None:
+            return []
+        interval_ms = INTERVAL_MS[interval]
+        now = int(self.clock() * 1000)
+        end = int(end_str) if end_str else now
+        open_time = df['open_time'].values
+        mask = (open_time >= int(start_str)) & (open_time <= min(end, now))
+        rows = df[mask]
+        return [
+            [int(t), repr(o), repr(h), repr(l), repr(c), '0', int(t) + interval_ms - 1, '0', 0, '0', '0', '0']
+            for t, o, h, l, c in zip(rows['open_time'], rows['open'], rows['high'], rows['low'], rows['close'])
+        ]
+
+    def set_price(self, symbol, price):
+        self.prices[symbol] = price
+
+    def futures_symbol_ticker(self, symbol=None):
+        self._respond(1 if symbol is not None else 2)
+        if symbol is not None:
+            return {'symbol': symbol, 'price': str(self.prices.get(symbol, 0.0))}
+        return [{'symbol': s, 'price': str(p)} for s, p in self.prices.items()]
+
+class FakeSocketManager:
+    # ThreadedWebsocketManager yerine geçer; emit() ile verilen mesaj stream adına göre ilgili callback'e iletilir
+    def __init__(self):
+        self.sockets = {}
+        self.ids = itertools.count()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.sockets.clear()
+
+    def start_multiplex_socket(self, callback, streams, **kwargs):
+        name = f"fake-{next(self.ids)}"
+        self.sockets[name] = (callback, set(streams))
+        return name
+
+    start_futures_multiplex_socket = start_multiplex_socket
+
+    def stop_socket(self, name):
+        self.sockets.pop(name, None)
+
+    def emit(self, msg):
+        stream = msg.get('stream')
+        for callback, streams in list(self.sockets.values()):
+            if stream in streams:
+                callback(msg)
+
+class NullNotifier:
+    # Bildirimler gönderilmez, yalnızca sayılır
+    def __init__(self):
+        self.sent = 0
+
+    def send_message(self, message):
+        self.sent += 1
+
+class NullPlotter:
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def save_trade_graph(self, symbol, config_name, trade, candles, is_opening):
+        pass
+
+def kline_message(symbol, open_time, open_, high, low, close, closed=True, interval=BASE_TIMEFRAME):
+    # Binance birleşik stream kline mesajı biçiminde
+    interval_ms = INTERVAL_MS[interval]
+    return {'stream': f"{symbol.lower()}@kline_{interval}", 'data': {'e': 'kline', 's': symbol, 'k': {
+        't': int(open_time), 'T': int(open_time) + interval_ms - 1, 's': symbol, 'i': interval,
+        'o': repr(float(open_)), 'h': repr(float(high)), 'l': repr(float(low)), 'c': repr(float(close)), 'x': closed
+    }}}
+
+def price_message(symbol, price):
+    return {'stream': f"{symbol.lower()}@{PRICE_STREAM}", 'data': {'e': 'markPriceUpdate', 's': symbol, 'p': repr(float(price))}}
+
+def synthetic_klines(symbols, bars, end_ms, interval=BASE_TIMEFRAME, seed=0):
+    # Sembol başına rastgele yürüyüşle üretilmiş, end_ms'den önce biten kapanmış barlar
+    interval_ms = INTERVAL_MS[interval]
+    rng = np.random.default_rng(seed)
+    result = {}
+    for symbol in symbols:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, bars)))
+        open_ = np.r_[close[0], close[:-1]]
+        high = np.maximum(open_, close) * (1 + rng.random(bars) * 0.003)
+        low = np.minimum(open_, close) * (1 - rng.random(bars) * 0.003)
+        open_time = end_ms - interval_ms * np.arange(bars, 0, -1)
+        result[symbol] = pd.DataFrame({'open_time': open_time, 'open': open_, 'high': high, 'low': low, 'close': close})
+    return result
\ No newline at end of file
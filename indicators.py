@@ -0,0 +1,81 @@
+# indicators.py
+from collections import deque
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+NEUTRAL = {'min': np.inf, 'max': -np.inf}  # Boş pencere: "hepsi > p" / "hepsi < p" koşulları doğru kalır
+
+class RollingExtreme:
+    # [i - lag - window + 1, i - lag] aralığındaki değerlerin en küçüğü/en büyüğü; monoton deque ile ekleme başına amortize O(1)
+    def __init__(self, window, mode='min', lag=0):
+        self.window = window
+        self.mode = mode
+        self.lag = lag
+        self.items = deque()  # (mutlak bar, değer); değerler baştan sona monoton
+
+    def push(self, seq, value):
+        if self.window <= 0:
+            return
+        items = self.items
+        if self.mode == 'min':
+            while items and items[-1][1] >= value:
+                items.pop()
+        else:
+            while items and items[-1][1] <= value:
+                items.pop()
+        items.append((seq, value))
+        while items[0][0] <= seq - self.window:
+            items.popleft()
+
+    def value(self):
+        return self.items[0][1] if self.items else NEUTRAL[self.mode]
+
+    def clear(self):
+        self.items.clear()
+
+class CandleIndicators:
+    # Bir sembolün mum verisi üzerinde kapanmış barlarla güncellenen göstergeler; aynı tanım tek kez tutulur
+    def __init__(self):
+        self.indicators = {}  # (sütun, mod, pencere, gecikme) -> RollingExtreme
+        self.seq = None  # Göstergelere eklenmiş son mutlak bar; None: pencereden yeniden doldurulacak
+
+    def add(self, column, mode, window, lag=0):
+        key = (column, mode, window, lag)
+        if key not in self.indicators:
+            self.indicators[key] = RollingExtreme(window, mode, lag)
+            self.seq = None  # Yeni gösterge bir sonraki update'te pencereden doldurulur
+        return key
+
+    def value(self, column, mode, window, lag=0):
+        return self.indicators[(column, mode, window, lag)].value()
+
+    def reset(self, candles):
+        self.seq = None
+        self.update(candles)
+
+    def update(self, candles):
+        # Son güncellemeden bu yana eklenen barlar sırayla işlenir; kaçan bar olsa da göstergeler pencereyle tutarlı kalır
+        first = candles.first_bar()
+        last = candles.count - 1
+        if self.seq is None or not first - 1 <= self.seq <= last:
+            for indicator in self.indicators.values():
+                indicator.clear()
+            self.seq = first - 1
+        columns = {}
+        for seq in range(self.seq + 1, last + 1):
+            for (column, _, _, lag), indicator in self.indicators.items():
+                if seq - lag >= first:
+                    if column not in columns:
+                        columns[column] = candles.view(column)
+                    indicator.push(seq - lag, float(columns[column][seq - lag - first]))
+        self.seq = last
+
+def rolling_extreme(values, window, mode='min', lag=0):
+    # RollingExtreme'in tüm seri için vektörel karşılığı (backtest): out[i] = extreme(values[i - lag - window + 1:i - lag + 1])
+    values = np.asarray(values, dtype='float64')
+    neutral = NEUTRAL[mode]
+    if window <= 0:
+        return np.full(len(values), neutral)
+    padded = np.concatenate([np.full(window - 1 + lag, neutral), values])
+    windows = sliding_window_view(padded, window)[:len(values)]
+    return windows.min(axis=1) if mode == 'min' else windows.max(axis=1)
\ No newline at end of file
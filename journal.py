@@ -0,0 +1,129 @@
+# journal.py
+import json
+import logging
+import os
+import threading
+import time
+from utils import save_data, load_data
+from settings import DEDUPE_MAX_ENTRIES
+
+def position_key(position):
+    # TradeStore'un UNIQUE anahtarıyla aynı; aynı barda farklı pivotlardan açılan aynı yönlü pozisyonlar ayrışır
+    return str(position["entry_time"]), position["type"], position.get("pivot_price")
+
+class TradeJournal:
+    def __init__(self, snapshot_path, default_state, snapshot_every=500, fsync_interval=1.0):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path.replace(".json", ".journal")
+        self.snapshot_every = snapshot_every
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.state = load_data(snapshot_path, default_state)
+        for key, value in default_state.items():
+            self.state.setdefault(key, value)  # Eski dosyalarda eksik alanlar
+        self.seq = self.state.get("seq", 0)
+        self.events_since_snapshot = 0
+        self.replayed_trades = []  # Son anlık görüntüden sonra kapanan işlemler
+        self.replay()
+        self.file = open(self.journal_path, 'a', encoding='utf-8')
+        self.dirty = False
+        self.last_sync = time.monotonic()
+
+    def replay(self):
+        # Son anlık görüntüden sonra yazılmış olaylar sırayla uygulanır
+        valid_bytes = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Çökme sırasında yarım kalan satır: sonraki olaylar üzerine yazılmasın diye kesilir
+                        logging.warning(f"Yarım kalmış journal satırı atlandı: {self.journal_path}")
+                        with open(self.journal_path, 'r+b') as journal_file:
+                            journal_file.truncate(valid_bytes)
+                        break
+                    valid_bytes += len(line)
+                    if event["n"] <= self.seq:
+                        continue  # Anlık görüntüye zaten dahil
+                    self.apply(event)
+                    if event["e"] == "trade_closed":
+                        self.replayed_trades.append(event["trade"])
+                    self.seq = event["n"]
+                    self.events_since_snapshot += 1
+        except FileNotFoundError:
+            pass
+
+    def apply(self, event):
+        state = self.state
+        kind = event["e"]
+        if kind == "position_opened":
+            state["positions"].append(event["position"])
+        elif kind == "trade_closed":
+            trade = event["trade"]
+            key = position_key(trade)
+            state["positions"] = [p for p in state["positions"] if position_key(p) != key]
+            if not state.get("trades_in_store"):
+                state["trades"].append(trade)  # İşlem veritabanına aktarılmadan önceki kayıtlar
+            state["balance"] = event["balance"]
+            state["stats"] = event["stats"]
+        elif kind == "sweep_added":
+            state[f"sweeps_{event['side']}"].append(event["sweep"])
+            state["used_pivots"].append(event["sweep"][0])
+            del state["used_pivots"][:-DEDUPE_MAX_ENTRIES]  # Yalnızca son pivotlar tutulur; dosya büyümez
+        elif kind == "sweep_updated":
+            sweeps = state[f"sweeps_{event['side']}"]
+            for n, sweep in enumerate(sweeps):
+                if sweep[0] == event["sweep"][0] and sweep[3] == event["sweep"][3]:
+                    sweeps[n] = event["sweep"]
+                    break
+        elif kind == "sweep_removed":
+            state[f"sweeps_{event['side']}"] = [
+                s for s in state[f"sweeps_{event['side']}"] if not (s[0] == event["sweep"][0] and s[3] == event["sweep"][3])
+            ]
+        elif kind == "balance":
+            state["balance"] = event["balance"]
+
+    def record(self, kind, **fields):
+        with self.lock:
+            self.seq += 1
+            event = {"n": self.seq, "e": kind, **fields}
+            self.file.write(json.dumps(event, default=str) + "\n")
+            self.file.flush()
+            self.dirty = True
+            self.apply(event)
+            self.events_since_snapshot += 1
+            if self.events_since_snapshot >= self.snapshot_every:
+                self._snapshot()
+            elif time.monotonic() - self.last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        if self.dirty:
+            os.fsync(self.file.fileno())
+            self.dirty = False
+        self.last_sync = time.monotonic()
+
+    def sync(self):
+        with self.lock:
+            self._sync()
+
+    def _snapshot(self):
+        # Anlık görüntü geçici dosya + rename ile yazılır, ardından journal sıfırlanır
+        self.state["seq"] = self.seq
+        save_data(self.snapshot_path, self.state)
+        self.file.close()
+        self.file = open(self.journal_path, 'w', encoding='utf-8')
+        os.fsync(self.file.fileno())
+        self.events_since_snapshot = 0
+        self.dirty = False
+        self.last_sync = time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            self._snapshot()
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.file.close()
@@ -0,0 +1,121 @@
+# kline_cache.py
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from settings import KLINE_CACHE_DIR
+from metrics import registry
+
+KLINES_PER_REQUEST = 1000  # futures_historical_klines sayfa boyu
+KLINES_REQUEST_WEIGHT = 5  # 500-1000 barlık futures kline isteğinin ağırlığı
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '1d': 86_400_000,
+}
+
+class KlineCache:
+    # Sembol/zaman dilimi başına kapanmış barlar; her sütun ayrı ham dosya, okumalar memmap
+    COLUMNS = ('open_time', 'open', 'high', 'low', 'close')
+    DTYPES = {'open_time': '<i8', 'open': '<f8', 'high': '<f8', 'low': '<f8', 'close': '<f8'}
+
+    def __init__(self, symbol, interval='15m', directory=KLINE_CACHE_DIR, readonly=False):
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.path = os.path.join(directory, f"{symbol}_{interval}")
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        if not readonly:
+            os.makedirs(self.path, exist_ok=True)
+        self.count = self._recover()
+
+    def _file(self, col):
+        return os.path.join(self.path, f"{col}.bin")
+
+    def _recover(self):
+        # Yarıda kalmış bir ekleme sütunları farklı uzunlukta bırakabilir; hepsi en kısa sütuna kesilir
+        sizes = {col: os.path.getsize(self._file(col)) if os.path.exists(self._file(col)) else 0 for col in self.COLUMNS}
+        count = min(size // 8 for size in sizes.values())
+        if not self.readonly:
+            for col, size in sizes.items():
+                if size != count * 8:
+                    with open(self._file(col), 'r+b' if size else 'wb') as f:
+                        f.truncate(count * 8)
+        return count
+
+    def __len__(self):
+        return self.count
+
+    def refresh(self):
+        # Salt okunur kopyalar başka süreçte eklenen barları görmek için boyutu yeniden okur
+        if self.readonly:
+            self.count = self._recover()
+        return self.count
+
+    def _column(self, col, start, stop):
+        if stop <= start:
+            return np.empty(0, dtype=self.DTYPES[col])
+        return np.memmap(self._file(col), dtype=self.DTYPES[col], mode='r', shape=(stop,))[start:stop]
+
+    def read(self, start=0, stop=None):
+        # Salt okunur memmap dilimleri; kopya yapılmaz
+        count = self.count
+        stop = count if stop is None else min(stop, count)
+        return {col: self._column(col, start, stop) for col in self.COLUMNS}
+
+    def tail(self, n):
+        self.refresh()
+        return self.read(max(0, self.count - n))
+
+    def last_open_time(self):
+        count = self.count
+        if count == 0:
+            return None
+        return int(self._column('open_time', count - 1, count)[0])
+
+    def klines(self, start_time=None, end_time=None):
+        # [start_time, end_time] (ms) aralığı; backtest.load_klines ile aynı biçimde DataFrame
+        count = self.refresh()
+        open_time = self._column('open_time', 0, count)
+        start = 0 if start_time is None else int(np.searchsorted(open_time, start_time, side='left'))
+        stop = count if end_time is None else int(np.searchsorted(open_time, end_time, side='right'))
+        return pd.DataFrame({col: np.array(values) for col, values in self.read(start, stop).items()})
+
+    def append(self, open_time, open_, high, low, close):
+        # Yalnızca son kayıtlı bardan yeni barlar eklenir; tekrar gelen barlar yok sayılır
+        columns = [np.atleast_1d(np.asarray(values, dtype=self.DTYPES[col])) for col, values in zip(self.COLUMNS, (open_time, open_, high, low, close))]
+        with self.lock:
+            last = self.last_open_time()
+            keep = np.ones(len(columns[0]), dtype=bool) if last is None else columns[0] > last
+            if not keep.any():
+                return 0
+            for col, values in zip(self.COLUMNS, columns):
+                with open(self._file(col), 'ab') as f:
+                    f.write(values[keep].tobytes())
+            self.count += int(keep.sum())
+            return int(keep.sum())
+
+    def backfill(self, client, history, budget=None):
+        # Son kayıtlı bardan bu yana eksik kalan kapanmış barlar çekilir; önbellek boşsa son history bar
+        now = int(time.time() * 1000)
+        last = self.last_open_time()
+        if last is None:
+            start = (now // self.interval_ms - history) * self.interval_ms
+        else:
+            start = last + self.interval_ms
+        if start + self.interval_ms > now:
+            return 0  # Henüz kapanmış yeni bar yok
+        if budget is not None:
+            pages = (now - start) // self.interval_ms // KLINES_PER_REQUEST + 1
+            budget.acquire(pages * KLINES_REQUEST_WEIGHT)
+        with registry.timer('rest_klines', symbol=self.symbol):
+            klines = client.futures_historical_klines(symbol=self.symbol, interval=self.interval, start_str=str(start))
+        registry.inc('rest_requests_total', endpoint='klines')
+        if budget is not None:
+            budget.observe(client)
+        klines = [k for k in klines if int(k[6]) < now]
+        if not klines:
+            return 0
+        rows = np.array([[float(v) for v in k[:5]] for k in klines])
+        return self.append(rows[:, 0].astype('int64'), rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4])
\ No newline at end of file
@@ -0,0 +1,247 @@
+# metrics.py
+import threading
+import time
+from bisect import bisect_left
+from settings import METRICS_ENABLED, METRICS_PREFIX
+
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DESCRIPTIONS = {
+    'stage_seconds': "Aşama süresi (sn)",
+    'messages_total': "İşlenen websocket kline mesajları",
+    'sweeps_total': "Tespit edilen sweep'ler",
+    'trades_total': "Açılan/kapanan işlemler",
+    'rest_requests_total': "Binance REST istekleri",
+    'notifications_total': "Gönderilen/atılan bildirimler",
+    'errors_total': "Hatalar",
+    'dispatch_queue_depth': "Sembol başına bekleyen kline mesajı",
+    'dispatch_max_lag_ms': "Son mesajların dağıtım kuyruğunda en uzun bekleme süresi (ms)",
+    'open_positions': "Açık pozisyonlar",
+    'notify_queue_depth': "Gönderilmeyi bekleyen bildirimler",
+    'render_queue_depth': "Bekleyen grafikler",
+    'warmup_ready_symbols': "Geçmiş verisi yüklenmiş semboller",
+    'rest_weight_used': "Son 60 sn'de harcanan REST ağırlığı",
+    'dedupe_entries': "Tekrar bildirim / kullanılmış pivot kümelerindeki kayıtlar",
+    'dedupe_bytes': "Tekrar bildirim / kullanılmış pivot kümelerinin yaklaşık bellek kullanımı (bayt)",
+    'shard_up': "Shard süreci çalışıyor (1) / durdu (0)",
+    'shard_restarts': "Shard yeniden başlatma sayısı",
+    'shard_snapshot_age_seconds': "Shard'dan gelen son anlık görüntünün yaşı (sn)",
+    'shard_processed_messages': "Shard'ın işlediği kline mesajları",
+}
+
+class Histogram:
+    # Sabit kovalı histogram; gözlem başına bir ikili arama ve üç toplama
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q):
+        # Kova içinde doğrusal ara değer; son kovayı aşan değerler için son sınır döner
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+class _Timer:
+    __slots__ = ('metrics', 'labels', 'began')
+
+    def __init__(self, metrics, labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._observe('stage_seconds', self.labels, time.perf_counter() - self.began)
+        return False
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metrics:
+    def __init__(self, enabled=METRICS_ENABLED, prefix=METRICS_PREFIX, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}  # isim -> {etiketler: değer}
+        self.gauges = {}
+        self.histograms = {}
+        self.collectors = []  # Okuma anında (isim, etiketler, değer) gauge'ları üreten fonksiyonlar
+        self.remotes = {}  # Kaynak -> (ek etiketler, snapshot()); başka süreçlerde (ör. shard worker) tutulan kayıtlar
+
+    def timer(self, stage, **labels):
+        # with metrics.timer('run_strategy', symbol=..., config=...): ...
+        if not self.enabled:
+            return _NullTimer()
+        labels['stage'] = stage
+        return _Timer(self, _key(labels))
+
+    def observe(self, stage, seconds, **labels):
+        if self.enabled:
+            labels['stage'] = stage
+            self._observe('stage_seconds', _key(labels), seconds)
+
+    def _observe(self, name, key, seconds):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        if self.enabled:
+            with self.lock:
+                self.gauges.setdefault(name, {})[_key(labels)] = value
+
+    def add_collector(self, collector):
+        with self.lock:
+            self.collectors.append(collector)
+
+    def remove_collector(self, collector):
+        with self.lock:
+            if collector in self.collectors:
+                self.collectors.remove(collector)
+
+    def set_remote(self, source, snapshot, **labels):
+        # Başka bir süreçten gelen snapshot() çıktısı; kaynağın son değerleri okunurken kendi etiketleriyle eklenir
+        with self.lock:
+            self.remotes[source] = (labels, snapshot)
+
+    def remove_remote(self, source):
+        with self.lock:
+            self.remotes.pop(source, None)
+
+    def _collect(self):
+        with self.lock:
+            gauges = {name: dict(series) for name, series in self.gauges.items()}
+            collectors = list(self.collectors)
+        for collector in collectors:
+            for name, labels, value in collector():
+                gauges.setdefault(name, {})[_key(labels)] = value
+        return gauges
+
+    def snapshot(self):
+        # Okuma sırasında yazılar beklemesin diye kopya üzerinde çalışılır
+        gauges = self._collect()
+        with self.lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            histograms = {}
+            for name, series in self.histograms.items():
+                histograms[name] = {}
+                for key, histogram in series.items():
+                    copy = Histogram(histogram.buckets)
+                    copy.merge(histogram)
+                    histograms[name][key] = copy
+            remotes = list(self.remotes.values())
+        for labels, (remote_counters, remote_gauges, remote_histograms) in remotes:
+            # Uzak kayıtlar zaten kopyadır; seriler kaynak etiketleriyle ayrışır
+            for families, remote in ((counters, remote_counters), (gauges, remote_gauges), (histograms, remote_histograms)):
+                for name, series in remote.items():
+                    target = families.setdefault(name, {})
+                    for key, value in series.items():
+                        target[_key(dict(key) | labels)] = value
+        return counters, gauges, histograms
+
+    def render(self):
+        # Prometheus metin biçimi (0.0.4)
+        counters, gauges, histograms = self.snapshot()
+        lines = []
+        for kind, families in (('counter', counters), ('gauge', gauges)):
+            for name, series in sorted(families.items()):
+                full = self.prefix + name
+                lines.append(f"# HELP {full} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {full} {kind}")
+                lines += [f"{full}{_format_labels(key)} {_format_value(value)}" for key, value in sorted(series.items())]
+        for name, series in sorted(histograms.items()):
+            full = self.prefix + name
+            lines.append(f"# HELP {full} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {full} histogram")
+            for key, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_format_labels(key, [('le', _format_value(float(bound)))])} {cumulative}")
+                lines.append(f"{full}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                lines.append(f"{full}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def report(self, symbol=None):
+        # CLI için özet: aşama başına (isteğe bağlı tek sembol) birleştirilmiş gecikmeler, sayaçlar ve gauge'lar
+        counters, gauges, histograms = self.snapshot()
+        matches = lambda key: symbol is None or dict(key).get('symbol') in (None, symbol)
+        stages = {}
+        for key, histogram in histograms.get('stage_seconds', {}).items():
+            if matches(key):
+                stages.setdefault(dict(key)['stage'], Histogram(histogram.buckets)).merge(histogram)
+        lines = ["Aşama gecikmeleri (ms):"]
+        for stage, h in sorted(stages.items(), key=lambda item: -item[1].sum):
+            lines.append(f"  {stage}: {h.count} ölçüm, ort. {h.sum / h.count * 1000:.2f}, "
+                         f"p50 {h.quantile(0.5) * 1000:.2f}, p99 {h.quantile(0.99) * 1000:.2f}, toplam {h.sum:.1f} sn")
+        for title, families in (("Sayaçlar:", counters), ("Anlık değerler:", gauges)):
+            lines.append(title)
+            for name, series in sorted(families.items()):
+                totals = {}
+                for key, value in series.items():
+                    if matches(key):
+                        # Sembol/config/shard etiketleri toplanır, diğer etiketler ayrı gösterilir
+                        rest = tuple((k, v) for k, v in key if k not in ('symbol', 'config', 'shard'))
+                        totals[rest] = totals.get(rest, 0) + value
+                for rest, value in sorted(totals.items()):
+                    detail = f" ({', '.join(f'{k}={v}' for k, v in rest)})" if rest else ""
+                    lines.append(f"  {name}{detail}: {value:g}")
+        return "\n".join(lines)
+
+registry = Metrics()  # Süreç genelinde paylaşılan kayıt
\ No newline at end of file
@@ -1,21 +1,223 @@
 # notifications.py
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import requests
 from config import DISCORD_WEBHOOK_URL
-from datetime import datetime
+from metrics import registry
+from settings import NOTIFY_QUEUE_SIZE, NOTIFY_BATCH_INTERVAL, NOTIFY_TIMEOUT, NOTIFY_MAX_RETRIES
+
+DISCORD_MESSAGE_LIMIT = 2000  # Discord içerik karakter sınırı
+
+def _seconds(value, default=1.0):
+    # Rate limit başlıkları/gövdesi: sayı değilse (ör. HTTP tarihi) varsayılan bekleme
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
 
 class Notifier:
     def __init__(self, webhook_url=DISCORD_WEBHOOK_URL):
         self.webhook_url = webhook_url
         self.messages = []
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.session = requests.Session()  # Bağlantılar tekrar kullanılır
+        self.counters = {"queued": 0, "sent": 0, "dropped": 0, "failed": 0, "retries": 0, "posts": 0}
+        self.latency_ms = {"last": 0.0, "max": 0.0, "total": 0.0, "count": 0}
+        self.skipped = 0  # Aşırı yükte atılan, bir sonraki gönderimde özetlenecek mesaj sayısı
+        self.in_flight = 0
+        self.thread = None
 
     def send_message(self, message):
         timestamped_message = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}"
         self.messages.append(timestamped_message)
-        if self.webhook_url:
+        if not self.webhook_url:
+            print(f"Bildirim: {message}")
+            return
+        with self.condition:
+            if len(self.queue) >= NOTIFY_QUEUE_SIZE:
+                # Aşırı yük: en eski mesaj atılır, sayısı bir sonraki paketin başına eklenir
+                self.queue.popleft()
+                self.skipped += 1
+                self.counters["dropped"] += 1
+                registry.inc('notifications_total', result='dropped')
+            self.queue.append(message)
+            self.counters["queued"] += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+
+    def _next_batch(self):
+        # Kuyruktaki mesajları Discord sınırını aşmayacak şekilde tek içerikte birleştirir
+        lines = []
+        size = 0
+        if self.skipped:
+            lines.append(f"... {self.skipped} bildirim yoğunluk nedeniyle atlandı")
+            size = len(lines[0]) + 1
+            self.skipped = 0
+        while self.queue:
+            message = self.queue[0][:DISCORD_MESSAGE_LIMIT]
+            if lines and size + len(message) > DISCORD_MESSAGE_LIMIT:
+                break
+            lines.append(message)
+            size += len(message) + 1
+            self.queue.popleft()
+        return lines
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+            time.sleep(NOTIFY_BATCH_INTERVAL)  # Ani bildirim patlamaları tek mesajda toplanır
+            with self.condition:
+                lines = self._next_batch()
+                self.in_flight = len(lines)
             try:
-                payload = {"content": message}
-                requests.post(self.webhook_url, json=payload)
+                if lines:
+                    self._post(lines)
             except Exception as e:
+                # Beklenmeyen hata tek worker thread'i öldürmesin; paket başarısız sayılır, kuyruk işlenmeye devam eder
                 print(f"Discord bildirimi gönderilemedi: {e}")
-        else:
-            print(f"Bildirim: {message}")
\ No newline at end of file
+                count = sum(1 for line in lines if not line.startswith("... "))
+                self.counters["failed"] += count
+                registry.inc('notifications_total', count, result='failed')
+                registry.inc('errors_total', source='discord')
+            finally:
+                with self.condition:
+                    self.in_flight = 0
+                    self.condition.notify_all()
+
+    def _post(self, lines):
+        payload = {"content": "\n".join(lines)}
+        count = sum(1 for line in lines if not line.startswith("... "))
+        for attempt in range(NOTIFY_MAX_RETRIES + 1):
+            last = attempt == NOTIFY_MAX_RETRIES  # Son denemeden sonra beklenmez
+            started = time.monotonic()
+            try:
+                response = self.session.post(self.webhook_url, json=payload, timeout=NOTIFY_TIMEOUT)
+            except Exception as e:
+                print(f"Discord bildirimi gönderilemedi: {e}")
+                self.counters["retries"] += 1
+                registry.inc('errors_total', source='discord')
+                if not last:
+                    time.sleep(min(2 ** attempt, 30))
+                continue
+            self._record_latency((time.monotonic() - started) * 1000)
+            registry.observe('discord_post', time.monotonic() - started)
+            if response.status_code == 429:
+                self.counters["retries"] += 1
+                if not last:
+                    time.sleep(self._retry_after(response))
+                continue
+            if response.status_code >= 500:
+                self.counters["retries"] += 1
+                if not last:
+                    time.sleep(min(2 ** attempt, 30))
+                continue
+            if response.status_code >= 400:
+                print(f"Discord bildirimi gönderilemedi: HTTP {response.status_code}")
+                break
+            self.counters["sent"] += count
+            self.counters["posts"] += 1
+            registry.inc('notifications_total', count, result='sent')
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                # Kova boşaldı: sıfırlanana kadar yeni istek atılmaz
+                time.sleep(_seconds(response.headers.get("X-RateLimit-Reset-After", 1)))
+            return
+        self.counters["failed"] += count
+        registry.inc('notifications_total', count, result='failed')
+
+    def _retry_after(self, response):
+        # Gövde JSON nesnesi değilse ya da retry_after içermiyorsa Retry-After başlığı kullanılır
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        value = body.get("retry_after") if isinstance(body, dict) else None
+        if value is None:
+            value = response.headers.get("Retry-After", 1)
+        return _seconds(value)
+
+    def _record_latency(self, ms):
+        self.latency_ms["last"] = ms
+        self.latency_ms["max"] = max(self.latency_ms["max"], ms)
+        self.latency_ms["total"] += ms
+        self.latency_ms["count"] += 1
+
+    def flush(self, timeout=10):
+        # Kuyruk boşalana ve gönderim bitene kadar bekler
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.queue or self.in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def stats(self):
+        samples = self.latency_ms["count"]
+        return {
+            **self.counters,
+            "queue_depth": len(self.queue),
+            "latency_ms_last": self.latency_ms["last"],
+            "latency_ms_max": self.latency_ms["max"],
+            "latency_ms_avg": self.latency_ms["total"] / samples if samples else 0.0,
+        }
+
+class LocalWebhookServer:
+    # Testler için yerel Discord webhook taklidi; her rate_limit_every. istekte 429 döner
+    def __init__(self, port=0, rate_limit_every=0, retry_after=0.05, delay=0.0):
+        self.received = []
+        self.requests = 0
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.delay = delay
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.requests += 1
+                if server.delay:
+                    time.sleep(server.delay)
+                if server.rate_limit_every and server.requests % server.rate_limit_every == 0:
+                    payload = json.dumps({"message": "You are being rate limited.", "retry_after": server.retry_after}).encode()
+                    self.send_response(429)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                server.received.append(json.loads(body)["content"])
+                self.send_response(204)
+                self.send_header("X-RateLimit-Remaining", "5")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/webhook"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
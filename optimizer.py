@@ -0,0 +1,266 @@
+# optimizer.py
+import argparse
+import glob
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from config import CONFIGS
+from settings import SYMBOLS, DATA_WINDOW, OPTIMIZE_WORKERS, OPTIMIZE_CHUNK_SIZE
+import backtest as backtest_module
+from backtest import PRICE_COLUMNS, load_klines, backtest, exit_tables, pivot_arrays, resample_klines, summarize
+from bar_aggregator import config_timeframe
+from utils import pivots_batch
+from kline_cache import KlineCache
+
+DEFAULT_GRID = {
+    "LEFT": [5, 10, 15, 20],
+    "RIGHT": [5, 10, 15, 20],
+    "MANIPULATION_THRESHOLD": [0.001, 0.0025, 0.005, 0.01],
+    "CONSECUTIVE_CANDLES": [2, 3, 4, 5],
+    "RISK_REWARD_RATIO": [1.0, 1.5, 2.0, 3.0],
+}
+PIVOT_CACHE_SIZE = 8  # Worker başına bellekte tutulan (sembol, LEFT, RIGHT) pivot seti
+
+_data = {}  # Worker süreçlerinde sembol -> (memmap kline sözlüğü, çıkış tabloları)
+_frames = {}  # Worker süreçlerinde (sembol, zaman dilimi) -> toplanmış barlar
+_pivots = OrderedDict()
+
+def parameter_grid(grid, base, samples=None, seed=0):
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+    # Pencereye sığmayan pivot tanımları canlı motorda hiç pivot üretmez
+    combos = [c for c in combos if (base | c)["LEFT"] + (base | c)["RIGHT"] + 1 <= DATA_WINDOW]
+    if samples is not None and samples < len(combos):
+        combos = random.Random(seed).sample(combos, samples)
+    return combos
+
+def combo_key(params):
+    return json.dumps(params, sort_keys=True)
+
+def run_key(klines_by_symbol, base, start):
+    # Checkpoint satırları yalnızca aynı temel config, sembol/veri, start ve backtest koduyla üretilmişse yeniden kullanılır
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'base': base, 'symbols': list(klines_by_symbol), 'start': start}, sort_keys=True).encode())
+    for symbol, klines in klines_by_symbol.items():
+        digest.update(symbol.encode())
+        digest.update(np.ascontiguousarray(klines['open_time'].values, dtype='int64').tobytes())
+        for col in PRICE_COLUMNS:
+            digest.update(np.ascontiguousarray(klines[col].values, dtype='float64').tobytes())
+    for module in (__file__, backtest_module.__file__):
+        with open(module, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def _data_paths(workdir, symbol):
+    return os.path.join(workdir, f"{symbol}_prices.npy"), os.path.join(workdir, f"{symbol}_time.npy")
+
+def _pivot_path(workdir, symbol, timeframe, left, right):
+    return os.path.join(workdir, f"{symbol}_pivots_{timeframe}_{left}_{right}.npz")
+
+def prepare_data(klines_by_symbol, workdir):
+    # Fiyatlar bir kez diske yazılır; worker'lar salt okunur memmap olarak açar, veri süreçlere kopyalanmaz
+    for symbol, klines in klines_by_symbol.items():
+        prices_path, time_path = _data_paths(workdir, symbol)
+        np.save(prices_path, np.vstack([klines[col].values.astype('float64') for col in PRICE_COLUMNS]))
+        np.save(time_path, klines['open_time'].values.astype('int64'))
+
+def _load_symbol(workdir, symbol):
+    if symbol not in _data:
+        prices_path, time_path = _data_paths(workdir, symbol)
+        prices = np.load(prices_path, mmap_mode='r')
+        klines = {'open_time': np.load(time_path, mmap_mode='r'), **{col: prices[i] for i, col in enumerate(PRICE_COLUMNS)}}
+        _data[symbol] = (klines, exit_tables(klines))
+    return _data[symbol]
+
+def _load_frame(workdir, symbol, timeframe):
+    # Config'in TIMEFRAME barları; taban zaman diliminde memmap'in kendisi
+    key = (symbol, timeframe)
+    if key not in _frames:
+        klines, _ = _load_symbol(workdir, symbol)
+        _frames[key] = resample_klines(klines, timeframe)
+    return _frames[key]
+
+def _compute_pivots(workdir, symbols, timeframe, left, right):
+    # Her farklı (zaman dilimi, LEFT, RIGHT) için pivotlar bir kez hesaplanır ve diğer tüm parametrelerde yeniden kullanılır
+    for symbol in symbols:
+        frame = _load_frame(workdir, symbol, timeframe)
+        ph, pl = pivots_batch(frame['high'], frame['low'], [(left, right)])[(left, right)]
+        (ph_idx, ph_price), (pl_idx, pl_price) = pivot_arrays(ph), pivot_arrays(pl)
+        np.savez(_pivot_path(workdir, symbol, timeframe, left, right), ph_idx=ph_idx, ph_price=ph_price, pl_idx=pl_idx, pl_price=pl_price)
+
+def _load_pivots(workdir, symbol, timeframe, left, right):
+    key = (symbol, timeframe, left, right)
+    if key in _pivots:
+        _pivots.move_to_end(key)
+    else:
+        with np.load(_pivot_path(workdir, symbol, timeframe, left, right)) as f:
+            _pivots[key] = ((f['ph_idx'], f['ph_price']), (f['pl_idx'], f['pl_price']))
+        if len(_pivots) > PIVOT_CACHE_SIZE:
+            _pivots.popitem(last=False)
+    return _pivots[key]
+
+def _evaluate(workdir, symbols, base, params, start):
+    config = base | params
+    timeframe = config_timeframe(config)
+    row = dict(params)
+    closed = []
+    for symbol in symbols:
+        klines, tables = _load_symbol(workdir, symbol)
+        pivots = _load_pivots(workdir, symbol, timeframe, config["LEFT"], config["RIGHT"])
+        trades = backtest(klines, config, start, pivots=pivots, tables=tables, frame=_load_frame(workdir, symbol, timeframe))
+        row[f"profit_{symbol}"] = summarize(trades)['profit']
+        closed.append(trades.loc[trades['exit_idx'] >= 0, ['exit_time', 'profit']])
+    closed = pd.concat(closed).sort_values('exit_time', kind='stable')
+    profits = closed['profit'].values
+    equity = np.cumsum(profits)
+    gross_loss = -profits[profits < 0].sum()
+    row.update({
+        'trades': len(profits),
+        'tp': int((profits > 0).sum()),
+        'sl': int((profits < 0).sum()),
+        'win_rate': float((profits > 0).mean() * 100) if len(profits) else 0.0,
+        'profit': float(profits.sum()),
+        'profit_factor': float(profits[profits > 0].sum() / gross_loss) if gross_loss else float('inf'),
+        'max_drawdown': float((np.maximum.accumulate(np.r_[0.0, equity])[1:] - equity).max()) if len(profits) else 0.0,
+    })
+    return row
+
+def _evaluate_chunk(workdir, symbols, base, combos, start):
+    return [_evaluate(workdir, symbols, base, params, start) for params in combos]
+
+def load_checkpoint(path, run=None):
+    done = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Kesilmiş son satır; o kombinasyon yeniden hesaplanır
+                if row.get('run') == run:
+                    done[row['key']] = row['result']  # Başka bir çalıştırmanın sonuçları atlanır
+    return done
+
+def optimize(klines_by_symbol, grid=DEFAULT_GRID, base=CONFIGS["safe"], samples=None, seed=0, workers=OPTIMIZE_WORKERS,
+             chunk_size=OPTIMIZE_CHUNK_SIZE, checkpoint=None, start=DATA_WINDOW, progress=None):
+    if not klines_by_symbol:
+        raise ValueError("Optimizasyon için kline verisi yok")
+    combos = parameter_grid(grid, base, samples, seed)
+    run = run_key(klines_by_symbol, base, start) if checkpoint else None
+    done = load_checkpoint(checkpoint, run)
+    pending = [params for params in combos if combo_key(params) not in done]
+    symbols = list(klines_by_symbol)
+    if pending:
+        workdir = tempfile.mkdtemp(prefix='optimizer_')
+        try:
+            prepare_data(klines_by_symbol, workdir)
+            groups = {}
+            for params in pending:
+                config = base | params
+                groups.setdefault((config_timeframe(config), config["LEFT"], config["RIGHT"]), []).append(params)
+            # Worker'lar girdilerini memmap dosyalarından okur; fork'un paylaşılan belleğine ihtiyaç yok ve thread'li bir
+            # süreçten (panel, bildirim) fork edilen çocuk tutulan bir kilitte takılabilir
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                list(executor.map(_compute_pivots, *zip(*[(workdir, symbols, *group) for group in groups])))
+                # Aynı (zaman dilimi, LEFT, RIGHT) grubundaki parçalar aynı pivot dosyasını kullanır
+                futures = [
+                    executor.submit(_evaluate_chunk, workdir, symbols, base, group[i:i + chunk_size], start)
+                    for group in groups.values() for i in range(0, len(group), chunk_size)
+                ]
+                with open(checkpoint, 'a') if checkpoint else open(os.devnull, 'w') as f:
+                    for future in as_completed(futures):
+                        for row in future.result():
+                            key = combo_key({k: row[k] for k in grid})
+                            done[key] = row
+                            f.write(json.dumps({'run': run, 'key': key, 'result': row}) + "\n")
+                        f.flush()
+                        if progress:
+                            progress(len(done), len(combos))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return pd.DataFrame([done[combo_key(params)] for params in combos])
+
+def rank(results, sort='profit', min_trades=0):
+    results = results[results['trades'] >= min_trades]
+    return results.sort_values(sort, ascending=sort == 'max_drawdown', kind='stable').reset_index(drop=True)
+
+def to_configs(ranked, base=CONFIGS["safe"], top=3, prefix="opt"):
+    configs = {}
+    for i, row in enumerate(ranked.head(top).to_dict('records'), start=1):
+        params = {key: row[key] for key in base if key in row}
+        configs[f"{prefix}_{i}"] = base | {key: value.item() if isinstance(value, np.generic) else value for key, value in params.items()}
+    return configs
+
+def format_configs(configs):
+    # config.py ile aynı biçimde; doğrudan CONFIGS sözlüğüne eklenebilir
+    lines = ["CONFIGS = {"]
+    for name, config in configs.items():
+        lines.append(f"    {json.dumps(name)}: {{")
+        lines += [f"        {json.dumps(key)}: {json.dumps(value)}," for key, value in config.items()]
+        lines.append("    },")
+    lines.append("}")
+    return "\n".join(lines)
+
+def _symbol_files(data_dir, symbol):
+    return sorted(glob.glob(os.path.join(data_dir, f"{symbol}*.csv")) + glob.glob(os.path.join(data_dir, f"{symbol}*.parquet")))
+
+def main():
+    parser = argparse.ArgumentParser(description="Strateji parametreleri için paralel grid/rastgele arama")
+    parser.add_argument('data_dir', nargs='?', help="Sembol adıyla başlayan 15m kline dosyalarının dizini (ör. BTCUSDT-15m-2024.csv)")
+    parser.add_argument('--cached', action='store_true', help="Dosyalar yerine kline önbelleğini kullan")
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS)
+    parser.add_argument('--grid', help="Parametre -> değer listesi JSON dosyası (varsayılan: DEFAULT_GRID)")
+    parser.add_argument('--base', default="safe", help="Izgarada olmayan parametrelerin alınacağı config")
+    parser.add_argument('--samples', type=int, help="Izgaradan rastgele seçilecek kombinasyon sayısı")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=OPTIMIZE_WORKERS)
+    parser.add_argument('--checkpoint', default="optimizer_checkpoint.jsonl", help="Tamamlanan kombinasyonlar; yeniden çalıştırmada atlanır")
+    parser.add_argument('--sort', default="profit", choices=['profit', 'profit_factor', 'win_rate', 'max_drawdown'])
+    parser.add_argument('--min-trades', type=int, default=30)
+    parser.add_argument('--top', type=int, default=3)
+    parser.add_argument('--out', help="Sıralı sonuçların yazılacağı CSV dosyası")
+    parser.add_argument('--emit', help="En iyi kombinasyonların CONFIGS girdisi olarak yazılacağı dosya")
+    args = parser.parse_args()
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    klines_by_symbol = {}
+    for symbol in args.symbols:
+        if args.cached:
+            klines_by_symbol[symbol] = KlineCache(symbol, readonly=True).klines()
+            continue
+        files = _symbol_files(args.data_dir, symbol)
+        if files:
+            klines_by_symbol[symbol] = load_klines(*files)
+        else:
+            print(f"{symbol}: veri dosyası bulunamadı, atlanıyor")
+    if not klines_by_symbol:
+        parser.error("Hiçbir sembol için kline verisi bulunamadı")
+    results = optimize(
+        klines_by_symbol, grid, CONFIGS[args.base], args.samples, args.seed, args.workers, checkpoint=args.checkpoint,
+        progress=lambda done, total: print(f"\r{done}/{total} kombinasyon", end="", flush=True)
+    )
+    print()
+    ranked = rank(results, args.sort, args.min_trades)
+    print(ranked.head(20).to_string())
+    if args.out:
+        ranked.to_csv(args.out, index=False)
+    configs = format_configs(to_configs(ranked, CONFIGS[args.base], args.top))
+    if args.emit:
+        with open(args.emit, 'w') as f:
+            f.write(configs + "\n")
+    else:
+        print(configs)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
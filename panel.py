@@ -1,5 +1,6 @@
 # panel.py
 import dash
+import flask
 from dash import dcc, html, Input, Output
 import pandas as pd
 import plotly.graph_objects as go
@@ -8,7 +9,11 @@ from notifications import Notifier
 from plotter import Plotter
 from data_manager import DataManager
 from config import API_KEY, API_SECRET, CONFIGS
-from settings import SYMBOLS, PLOT_CANDLES_BEFORE, PLOT_CANDLES_AFTER
+from settings import SYMBOLS, PLOT_CANDLES_BEFORE, PLOT_CANDLES_AFTER, SHARDS, BASE_TIMEFRAME
+from metrics import registry
+from shards import ShardSupervisor
+from kline_cache import INTERVAL_MS
+from bar_aggregator import config_timeframe, resample
 import threading
 import sys
 import argparse
@@ -22,13 +27,25 @@ class CustomNotifier(Notifier):
         log_messages.append(f"[{timestamp}] {message}")
         super().send_message(message)
 
-notifier = CustomNotifier()
-plotter = Plotter()
-data_manager = DataManager(API_KEY, API_SECRET)
-engine = TradingEngine(API_KEY, API_SECRET, data_manager, notifier, plotter)
+def build_runtime():
+    # Yalnızca __main__ altında çağrılır: spawn ile açılan render/shard süreçleri bu modülü yeniden içe aktarır
+    # ve ikinci bir motor, journal veya veritabanı bağlantısı açmamalıdır
+    if SHARDS:
+        # Semboller worker süreçlerinde işlenir; panel ve CLI shard'lardan gelen anlık görüntüleri okur
+        supervisor = ShardSupervisor(SYMBOLS, SHARDS, on_messages=log_messages.extend)
+        return supervisor.data_manager, supervisor.view
+    data_manager = DataManager(API_KEY, API_SECRET)
+    return data_manager, TradingEngine(API_KEY, API_SECRET, data_manager, CustomNotifier(), Plotter())
+
+data_manager = engine = None  # build_runtime ile kurulur
 
 app = dash.Dash(__name__, assets_folder='assets')
 
+@app.server.route('/metrics')
+def metrics():
+    # Prometheus scrape adresi
+    return flask.Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 app.layout = html.Div([
     html.H1("Trading Bot Dashboard"),
     html.Div([
@@ -69,11 +86,11 @@ def run_cli():
     parser = argparse.ArgumentParser(description="Trading Bot CLI - Bot durumunu sorgula", prog="TradingBotCLI")
     parser.add_argument("symbol", help=f"İşlem çifti (ör: BTCUSDT, seçenekler: {', '.join(SYMBOLS)})")
     parser.add_argument("bot", help=f"Bot adı (ör: safe, mid, agresif, seçenekler: {', '.join(CONFIGS.keys())})")
-    parser.add_argument("command", help="Komut (kasa, işlem, performans, durum)")
+    parser.add_argument("command", help="Komut (kasa, işlem, performans, durum; tüm sistem için 'metrics [SYMBOL]')")
     parser.add_argument("--period", help="Performans dönemi (1ay, 3ay, 6ay)", default=None)
     
     print("\033[1;36m=== Trading Bot CLI ===\033[0m")
-    print("Komutları girin (ör: 'BTCUSDT mid kasa') veya '--help' ile yardım alın. Çıkmak için 'çıkış' yazın.")
+    print("Komutları girin (ör: 'BTCUSDT mid kasa') veya '--help' ile yardım alın ('metrics' ile gecikme ve sayaçlar). Çıkmak için 'çıkış' yazın.")
     
     while True:
         query = input("\033[1;32m> \033[0m").strip()
@@ -83,6 +100,11 @@ def run_cli():
         if query.lower() in ["--help", "-h"]:
             print(parser.format_help())
             continue
+        if query.lower().split()[:1] == ["metrics"]:
+            # Aşama gecikmeleri ve sayaçlar; sembol verilirse yalnızca o sembol
+            parts = query.split()
+            print(f"\033[1;33m{registry.report(parts[1].upper() if len(parts) > 1 else None)}\033[0m")
+            continue
         
         try:
             args = parser.parse_args(query.split())
@@ -111,7 +133,7 @@ def update_summary(symbol, bot_name, n_intervals):
             html.P(f"Anlık Fiyat: {data_manager.get_current_price(symbol):.2f} USDT"),
             html.P(f"Kasa: {data_manager.balances[symbol][bot_name]:.2f} USD (Başlangıç: {CONFIGS[bot_name]['INITIAL_BALANCE']} USD)"),
             html.P(f"Açık Pozisyon: {len(engine.positions[symbol][bot_name])}"),
-            html.P(f"Toplam İşlem: {len(data_manager.trades[symbol][bot_name])}"),
+            html.P(f"Toplam İşlem: {data_manager.get_trade_count(symbol, bot_name)}"),
             html.P(f"Aylık İşlem: {data_manager.stats[symbol][bot_name]['monthly_trades']}")
         ]
     except KeyError:
@@ -121,10 +143,11 @@ def update_summary(symbol, bot_name, n_intervals):
 def update_stats(symbol, bot_name, period):
     if symbol is None or bot_name is None:
         return "Lütfen bir pair ve bot seçin.", go.Figure()
-    stats, trades = data_manager.get_stats(symbol, bot_name, period)
-    if not trades.empty:
+    stats = data_manager.get_stats(symbol, bot_name, period)
+    curve = data_manager.get_equity_curve(symbol, bot_name, period)
+    if not curve.empty:
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=trades['exit_time'], y=trades['profit'].cumsum(), mode='lines+markers', name='Kâr/Zarar', line=dict(color='#8da2fb')))
+        fig.add_trace(go.Scatter(x=curve['exit_time'], y=curve['equity'], mode='lines+markers', name='Kâr/Zarar', line=dict(color='#8da2fb')))
         fig.update_layout(title=f'{symbol}/{bot_name} Kâr/Zarar ({period or "Tüm Zaman"})', xaxis_title='Tarih', yaxis_title='Kâr/Zarar (USD)', template='plotly_dark', title_font_color='#8da2fb')
     else:
         fig = go.Figure()
@@ -136,22 +159,31 @@ def update_trades(symbol, bot_name):
     if symbol is None or bot_name is None:
         return "Lütfen bir pair ve bot seçin.", []
     trades = data_manager.get_last_trades(symbol, bot_name, count=10)
-    options = [{'label': f'İşlem {i+1}', 'value': i} for i in range(min(10, len(data_manager.trades[symbol][bot_name])))]
+    options = [{'label': f'İşlem {i+1}', 'value': i} for i in range(min(10, data_manager.get_trade_count(symbol, bot_name)))]
     return trades, options
 
 @app.callback(Output('trade-graph', 'figure'), [Input('symbol-dropdown', 'value'), Input('bot-dropdown', 'value'), Input('trade-dropdown', 'value')])
 def update_trade_graph(symbol, bot_name, trade_idx):
-    if symbol is None or bot_name is None or trade_idx is None or trade_idx >= len(data_manager.trades[symbol][bot_name]):
+    if symbol is None or bot_name is None or trade_idx is None:
+        return go.Figure()
+    trade = data_manager.get_trade(symbol, bot_name, trade_idx)
+    if trade is None:
         return go.Figure()
-    
-    trade = data_manager.trades[symbol][bot_name][trade_idx]
-    df = engine.data[symbol][bot_name].set_index('open_time')
     entry_time = pd.to_datetime(trade['entry_time'])
     exit_time = pd.to_datetime(trade['exit_time'])
     sweep_time = pd.to_datetime(trade['sweep_time'])
-    start_time = sweep_time - timedelta(minutes=15 * PLOT_CANDLES_BEFORE)
-    end_time = exit_time + timedelta(minutes=15 * PLOT_CANDLES_AFTER)
-    df_plot = df.loc[start_time:end_time].copy()
+    timeframe = config_timeframe(CONFIGS[bot_name])
+    bar = timedelta(milliseconds=INTERVAL_MS[timeframe])
+    start_time = sweep_time - bar * PLOT_CANDLES_BEFORE
+    end_time = exit_time + bar * PLOT_CANDLES_AFTER
+    # Eski işlemler bellekteki pencereden çıkmış olabilir; barlar kline önbelleğinden okunur
+    df_plot = engine.kline_caches[symbol].klines(start_time.value // 10**6, end_time.value // 10**6)
+    if timeframe != BASE_TIMEFRAME:
+        # Önbellek taban barları tutar; botun kendi zaman dilimine toplanır
+        columns = resample(*(df_plot[col].values for col in ('open_time', 'open', 'high', 'low', 'close')), BASE_TIMEFRAME, timeframe)
+        df_plot = pd.DataFrame(dict(zip(('open_time', 'open', 'high', 'low', 'close'), columns[:5])))
+    df_plot['open_time'] = df_plot['open_time'].astype('datetime64[ms]')
+    df_plot = df_plot.set_index('open_time')
 
     fig = go.Figure()
     fig.add_trace(go.Candlestick(x=df_plot.index, open=df_plot['open'], high=df_plot['high'], low=df_plot['low'], close=df_plot['close'], name='Fiyat'))
@@ -167,6 +199,7 @@ def update_trade_graph(symbol, bot_name, trade_idx):
     return fig
 
 if __name__ == "__main__":
+    data_manager, engine = build_runtime()
     engine.start()
     cli_thread = threading.Thread(target=run_cli)
     cli_thread.daemon = True
@@ -0,0 +1,76 @@
+# pivot_tracker.py
+from utils import pivots_batch
+
+class PivotSet:
+    # Bir sembolün tüm (LEFT, RIGHT) çiftleri için artımlı pivotlar: sol üstünlük her LEFT için bar başına bir kez,
+    # sağ onay her RIGHT için bar başına bir kez hesaplanır; çift başına yalnızca iki bayrak birleştirilir
+    def __init__(self, pairs):
+        self.pairs = sorted(set(pairs))
+        self.lefts = sorted({left for left, _ in self.pairs})
+        self.rights = sorted({right for _, right in self.pairs})
+        self.count = 0  # Şimdiye kadar eklenen bar sayısı
+        self.ph = {pair: {} for pair in self.pairs}  # Çift -> {mutlak bar sırası: fiyat}
+        self.pl = {pair: {} for pair in self.pairs}
+        self.left_flags = {left: {} for left in self.lefts}  # LEFT -> {mutlak bar: (high baskın, low baskın)}; son max(RIGHT) + 1 bar
+
+    @staticmethod
+    def _left(high, low, pos, left):
+        # pos barı kendinden önceki left barın hepsinden yüksek/düşük mü
+        if pos < left:
+            return False, False
+        if left == 0:
+            return True, True
+        return bool(high[pos] > high[pos - left:pos].max()), bool(low[pos] < low[pos - left:pos].min())
+
+    @staticmethod
+    def _right(high, low, pos, n):
+        if pos == n - 1:
+            return True, True
+        return bool(high[pos] > high[pos + 1:n].max()), bool(low[pos] < low[pos + 1:n].min())
+
+    def reset(self, high, low, count=None):
+        # count: pencerenin son barından sonraki mutlak bar sırası (varsayılan: pencere boyu)
+        n = len(high)
+        self.count = n if count is None else count
+        offset = self.count - n
+        for pair, (ph, pl) in pivots_batch(high, low, self.pairs).items():
+            self.ph[pair] = {offset + idx: price for idx, price in ph}
+            self.pl[pair] = {offset + idx: price for idx, price in pl}
+        keep = max(0, n - self.rights[-1] - 1)
+        for left, flags in self.left_flags.items():
+            flags.clear()
+            for pos in range(keep, n):
+                flags[offset + pos] = self._left(high, low, pos, left)
+
+    def update(self, high, low, count=None):
+        # Pencereye tek bir bar eklendi: her RIGHT için yalnızca len-1-RIGHT adayı yeni pivot olabilir
+        self.count = self.count + 1 if count is None else count
+        n = len(high)
+        offset = self.count - n
+        for left, flags in self.left_flags.items():
+            flags[offset + n - 1] = self._left(high, low, n - 1, left)
+            flags.pop(offset + n - 2 - self.rights[-1], None)
+        right_flags = {right: self._right(high, low, n - 1 - right, n) for right in self.rights if n - 1 - right >= 0}
+        for left, right in self.pairs:
+            k = n - 1 - right
+            if k < left:
+                continue
+            seq = offset + k
+            left_high, left_low = self.left_flags[left].get(seq, (False, False))
+            right_high, right_low = right_flags[right]
+            if left_high and right_high:
+                self.ph[(left, right)][seq] = float(high[k])
+            if left_low and right_low:
+                self.pl[(left, right)][seq] = float(low[k])
+        self._prune(n)
+
+    def _prune(self, n):
+        # Sol penceresi pencere dışına kayan pivotlar tam hesaplamada da görünmez
+        for left, right in self.pairs:
+            first = self.count - n + left
+            for pivots in (self.ph[(left, right)], self.pl[(left, right)]):
+                while pivots:
+                    seq = next(iter(pivots))
+                    if seq >= first:
+                        break
+                    del pivots[seq]
\ No newline at end of file
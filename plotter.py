@@ -1,33 +1,184 @@
 # plotter.py
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from settings import PLOT_CANDLES_BEFORE, PLOT_CANDLES_AFTER
+from settings import PLOT_CANDLES_BEFORE, PLOT_CANDLES_AFTER, PLOT_TIMEFRAME, RENDER_WORKERS, RENDER_QUEUE_SIZE
+from kline_cache import INTERVAL_MS
+from metrics import registry
+
+TRADE_FIELDS = ('type', 'entry_price', 'sl', 'tp', 'pivot_price', 'sweep_low', 'sweep_high', 'manip_low', 'manip_high')
+
+def _to_ms(value):
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+def _candle_columns(candles):
+    # CandleBuffer ya da open_time sütunlu DataFrame kabul edilir
+    if hasattr(candles, 'view'):
+        return {col: candles.view(col) for col in candles.COLUMNS}
+    columns = {col: candles[col].values for col in ('open', 'high', 'low', 'close')}
+    columns['open_time'] = candles['open_time'].values.astype('datetime64[ms]').astype('int64')
+    return columns
+
+def _warm_up():
+    # kaleido 1.x tarayıcıyı yalnızca sync sunucu açıkken grafikler arasında tekrar kullanır; sunucu olmadan her
+    # write_image kendi Chromium'unu açıp kapatır. Sunucu worker başlarken açılır, worker kapanırken durdurulur
+    try:
+        import kaleido
+        if not hasattr(kaleido, 'start_sync_server'):
+            return  # kaleido 0.x: grafikler tek seferlik alt süreçle üretilir
+        kaleido.Kaleido()  # Chrome yoksa burada hata verir; sunucu thread'inde ölseydi render'lar sonsuza kadar beklerdi
+        kaleido.start_sync_server(silence_warnings=True)
+    except Exception as e:
+        logging.warning(f"Render sunucusu başlatılamadı, grafikler tek seferlik tarayıcıyla üretilecek: {e}")
+        return
+    # Havuz worker'ları atexit çalıştırmadan çıkar; multiprocessing sonlandırıcıları çalışır
+    multiprocessing.util.Finalize(None, kaleido.stop_sync_server, kwargs={'silence_warnings': True}, exitpriority=10)
+    try:
+        go.Figure().to_image(format='png', width=10, height=10)  # Tarayıcı sekmesi ilk işlemden önce hazırlanır
+    except Exception as e:
+        logging.warning(f"Render worker ısınamadı: {e}")
+
+def render_snapshot(snapshot):
+    candles = snapshot['candles']
+    x = pd.to_datetime(candles['open_time'], unit='ms')
+    entry_time = pd.to_datetime(snapshot['entry_time'], unit='ms')
+    sweep_time = pd.to_datetime(snapshot['sweep_time'], unit='ms')
+    trade = snapshot['trade']
+    fig = go.Figure()
+    fig.add_trace(go.Candlestick(x=x, open=candles['open'], high=candles['high'], low=candles['low'], close=candles['close'], name='Fiyat'))
+    fig.add_trace(go.Scatter(x=[sweep_time], y=[trade['sweep_low'] if trade['type'] == 'long' else trade['sweep_high']], mode='markers', marker=dict(symbol='circle', size=10, color='white'), name=f'Sweep'))
+    fig.add_trace(go.Scatter(x=[entry_time], y=[trade['entry_price']], mode='markers', marker=dict(symbol='triangle-up', size=10, color='cyan'), name=f'Giriş: {trade["entry_price"]:.2f}'))
+    fig.add_trace(go.Scatter(x=x, y=[trade['sl']] * len(x), mode='lines', line=dict(dash='dash', color='red'), name=f'SL: {trade["sl"]:.2f}'))
+    fig.add_trace(go.Scatter(x=x, y=[trade['tp']] * len(x), mode='lines', line=dict(dash='dash', color='cyan'), name=f'TP: {trade["tp"]:.2f}'))
+    fig.add_trace(go.Scatter(x=x, y=[trade['pivot_price']] * len(x), mode='lines', line=dict(dash='dash', color='white'), name=f'Pivot: {trade["pivot_price"]:.2f}'))
+    manip_extreme = trade['manip_low'] if trade['type'] == 'long' else trade['manip_high']
+    fig.add_trace(go.Scatter(x=[sweep_time], y=[manip_extreme], mode='markers', marker=dict(symbol='x', size=10, color='white'), name=f'Manip'))
+
+    fig.update_layout(
+        title=f'{snapshot["symbol"]}/{snapshot["config_name"]} {"İşlem Açılışı" if snapshot["is_opening"] else "İşlem Kapanışı"}',
+        xaxis_title='Zaman',
+        yaxis_title='Fiyat (USDT)',
+        template='plotly_dark',
+        title_font_color='cyan'
+    )
+
+    status = "opening" if snapshot['is_opening'] else "closing"
+    os.makedirs("trades", exist_ok=True)
+    path = f"trades/{snapshot['symbol']}_{snapshot['config_name']}_{str(entry_time).replace(':', '-')}_{status}.png"
+    fig.write_image(path)
+    return path
 
 class Plotter:
-    def save_trade_graph(self, symbol, config_name, trade, df, is_opening=False):
-        entry_time = pd.to_datetime(trade['entry_time'])
-        sweep_time = pd.to_datetime(trade['sweep_time'])
-        start_time = sweep_time - pd.Timedelta(minutes=15 * PLOT_CANDLES_BEFORE)
-        end_time = entry_time + pd.Timedelta(minutes=15 * PLOT_CANDLES_AFTER)
-        df_plot = df.loc[start_time:end_time].copy()
-
-        fig = go.Figure()
-        fig.add_trace(go.Candlestick(x=df_plot.index, open=df_plot['open'], high=df_plot['high'], low=df_plot['low'], close=df_plot['close'], name='Fiyat'))
-        fig.add_trace(go.Scatter(x=[sweep_time], y=[trade['sweep_low'] if trade['type'] == 'long' else trade['sweep_high']], mode='markers', marker=dict(symbol='circle', size=10, color='white'), name=f'Sweep'))
-        fig.add_trace(go.Scatter(x=[entry_time], y=[trade['entry_price']], mode='markers', marker=dict(symbol='triangle-up', size=10, color='cyan'), name=f'Giriş: {trade["entry_price"]:.2f}'))
-        fig.add_trace(go.Scatter(x=df_plot.index, y=[trade['sl']] * len(df_plot), mode='lines', line=dict(dash='dash', color='red'), name=f'SL: {trade["sl"]:.2f}'))
-        fig.add_trace(go.Scatter(x=df_plot.index, y=[trade['tp']] * len(df_plot), mode='lines', line=dict(dash='dash', color='cyan'), name=f'TP: {trade["tp"]:.2f}'))
-        fig.add_trace(go.Scatter(x=df_plot.index, y=[trade['pivot_price']] * len(df_plot), mode='lines', line=dict(dash='dash', color='white'), name=f'Pivot: {trade["pivot_price"]:.2f}'))
-        manip_extreme = trade['manip_low'] if trade['type'] == 'long' else trade['manip_high']
-        fig.add_trace(go.Scatter(x=[sweep_time], y=[manip_extreme], mode='markers', marker=dict(symbol='x', size=10, color='white'), name=f'Manip'))
-
-        fig.update_layout(
-            title=f'{symbol}/{config_name} {"İşlem Açılışı" if is_opening else "İşlem Kapanışı"}',
-            xaxis_title='Zaman',
-            yaxis_title='Fiyat (USDT)',
-            template='plotly_dark',
-            title_font_color='cyan'
-        )
-
-        status = "opening" if is_opening else "closing"
-        fig.write_image(f"trades/{symbol}_{config_name}_{trade['entry_time'].replace(':', '-')}_{status}.png")
\ No newline at end of file
+    def __init__(self, workers=RENDER_WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.counters = {"queued": 0, "rendered": 0, "dropped": 0, "failed": 0}
+
+    def start(self):
+        # Uzun ömürlü render süreçleri önceden açılır ve ısıtılır; websocket/Dash thread'leri çalışırken fork
+        # edilmiş bir çocuk, o an tutulan bir kilitte takılabileceği için süreçler spawn ile başlatılır
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=_warm_up)
+                for _ in range(self.workers):
+                    self.executor.submit(int)
+
+    def stop(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+    def snapshot(self, symbol, config_name, trade, candles, is_opening=False):
+        # Grafik için gereken mum dilimi ve işlem alanlarının küçük bir kopyası
+        columns = _candle_columns(candles)
+        entry_time = _to_ms(trade['entry_time'])
+        sweep_time = _to_ms(trade['sweep_time'])
+        bar_ms = INTERVAL_MS[getattr(candles, 'interval', None) or PLOT_TIMEFRAME]
+        start = np.searchsorted(columns['open_time'], sweep_time - bar_ms * PLOT_CANDLES_BEFORE, side='left')
+        end = np.searchsorted(columns['open_time'], entry_time + bar_ms * PLOT_CANDLES_AFTER, side='right')
+        return {
+            'symbol': symbol,
+            'config_name': config_name,
+            'is_opening': is_opening,
+            'entry_time': entry_time,
+            'sweep_time': sweep_time,
+            'trade': {field: trade.get(field) for field in TRADE_FIELDS},
+            'candles': {col: np.array(values[start:end]) for col, values in columns.items()},
+        }
+
+    def submit(self, snapshot):
+        if self.executor is None:
+            self.start()
+        with self.lock:
+            if self.pending >= RENDER_QUEUE_SIZE:
+                self.counters["dropped"] += 1
+                logging.warning(f"Render kuyruğu dolu, grafik atlandı: {snapshot['symbol']}/{snapshot['config_name']}")
+                return None
+            self.pending += 1
+            self.counters["queued"] += 1
+            executor = self.executor
+        try:
+            future = executor.submit(render_snapshot, snapshot)
+        except Exception as e:
+            # Bozulan havuz (ör. ölen worker) kapatılıp yeniden kurulur; hata işlem döngüsüne taşınmaz
+            with self.lock:
+                self.pending -= 1
+                self.counters["failed"] += 1
+            registry.inc('errors_total', source='render')
+            logging.error(f"Grafik sıraya alınamadı, render havuzu yeniden kuruluyor: {e}")
+            self._restart(executor)
+            return None
+        future.executor = executor
+        future.submitted = time.perf_counter()  # Render süresi kuyrukta bekleme dahil ölçülür
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _restart(self, executor):
+        with self.lock:
+            if self.executor is not executor:
+                return  # Başka bir thread zaten yeniledi
+            self.executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+    def _on_done(self, future):
+        registry.observe('render', time.perf_counter() - future.submitted)
+        with self.lock:
+            self.pending -= 1
+            if isinstance(future.exception(), BrokenProcessPool) and self.executor is future.executor:
+                self.executor = None  # Bir sonraki submit yeni havuz açar
+            if future.exception() is not None:
+                self.counters["failed"] += 1
+                registry.inc('errors_total', source='render')
+                logging.error(f"Grafik oluşturma hatası: {future.exception()}")
+            else:
+                self.counters["rendered"] += 1
+
+    def save_trade_graph(self, symbol, config_name, trade, candles, is_opening=False):
+        # İşlem döngüsü yalnızca anlık görüntü alıp sıraya koyar; render ayrı süreçte yapılır
+        try:
+            return self.submit(self.snapshot(symbol, config_name, trade, candles, is_opening))
+        except Exception as e:
+            with self.lock:
+                self.counters["failed"] += 1
+            registry.inc('errors_total', source='render')
+            logging.error(f"Grafik sıraya alınamadı [{symbol}/{config_name}]: {e}")
+            return None
+
+    def render_history(self, symbol, config_name, trades, candles, is_opening=False):
+        # Geçmiş işlemlerin grafiklerini toplu olarak yeniden üretir
+        futures = [self.submit(self.snapshot(symbol, config_name, trade, candles, is_opening)) for trade in trades]
+        futures = [future for future in futures if future is not None]
+        wait(futures)
+        return [future.result() for future in futures if future.exception() is None]
@@ -0,0 +1,58 @@
+# position_book.py
+import itertools
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+class PositionBook:
+    def __init__(self):
+        # Sembol başına tetik seviyelerine göre sıralı (seviye, id) listeleri
+        self.triggers = {}
+        self.entries = {}  # id -> (symbol, config_name, pos)
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def _levels(self, symbol):
+        if symbol not in self.triggers:
+            self.triggers[symbol] = {'long_sl': [], 'long_tp': [], 'short_sl': [], 'short_tp': []}
+        return self.triggers[symbol]
+
+    def add(self, symbol, config_name, pos):
+        with self.lock:
+            pos_id = next(self.ids)
+            levels = self._levels(symbol)
+            insort(levels[f"{pos['type']}_sl"], (pos['sl'], pos_id))
+            insort(levels[f"{pos['type']}_tp"], (pos['tp'], pos_id))
+            self.entries[pos_id] = (symbol, config_name, pos)
+            return pos_id
+
+    def remove(self, pos_id):
+        with self.lock:
+            entry = self.entries.pop(pos_id, None)
+            if entry is None:
+                return
+            symbol, _, pos = entry
+            levels = self._levels(symbol)
+            for kind in ('sl', 'tp'):
+                triggers = levels[f"{pos['type']}_{kind}"]
+                key = (pos[kind], pos_id)
+                idx = bisect_left(triggers, key)
+                if idx < len(triggers) and triggers[idx] == key:
+                    del triggers[idx]
+
+    def check(self, symbol, low, high):
+        # low/high: son kontrolden bu yana görülen en düşük/en yüksek fiyat
+        with self.lock:
+            levels = self.triggers.get(symbol)
+            if levels is None:
+                return []
+            sl_hits = [pos_id for _, pos_id in levels['long_sl'][bisect_left(levels['long_sl'], (low,)):]]
+            sl_hits += [pos_id for _, pos_id in levels['short_sl'][:bisect_right(levels['short_sl'], (high, float('inf')))]]
+            tp_hits = [pos_id for _, pos_id in levels['long_tp'][:bisect_right(levels['long_tp'], (high, float('inf')))]]
+            tp_hits += [pos_id for _, pos_id in levels['short_tp'][bisect_left(levels['short_tp'], (low,)):]]
+            hits = [(pos_id, 'sl') for pos_id in sl_hits]
+            seen = set(sl_hits)  # Aynı aralıkta ikisi de tetiklenirse SL önceliklidir
+            hits += [(pos_id, 'tp') for pos_id in tp_hits if pos_id not in seen]
+            return [(pos_id, self.entries[pos_id], reason) for pos_id, reason in sorted(hits)]
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,66 @@
+# price_feed.py
+import logging
+import threading
+import time
+
+class PriceFeed:
+    def __init__(self, client, symbols, max_age=5.0):
+        self.client = client
+        self.max_age = max_age
+        self.prices = {symbol: None for symbol in symbols}
+        self.updated_at = {symbol: 0.0 for symbol in symbols}
+        self.listeners = []  # Her fiyat güncellemesinde (symbol, price) ile çağrılır
+        self.lock = threading.Lock()
+
+    def on_message(self, msg):
+        data = msg.get('data', msg) if isinstance(msg, dict) else None
+        if not isinstance(data, dict) or data.get('s') not in self.prices:
+            if isinstance(data, dict) and data.get('e') == 'error':
+                logging.error(f"Fiyat stream hatası: {data}")
+            return
+        if data.get('e') == 'markPriceUpdate':
+            price = float(data['p'])
+        elif 'b' in data and 'a' in data:  # bookTicker: en iyi alış/satış ortası
+            price = (float(data['b']) + float(data['a'])) / 2
+        else:
+            return
+        self.set_price(data['s'], price)
+
+    def set_price(self, symbol, price):
+        with self.lock:
+            self.prices[symbol] = price
+            self.updated_at[symbol] = time.monotonic()
+        for listener in self.listeners:
+            listener(symbol, price)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def age(self, symbol):
+        return time.monotonic() - self.updated_at.get(symbol, 0.0)
+
+    def is_stale(self, symbol):
+        return self.prices.get(symbol) is None or self.age(symbol) > self.max_age
+
+    def stale_symbols(self):
+        return [symbol for symbol in self.prices if self.is_stale(symbol)]
+
+    def get(self, symbol):
+        # Strateji için: eski fiyat yerine None döner
+        if self.is_stale(symbol):
+            return None
+        return self.prices[symbol]
+
+    def latest(self, symbol):
+        # Gösterim için: yaşına bakılmaksızın bilinen son fiyat
+        return self.prices.get(symbol)
+
+    def refresh(self):
+        # Tek bir toplu REST çağrısı ile tüm sembollerin fiyatı güncellenir
+        tickers = self.client.futures_symbol_ticker()
+        updated = 0
+        for ticker in tickers:
+            if ticker['symbol'] in self.prices:
+                self.set_price(ticker['symbol'], float(ticker['price']))
+                updated += 1
+        return updated
@@ -0,0 +1,89 @@
+# recorder.py
+import argparse
+import gzip
+import json
+import threading
+import time
+from binance import ThreadedWebsocketManager
+from settings import SYMBOLS, PRICE_STREAM, BASE_TIMEFRAME
+
+class StreamRecorder:
+    # Websocket mesajları alındıkları anla birlikte gzip'li JSON satırları olarak yazılır
+    def __init__(self, path):
+        self.path = path
+        self.file = gzip.open(path, 'at', encoding='utf-8')
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def record(self, msg):
+        line = json.dumps({'t': time.time(), 'm': msg}, separators=(',', ':'))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.count += 1
+
+    def wrap(self, callback):
+        def recorded(msg):
+            self.record(msg)
+            callback(msg)
+        return recorded
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+class RecordingSocketManager:
+    # Websocket yöneticisinin callback'lerini kayıtla sarar; TradingEngine'e twm olarak verilebilir
+    def __init__(self, twm, recorder):
+        self.twm = twm
+        self.recorder = recorder
+
+    def start(self):
+        self.twm.start()
+
+    def stop(self):
+        self.twm.stop()
+        self.recorder.close()
+
+    def start_multiplex_socket(self, callback, streams, **kwargs):
+        return self.twm.start_multiplex_socket(callback=self.recorder.wrap(callback), streams=streams, **kwargs)
+
+    def start_futures_multiplex_socket(self, callback, streams, **kwargs):
+        return self.twm.start_futures_multiplex_socket(callback=self.recorder.wrap(callback), streams=streams, **kwargs)
+
+    def stop_socket(self, name):
+        self.twm.stop_socket(name)
+
+def read_recording(path):
+    # (alınma zamanı, mesaj) çiftleri; kayıt yarıda kesildiyse okunabilen kısım döner
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                yield row['t'], row['m']
+        except EOFError:
+            return
+
+def main():
+    parser = argparse.ArgumentParser(description="Binance kline/fiyat stream'lerini dosyaya kaydet")
+    parser.add_argument('path', help="Kayıt dosyası (.jsonl.gz)")
+    parser.add_argument('--minutes', type=float, default=60)
+    parser.add_argument('--symbols', nargs='+', default=SYMBOLS)
+    args = parser.parse_args()
+    recorder = StreamRecorder(args.path)
+    twm = RecordingSocketManager(ThreadedWebsocketManager(), recorder)
+    twm.start()
+    ignore = lambda msg: None
+    twm.start_multiplex_socket(callback=ignore, streams=[f"{s.lower()}@kline_{BASE_TIMEFRAME}" for s in args.symbols])
+    twm.start_futures_multiplex_socket(callback=ignore, streams=[f"{s.lower()}@{PRICE_STREAM}" for s in args.symbols])
+    try:
+        time.sleep(args.minutes * 60)
+    except KeyboardInterrupt:
+        pass
+    twm.stop()
+    print(f"{recorder.count} mesaj kaydedildi: {args.path}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
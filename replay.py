@@ -0,0 +1,173 @@
+# replay.py
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from kline_cache import INTERVAL_MS
+from settings import DATA_WINDOW, BASE_TIMEFRAME, KLINE_CACHE_DIR
+from fake_exchange import FakeClient, FakeSocketManager, NullNotifier, NullPlotter, kline_message, price_message, synthetic_klines
+from recorder import read_recording
+from data_manager import DataManager
+from engine import TradingEngine
+
+def synthetic_stream(symbols, bars, start_ms, start_prices=None, updates_per_bar=4, interval=BASE_TIMEFRAME, seed=0, prices=True):
+    # Bar başına updates_per_bar mesaj (sonuncusu kapanış), her güncellemeyle birlikte isteğe bağlı markPrice mesajı
+    interval_ms = INTERVAL_MS[interval]
+    rng = np.random.default_rng(seed)
+    last = np.array([start_prices[s] for s in symbols]) if start_prices else np.full(len(symbols), 100.0)
+    for i in range(bars):
+        open_time = start_ms + i * interval_ms
+        open_ = last.copy()
+        high = open_.copy()
+        low = open_.copy()
+        for u in range(updates_per_bar):
+            last = last * np.exp(rng.normal(0, 0.002, len(symbols)))
+            high = np.maximum(high, last)
+            low = np.minimum(low, last)
+            closed = u == updates_per_bar - 1
+            t = (open_time + interval_ms * (u + 1) // updates_per_bar - closed) / 1000
+            for j, symbol in enumerate(symbols):
+                yield t, kline_message(symbol, open_time, open_[j], high[j], low[j], last[j], closed, interval)
+                if prices:
+                    yield t, price_message(symbol, last[j])
+
+def _percentile(values, q):
+    return float(np.percentile(values, q) * 1000) if len(values) else 0.0
+
+class ReplayDriver:
+    # Mesajları sahte websocket üzerinden gerçek zamanlı (speed=1), N kat hızlı (speed=N) veya beklemeden (speed=0) verir
+    def __init__(self, engine, sockets, speed=0.0):
+        self.engine = engine
+        self.sockets = sockets
+        self.speed = speed
+        self.latencies = []  # Mesajın verilmesinden process_candle bitişine kadar geçen süre (sn)
+        self.lock = threading.Lock()
+
+    def _timed(self, handler):
+        def timed(msg):
+            handler(msg)
+            sent = msg.get('_sent') if isinstance(msg, dict) else None
+            if sent is not None:
+                elapsed = time.perf_counter() - sent
+                with self.lock:
+                    self.latencies.append(elapsed)
+        return timed
+
+    def _drain(self, timeout):
+        dispatcher = self.engine.dispatcher
+        deadline = time.monotonic() + timeout
+        while dispatcher.scheduled and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def run(self, messages, drain_timeout=60):
+        dispatcher = self.engine.dispatcher
+        handler = dispatcher.handler
+        dispatcher.handler = self._timed(handler)
+        before = dispatcher.counts()
+        sent = 0
+        first = None
+        began = time.perf_counter()
+        try:
+            for t, msg in messages:
+                if self.speed:
+                    first = t if first is None else first
+                    delay = began + (t - first) / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                msg = dict(msg, _sent=time.perf_counter())
+                self.sockets.emit(msg)
+                sent += 1
+            emitted = time.perf_counter() - began
+            self._drain(drain_timeout)
+            elapsed = time.perf_counter() - began
+        finally:
+            dispatcher.handler = handler
+        after = dispatcher.counts()
+        counters = {key: after[key] - before.get(key, 0) for key in after}
+        with self.lock:
+            latencies = list(self.latencies)
+        return {
+            'messages': sent,
+            'elapsed_s': elapsed,
+            'emit_s': emitted,
+            'throughput_msg_s': sent / elapsed if elapsed else 0.0,
+            **{f"kline_{key}": value for key, value in counters.items()},
+            'latency_ms': {
+                'p50': _percentile(latencies, 50), 'p95': _percentile(latencies, 95),
+                'p99': _percentile(latencies, 99), 'max': _percentile(latencies, 100),
+            },
+        }
+
+def _recorded_symbols(path):
+    symbols = set()
+    for _, msg in read_recording(path):
+        data = msg.get('data') if isinstance(msg, dict) else None
+        if isinstance(data, dict) and 's' in data:
+            symbols.add(data['s'])
+    return sorted(symbols)
+
+def build(symbols, history=None, workdir=None, window=DATA_WINDOW):
+    # Sahte borsa ile çalışan motor; dosyalar (journal, veritabanı, kline önbelleği) workdir altında oluşur,
+    # sürecin çalışma dizini değiştirilmez
+    kline_cache_dir = KLINE_CACHE_DIR
+    if workdir:
+        os.makedirs(workdir, exist_ok=True)
+        kline_cache_dir = os.path.join(workdir, KLINE_CACHE_DIR)
+        # Modüller yüklenirken açılan trades.log yerine çalışma dizinindeki log kullanılır
+        logging.basicConfig(filename=os.path.join(workdir, 'trades.log'), level=logging.INFO, format='%(asctime)s - %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S', force=True)
+    client = FakeClient(history)
+    sockets = FakeSocketManager()
+    data_manager = DataManager(None, None, client=client, symbols=symbols, data_dir=workdir)
+    engine = TradingEngine(None, None, data_manager, NullNotifier(), NullPlotter(), twm=sockets, symbols=symbols,
+                           kline_cache_dir=kline_cache_dir, window=window)
+    return engine, sockets
+
+def main():
+    parser = argparse.ArgumentParser(description="Kayıtlı veya sentetik stream'i ağ olmadan TradingEngine'e oynat")
+    parser.add_argument('--recording', help="recorder.py ile alınmış kayıt (.jsonl.gz)")
+    parser.add_argument('--symbols', type=int, default=100, help="Sentetik sembol sayısı")
+    parser.add_argument('--bars', type=int, default=20, help="Sentetik stream bar sayısı")
+    parser.add_argument('--updates', type=int, default=4, help="Bar başına kline mesajı")
+    parser.add_argument('--history', type=int, default=250, help="Isınmada sahte REST'ten verilecek bar sayısı")
+    parser.add_argument('--speed', type=float, default=0.0, help="1: gerçek zaman, N: N kat hızlı, 0: beklemeden")
+    parser.add_argument('--workdir', help="Çalışma dizini (varsayılan: geçici dizin)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Sonuçların yazılacağı JSON dosyası")
+    args = parser.parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='replay_')
+    if args.recording:
+        path = os.path.abspath(args.recording)
+        symbols = _recorded_symbols(path)
+        engine, sockets = build(symbols, workdir=workdir)
+        messages = read_recording(path)
+    else:
+        symbols = [f"S{i:04d}USDT" for i in range(args.symbols)]
+        interval_ms = INTERVAL_MS[BASE_TIMEFRAME]
+        start_ms = (int(time.time() * 1000) // interval_ms - args.bars) * interval_ms
+        history = synthetic_klines(symbols, args.history, start_ms, seed=args.seed)
+        engine, sockets = build(symbols, history, workdir)
+        start_prices = {symbol: float(df['close'].iloc[-1]) for symbol, df in history.items()}
+        messages = synthetic_stream(symbols, args.bars, start_ms, start_prices, args.updates, seed=args.seed)
+    out = os.path.abspath(args.json) if args.json else None
+    began = time.perf_counter()
+    engine.start()
+    engine.warmup.wait(timeout=300)
+    warmup_s = time.perf_counter() - began
+    result = ReplayDriver(engine, sockets, args.speed).run(messages)
+    engine.stop()
+    result.update(symbols=len(symbols), warmup_s=warmup_s, workdir=workdir)
+    latency = result['latency_ms']
+    print(f"{len(symbols)} sembol, {result['messages']} mesaj, {result['elapsed_s']:.2f} sn ({result['throughput_msg_s']:.0f} mesaj/sn), ısınma {warmup_s:.2f} sn")
+    print(f"Gecikme (ms): p50 {latency['p50']:.2f}, p95 {latency['p95']:.2f}, p99 {latency['p99']:.2f}, maks {latency['max']:.2f}")
+    print(f"Kline: işlenen {result['kline_processed']}, birleştirilen {result['kline_coalesced']}, atılan {result['kline_dropped']}, hata {result['kline_errors']}")
+    if out:
+        with open(out, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -3,9 +3,59 @@
 # Plotlama ayarları (her bot için aynı)
 PLOT_CANDLES_BEFORE = 10
 PLOT_CANDLES_AFTER = 5
-PLOT_TIMEFRAME = "15m"  # Mum zaman dilimi
+PLOT_TIMEFRAME = "15m"  # DataFrame olarak verilen mumların zaman dilimi (motor buffer'ları kendi zaman dilimini taşır)
 
 # Genel ayarlar
 SYMBOLS = ["BTCUSDT","ETHUSDT","BNBUSDT","SOLUSDT","DOGEUSDT"]  # İşlem çiftleri
 DATA_WINDOW = 250  # Kaç mum geriye bakılacak
-PROXIMITY_THRESHOLD = 0.002  # Pivot yakınlık eşiği (%0.1)
\ No newline at end of file
+BASE_TIMEFRAME = "15m"  # Sembol başına tek kline akışı; botların TIMEFRAME ile seçtiği üst zaman dilimleri bundan üretilir
+PROXIMITY_THRESHOLD = 0.002  # Pivot yakınlık eşiği (%0.1)
+CLOSED_BARS_ONLY = True  # Aynı open_time güncellemeleri canlı barın üzerine yazar, strateji yalnızca bar kapanınca çalışır
+DISPATCH_WORKERS = 4  # Sembol kuyruklarını işleyen worker sayısı
+DISPATCH_QUEUE_SIZE = 500  # Sembol başına en fazla bekleyen mesaj
+
+# Fiyat akışı
+PRICE_STREAM = "markPrice@1s"  # Futures fiyat stream'i (markPrice@1s veya bookTicker)
+PRICE_MAX_AGE = 5.0  # Bu süreden (sn) eski fiyatlar bayat sayılır
+PRICE_CHECK_INTERVAL = 1.0  # Bayat fiyat kontrolü aralığı (sn)
+
+# Bildirimler
+NOTIFY_QUEUE_SIZE = 1000  # Gönderilmeyi bekleyen en fazla bildirim
+NOTIFY_BATCH_INTERVAL = 0.5  # Bildirimlerin tek mesajda toplandığı süre (sn)
+NOTIFY_TIMEOUT = 10  # Webhook isteği zaman aşımı (sn)
+NOTIFY_MAX_RETRIES = 5  # Başarısız gönderim için tekrar deneme sayısı
+
+# Grafik üretimi
+RENDER_WORKERS = 2  # Grafik çizen süreç sayısı
+RENDER_QUEUE_SIZE = 100  # Bekleyen en fazla grafik
+
+# Kalıcılık
+JOURNAL_SNAPSHOT_EVERY = 500  # Bu kadar olaydan sonra journal sıkıştırılıp anlık görüntü alınır
+JOURNAL_FSYNC_INTERVAL = 1.0  # Journal fsync aralığı (sn)
+TRADE_DB_FILE = "trades.db"  # İşlem geçmişi veritabanı (SQLite, WAL)
+KLINE_CACHE_DIR = "klines"  # Kapanmış barların sembol/zaman dilimi başına saklandığı dizin
+
+# Optimizasyon
+OPTIMIZE_WORKERS = 4  # Parametre taramasında kullanılan süreç sayısı
+OPTIMIZE_CHUNK_SIZE = 25  # Worker'a tek seferde verilen kombinasyon sayısı
+
+# Başlangıç
+WARMUP_WORKERS = 4  # Geçmiş veriyi eşzamanlı yükleyen thread sayısı
+WARMUP_RETRY_BASE = 2.0  # İlk tekrar deneme bekleme süresi (sn), her denemede iki katına çıkar
+WARMUP_RETRY_MAX = 60.0  # En uzun tekrar deneme bekleme süresi (sn)
+WEIGHT_LIMIT_PER_MINUTE = 2000  # Dakikalık REST ağırlık bütçesi (Binance futures limiti 2400)
+
+# İzleme
+METRICS_ENABLED = True  # Aşama süreleri, sayaçlar ve gauge'lar toplanır (/metrics ve CLI 'metrics')
+METRICS_PREFIX = "bot_"  # Prometheus metrik adı öneki
+
+# Shard'lar
+SHARDS = 0  # 0: tüm semboller tek süreçte; N: semboller N worker sürecine bölünür
+SHARD_SNAPSHOT_INTERVAL = 1.0  # Worker'ların durum gönderme aralığı (sn), aynı zamanda kalp atışı
+SHARD_HEARTBEAT_TIMEOUT = 30.0  # Bu süre anlık görüntü gelmezse shard yeniden başlatılır (sn)
+SHARD_HEALTH_INTERVAL = 2.0  # Sağlık kontrolü aralığı (sn)
+SHARD_RESTART_BASE = 2.0  # Çöken shard için ilk yeniden başlatma beklemesi (sn), art arda hatalarda iki katına çıkar
+SHARD_RESTART_MAX = 60.0  # En uzun yeniden başlatma beklemesi (sn)
+
+# Tekrar bildirim / kullanılmış pivot kümeleri
+DEDUPE_MAX_ENTRIES = 5000  # Sembol/bot başına küme sınırı; kayıtlar DATA_WINDOW süresi dolunca da silinir
\ No newline at end of file
@@ -0,0 +1,296 @@
+# shards.py
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import wait
+from config import API_KEY, API_SECRET, CONFIGS
+from settings import (SYMBOLS, SHARDS, SHARD_SNAPSHOT_INTERVAL, SHARD_HEARTBEAT_TIMEOUT,
+                      SHARD_HEALTH_INTERVAL, SHARD_RESTART_BASE, SHARD_RESTART_MAX, BASE_TIMEFRAME)
+from data_manager import DataManager
+from engine import TradingEngine
+from kline_cache import KlineCache
+from metrics import registry
+from notifications import Notifier
+from plotter import Plotter
+
+def split_symbols(symbols, shards):
+    # Sırayla dağıtım: listede yan yana duran yoğun semboller farklı shard'lara düşer
+    return [symbols[i::shards] for i in range(shards)]
+
+def build_engine(symbols):
+    # İşlemler trades.db'ye worker'dan değil, anlık görüntülerle supervisor'dan yazılır
+    data_manager = DataManager(API_KEY, API_SECRET, symbols=symbols, forward_trades=True)
+    return TradingEngine(API_KEY, API_SECRET, data_manager, Notifier(), Plotter(), symbols=symbols)
+
+def engine_snapshot(shard, engine, messages=()):
+    # Sorgu/panel için gereken durum; mum verisi ve pivotlar gönderilmez
+    data_manager = engine.data_manager
+    symbols = {}
+    for symbol in engine.symbols:
+        symbols[symbol] = {
+            'price': data_manager.price_feed.latest(symbol),
+            'warmup': engine.warmup.describe(symbol),
+            'configs': {name: {
+                'balance': data_manager.balances[symbol][name],
+                'stats': dict(data_manager.stats[symbol][name]),
+                'positions': list(engine.positions[symbol][name]),
+                'sweeps_pl': list(engine.sweeps_pl[symbol][name]),
+                'sweeps_ph': list(engine.sweeps_ph[symbol][name]),
+                'trades': len(data_manager.aggregates[symbol][name]),
+            } for name in CONFIGS},
+        }
+    # Aşama histogramları ve sayaçlar worker sürecinde tutulur; supervisor shard etiketiyle /metrics'e ekler
+    # Kapanan işlemler (forward_trades) supervisor'da tek bağlantıdan yazılır
+    return {'shard': shard, 'pid': os.getpid(), 'time': time.time(), 'symbols': symbols, 'messages': list(messages),
+            'dispatch': engine.dispatcher.counts(), 'metrics': registry.snapshot(), 'trades': data_manager.trade_store.take()}
+
+def _run_shard(shard, symbols, conn, stop_event, build):
+    # Worker süreci: kendi sembolleri için tam bir TradingEngine; anlık görüntüler aynı zamanda kalp atışıdır
+    engine = build(symbols)
+    engine.start()
+    sent = 0
+    try:
+        while not stop_event.wait(SHARD_SNAPSHOT_INTERVAL):
+            messages = getattr(engine.notifier, 'messages', [])
+            conn.send(engine_snapshot(shard, engine, messages[sent:]))
+            sent = len(messages)
+    finally:
+        engine.stop()
+        conn.close()
+
+class ShardedDataManager(DataManager):
+    # Ana süreçteki okuyucu: bakiye/istatistik/fiyat shard anlık görüntülerinden, işlem geçmişi ortak veritabanından
+    def __init__(self, symbols=None, data_dir=None):
+        # Journal'lar yalnızca worker'larda yazılır; trades.db'nin tek yazıcısı bu süreçtir
+        super().__init__(None, None, symbols=symbols, data_dir=data_dir, offline=True)
+        self.lock = threading.Lock()
+
+    def apply_snapshot(self, snapshot):
+        if snapshot['trades']:
+            self.trade_store.add_rows(snapshot['trades'])
+            try:
+                self.trade_store.flush()
+            except Exception as e:
+                # Satırlar kuyrukta kalır, arka plan yazıcısı tekrar dener; toplamlar sonraki görüntüde güncellenir
+                registry.inc('errors_total', source='trade_store')
+                logging.error(f"İşlem veritabanı yazma hatası: {e}")
+        for symbol, state in snapshot['symbols'].items():
+            if state['price'] is not None:
+                self.price_feed.set_price(symbol, state['price'])
+            for name, config_state in state['configs'].items():
+                self.balances[symbol][name] = config_state['balance']
+                self.stats[symbol][name] = config_state['stats']
+                aggregates = self.aggregates[symbol][name]
+                if len(aggregates) < config_state['trades']:
+                    # Yeni kapanan işlemler veritabanından eklenir (yazma başarısız olduysa bir sonraki görüntüye kalır)
+                    with self.lock:
+                        for exit_time, profit in self.trade_store.profits(symbol, name)[len(aggregates):]:
+                            aggregates.add(exit_time, profit)
+
+class _WarmupView:
+    def __init__(self, symbols):
+        self.status = {symbol: "bekliyor" for symbol in symbols}
+
+    def describe(self, symbol):
+        return self.status[symbol]
+
+class EngineView:
+    # TradingEngine'in panel ve handle_query tarafından okunan kısmı; değerler shard anlık görüntülerinden gelir
+    def __init__(self, supervisor, symbols):
+        self.supervisor = supervisor
+        self.symbols = list(symbols)
+        self.positions = {symbol: {name: [] for name in CONFIGS} for symbol in self.symbols}
+        self.sweeps_pl = {symbol: {name: [] for name in CONFIGS} for symbol in self.symbols}
+        self.sweeps_ph = {symbol: {name: [] for name in CONFIGS} for symbol in self.symbols}
+        self.kline_caches = {symbol: KlineCache(symbol, BASE_TIMEFRAME, readonly=True) for symbol in self.symbols}  # Worker'lar yazar
+        self.warmup = _WarmupView(self.symbols)
+
+    def apply_snapshot(self, snapshot):
+        for symbol, state in snapshot['symbols'].items():
+            self.warmup.status[symbol] = state['warmup']
+            for name, config_state in state['configs'].items():
+                self.positions[symbol][name] = config_state['positions']
+                self.sweeps_pl[symbol][name] = config_state['sweeps_pl']
+                self.sweeps_ph[symbol][name] = config_state['sweeps_ph']
+
+    def mark_down(self, symbols, reason):
+        for symbol in symbols:
+            self.warmup.status[symbol] = reason
+
+    def start(self):
+        self.supervisor.start()
+
+    def stop(self):
+        self.supervisor.stop()
+
+class ShardSupervisor:
+    # Sembolleri N worker sürecine böler, anlık görüntüleri toplar, çöken/yanıt vermeyen shard'ı yeniden başlatır
+    def __init__(self, symbols=None, shards=SHARDS, build=build_engine, on_messages=None):
+        self.symbols = list(symbols or SYMBOLS)
+        self.shards = max(1, min(shards, len(self.symbols)))
+        self.assignments = split_symbols(self.symbols, self.shards)
+        self.build = build
+        self.on_messages = on_messages  # Worker bildirimleri (ör. panel log listesine eklemek için)
+        # Yeniden başlatmalar Dash/CLI/toplayıcı thread'leri çalışırken izleme thread'inden yapılır; fork edilen çocuk
+        # o an tutulan bir kilitte (logging, sqlite, urllib3) takılabileceği için worker'lar spawn ile açılır
+        self.context = multiprocessing.get_context('spawn')
+        self.data_manager = ShardedDataManager(self.symbols)
+        self.view = EngineView(self, self.symbols)
+        self.lock = threading.Lock()
+        self.processes = {}
+        self.conns = {}  # Okuma ucu -> shard
+        self.stop_events = {}
+        self.started_at = {}
+        self.last_seen = {}  # Shard başına son anlık görüntünün alındığı an (monotonic)
+        self.dispatch = {}
+        self.failures = {shard: 0 for shard in range(self.shards)}  # Art arda başarısız başlatma
+        self.restarts = {shard: 0 for shard in range(self.shards)}
+        self.next_start = {}
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        for shard in range(self.shards):
+            self._start_shard(shard)
+        registry.add_collector(self.collect_metrics)
+        for target, name in ((self._collect, 'shard-collector'), (self._monitor, 'shard-monitor')):
+            thread = threading.Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        logging.info(f"{self.shards} shard başlatıldı: " + "; ".join(", ".join(group) for group in self.assignments))
+
+    def _start_shard(self, shard):
+        reader, writer = self.context.Pipe(duplex=False)
+        stop_event = self.context.Event()
+        process = self.context.Process(
+            target=_run_shard, args=(shard, self.assignments[shard], writer, stop_event, self.build), name=f"shard-{shard}"
+        )
+        process.daemon = True
+        process.start()
+        writer.close()  # Yazma ucu yalnızca worker'da kalır; worker ölünce okuma ucu EOF alır
+        with self.lock:
+            self.processes[shard] = process
+            self.conns[reader] = shard
+            self.stop_events[shard] = stop_event
+            self.started_at[shard] = time.monotonic()
+            self.last_seen.pop(shard, None)
+
+    def _collect(self):
+        while self.running:
+            with self.lock:
+                conns = list(self.conns)
+            if not conns:
+                time.sleep(0.1)
+                continue
+            for conn in wait(conns, timeout=1):
+                with self.lock:
+                    shard = self.conns.get(conn)
+                try:
+                    snapshot = conn.recv()
+                except (EOFError, OSError):
+                    with self.lock:
+                        self.conns.pop(conn, None)
+                    conn.close()
+                    continue
+                self._apply(shard, snapshot)
+
+    def _apply(self, shard, snapshot):
+        with self.lock:
+            self.last_seen[shard] = time.monotonic()
+            self.failures[shard] = 0
+            self.dispatch[shard] = snapshot['dispatch']
+        registry.set_remote(('shard', shard), snapshot['metrics'], shard=shard)
+        try:
+            self.data_manager.apply_snapshot(snapshot)
+            self.view.apply_snapshot(snapshot)
+            if self.on_messages and snapshot['messages']:
+                self.on_messages(snapshot['messages'])
+        except Exception as e:
+            registry.inc('errors_total', source='shard_snapshot')
+            logging.error(f"Shard {shard} anlık görüntüsü işlenemedi: {e}")
+
+    def _monitor(self):
+        while self.running:
+            time.sleep(SHARD_HEALTH_INTERVAL)
+            for shard in range(self.shards):
+                if self.running:
+                    self.check(shard)
+
+    def check(self, shard):
+        # Süreç ölmüşse ya da kalp atışı kesildiyse shard geri çekilmeli olarak yeniden başlatılır
+        now = time.monotonic()
+        with self.lock:
+            process = self.processes.get(shard)
+            last = self.last_seen.get(shard, self.started_at.get(shard, now))
+            next_start = self.next_start.get(shard)
+        if process is not None and process.is_alive():
+            if now - last <= SHARD_HEARTBEAT_TIMEOUT:
+                return True
+            logging.error(f"Shard {shard} {now - last:.0f} sn'dir yanıt vermiyor, sonlandırılıyor")
+            process.kill()
+            process.join(5)
+        if process is not None:
+            # İlk tespit: süreç bırakılır, bir sonraki başlatma zamanı belirlenir
+            logging.error(f"Shard {shard} durdu (çıkış kodu {process.exitcode}): {', '.join(self.assignments[shard])}")
+            registry.inc('errors_total', source='shard')
+            with self.lock:
+                self.processes[shard] = None
+                delay = min(SHARD_RESTART_MAX, SHARD_RESTART_BASE * 2 ** self.failures[shard])
+                self.failures[shard] += 1
+                self.next_start[shard] = now + delay
+            self.view.mark_down(self.assignments[shard], f"shard {shard} yeniden başlatılıyor ({delay:.0f} sn)")
+            return False
+        if next_start is not None and now >= next_start:
+            with self.lock:
+                self.restarts[shard] += 1
+                self.next_start.pop(shard, None)
+            logging.info(f"Shard {shard} yeniden başlatılıyor (toplam {self.restarts[shard]})")
+            self._start_shard(shard)
+        return False
+
+    def status(self):
+        now = time.monotonic()
+        with self.lock:
+            return {shard: {
+                'symbols': self.assignments[shard],
+                'alive': self.processes.get(shard) is not None and self.processes[shard].is_alive(),
+                'pid': self.processes[shard].pid if self.processes.get(shard) is not None else None,
+                'snapshot_age': now - self.last_seen[shard] if shard in self.last_seen else None,
+                'restarts': self.restarts[shard],
+                **self.dispatch.get(shard, {}),
+            } for shard in range(self.shards)}
+
+    def collect_metrics(self):
+        for shard, status in self.status().items():
+            labels = {'shard': shard}
+            yield 'shard_up', labels, int(status['alive'])
+            yield 'shard_restarts', labels, status['restarts']
+            if status['snapshot_age'] is not None:
+                yield 'shard_snapshot_age_seconds', labels, status['snapshot_age']
+            if 'processed' in status:
+                yield 'shard_processed_messages', labels, status['processed']
+
+    def stop(self, timeout=10):
+        self.running = False
+        registry.remove_collector(self.collect_metrics)
+        for shard in range(self.shards):
+            registry.remove_remote(('shard', shard))
+        with self.lock:
+            processes = {shard: process for shard, process in self.processes.items() if process is not None}
+            for shard in processes:
+                self.stop_events[shard].set()
+        for process in processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        for thread in self.threads:
+            thread.join()
+        with self.lock:
+            for conn in self.conns:
+                conn.close()
+            self.conns = {}
+        self.data_manager.close()
\ No newline at end of file
@@ -0,0 +1,58 @@
+# sweep_table.py
+import numpy as np
+from indicators import NEUTRAL
+
+class SweepTable:
+    # Sembol/bot ve yön başına bekleyen sweep'ler; satırlar eklenme sırasında, sütunlar tek bir yapılandırılmış dizide
+    DTYPE = np.dtype([
+        ('pivot_time', '<i8'), ('pivot_price', '<f8'), ('sweep_extreme', '<f8'),
+        ('sweep_idx', '<i8'), ('manip_low', '<f8'), ('manip_high', '<f8'),
+        ('second_worst', '<f8'),  # İkinci koşul penceresinde sweep barından bu yana görülen en kötü kapanış
+    ])
+    FIELDS = DTYPE.names[:6]  # Journal/anlık görüntüye giden sweep tuple'ı
+
+    def __init__(self, worst='max', capacity=16):
+        # worst: long sweep'lerde kapanışların en büyüğü ('max'), short'ta en küçüğü ('min') izlenir
+        self.worst = worst
+        self.rows = np.zeros(capacity, dtype=self.DTYPE)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # Journal ve shard anlık görüntüleri için eski 6'lı tuple biçimi
+        return iter(self.rows[:self.count][list(self.FIELDS)].tolist())
+
+    def row(self, n):
+        return self.rows[n].item()[:len(self.FIELDS)]
+
+    def column(self, name):
+        return self.rows[name][:self.count]
+
+    def append(self, sweep, second_worst=None):
+        # second_worst: geri yüklenen sweep için o ana kadar görülen en kötü kapanış
+        if self.count == len(self.rows):
+            grown = np.zeros(2 * len(self.rows), dtype=self.DTYPE)
+            grown[:self.count] = self.rows
+            self.rows = grown
+        self.rows[self.count] = tuple(sweep) + (NEUTRAL[self.worst] if second_worst is None else second_worst,)
+        self.count += 1
+
+    def extend_manip(self, mask, low, high):
+        # Maske altındaki sweep'lerin manipülasyon aralığı mevcut barı kapsayacak şekilde genişletilir
+        rows = self.rows[:self.count]
+        rows['manip_low'][mask] = np.minimum(rows['manip_low'][mask], low)
+        rows['manip_high'][mask] = np.maximum(rows['manip_high'][mask], high)
+
+    def track_worst(self, mask, close):
+        # Sweep barından itibaren ikinci koşul penceresine giren kapanış, sweep başına tek karşılaştırma ile eklenir
+        worst = self.rows['second_worst'][:self.count]
+        reduce = np.maximum if self.worst == 'max' else np.minimum
+        worst[mask] = reduce(worst[mask], close)
+
+    def remove(self, mask):
+        # Sıra korunarak maskelenen satırlar atılır
+        keep = self.rows[:self.count][~mask]
+        self.rows[:len(keep)] = keep
+        self.count = len(keep)
\ No newline at end of file
@@ -0,0 +1,44 @@
+# tests/test_backtest_parity.py
+import logging
+import numpy as np
+import pandas as pd
+import pytest
+from config import CONFIGS
+from backtest import parity_check
+
+def synthetic_klines(bars, seed, vol=0.004):
+    # Log-normal yürüyüş; sweep ve giriş üretecek kadar oynak
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, vol, bars)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, vol / 4, bars))
+    return pd.DataFrame({
+        'open_time': 1_600_000_000_000 + 900_000 * np.arange(bars),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.random(bars) * vol),
+        'low': np.minimum(open_, close) * (1 - rng.random(bars) * vol),
+        'close': close,
+    })
+
+@pytest.fixture(autouse=True)
+def quiet_trade_log():
+    # Motor işlem kayıtlarını trades.log'a yazar; test işlemleri gerçek loga karışmasın
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_backtest_matches_run_strategy(seed):
+    results = parity_check(synthetic_klines(2000, seed))
+    assert set(results) == set(CONFIGS)
+    for name, result in results.items():
+        assert result['match'], (name, result['first_mismatch'])
+    assert sum(result['live'] for result in results.values()) > 0
+
+def test_higher_timeframe_configs_match(monkeypatch):
+    # Üst zaman dilimli botlar: sinyaller toplanmış barlarda, SL/TP taban barlarında
+    monkeypatch.setitem(CONFIGS['mid'], 'TIMEFRAME', '1h')
+    monkeypatch.setitem(CONFIGS['agresif'], 'TIMEFRAME', '4h')
+    results = parity_check(synthetic_klines(4000, 0), history=1000)
+    for name, result in results.items():
+        assert result['match'], (name, result['first_mismatch'])
+    assert all(result['live'] > 0 for result in results.values())
\ No newline at end of file
@@ -0,0 +1,27 @@
+# tests/test_journal.py
+import pandas as pd
+from journal import TradeJournal
+
+def _default_state():
+    # Journal varsayılan durumu yerinde değiştirir; her açılışta yeni kopya
+    return {"positions": [], "trades": [], "balance": 1000.0, "used_pivots": [], "sweeps_pl": [], "sweeps_ph": [], "stats": {}}
+
+def _position(pivot_price):
+    return {'type': 'long', 'entry_time': pd.Timestamp('2024-01-01 00:15'), 'entry_price': 101.0, 'sl': 99.0, 'tp': 105.0,
+            'pivot_price': pivot_price}
+
+def test_closing_one_of_same_bar_positions_survives_replay(tmp_path):
+    # process_sweeps aynı barda farklı pivotlardan aynı yönde birden çok pozisyon açabilir
+    path = str(tmp_path / 'data_safe_BTCUSDT.json')
+    journal = TradeJournal(path, _default_state())
+    journal.record("position_opened", position=_position(100.0))
+    journal.record("position_opened", position=_position(100.5))
+    closed = _position(100.0) | {'exit_time': pd.Timestamp('2024-01-01 01:00'), 'exit_price': 105.0, 'profit': 20.0}
+    journal.record("trade_closed", trade=closed, balance=1020.0, stats={})
+    journal.close()
+    replayed = TradeJournal(path, _default_state())
+    try:
+        assert [p['pivot_price'] for p in replayed.state["positions"]] == [100.5]
+        assert replayed.state["balance"] == 1020.0
+    finally:
+        replayed.close()
\ No newline at end of file
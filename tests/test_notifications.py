@@ -0,0 +1,99 @@
+# tests/test_notifications.py
+import pytest
+import notifications
+from notifications import Notifier, LocalWebhookServer
+
+@pytest.fixture
+def server():
+    server = LocalWebhookServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture(autouse=True)
+def fast_batches(monkeypatch):
+    monkeypatch.setattr(notifications, 'NOTIFY_BATCH_INTERVAL', 0.05)
+
+def test_burst_is_sent_as_one_batch(server):
+    notifier = Notifier(server.url)
+    for n in range(20):
+        notifier.send_message(f"mesaj {n}")
+    assert notifier.flush()
+    assert server.requests == 1
+    assert server.received[0].split("\n") == [f"mesaj {n}" for n in range(20)]
+    assert notifier.stats()["sent"] == 20
+
+def test_batches_respect_discord_limit(server):
+    notifier = Notifier(server.url)
+    for n in range(5):
+        notifier.send_message(str(n) * 900)
+    assert notifier.flush()
+    assert len(server.received) == 3
+    assert all(len(content) <= notifications.DISCORD_MESSAGE_LIMIT for content in server.received)
+
+def test_rate_limited_post_is_retried_after_retry_after(server):
+    server.rate_limit_every = 2
+    notifier = Notifier(server.url)
+    notifier.send_message("ilk")
+    assert notifier.flush()
+    notifier.send_message("ikinci")
+    assert notifier.flush()
+    assert server.requests == 3
+    assert server.received == ["ilk", "ikinci"]
+    stats = notifier.stats()
+    assert (stats["sent"], stats["retries"], stats["failed"]) == (2, 1, 0)
+
+def test_overload_drops_oldest_and_reports_skipped(server, monkeypatch):
+    monkeypatch.setattr(notifications, 'NOTIFY_QUEUE_SIZE', 3)
+    monkeypatch.setattr(notifications, 'NOTIFY_BATCH_INTERVAL', 0.3)
+    notifier = Notifier(server.url)
+    for n in range(10):
+        notifier.send_message(f"mesaj {n}")
+    assert notifier.flush()
+    assert server.received == ["... 7 bildirim yoğunluk nedeniyle atlandı\nmesaj 7\nmesaj 8\nmesaj 9"]
+    assert notifier.stats()["dropped"] == 7
+
+class _Response:
+    def __init__(self, body, headers=None):
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+@pytest.mark.parametrize('body, headers, expected', [
+    ({"retry_after": 0.25}, {}, 0.25),
+    ([1, 2], {"Retry-After": "2"}, 2.0),
+    (ValueError("json değil"), {"Retry-After": "3"}, 3.0),
+    ("metin", {}, 1.0),
+    ({"message": "limit"}, {"Retry-After": "tarih"}, 1.0),
+])
+def test_retry_after_handles_any_body(body, headers, expected):
+    assert Notifier(None)._retry_after(_Response(body, headers)) == expected
+def test_post_error_does_not_kill_worker(server):
+    notifier = Notifier(server.url)
+    post = notifier._post
+    calls = []
+    def flaky(lines):
+        calls.append(lines)
+        if len(calls) == 1:
+            raise RuntimeError("beklenmeyen hata")
+        post(lines)
+    notifier._post = flaky
+    notifier.send_message("kaybolan")
+    assert notifier.flush()
+    notifier.send_message("sonraki")
+    assert notifier.flush()
+    assert server.received == ["sonraki"]
+    stats = notifier.stats()
+    assert (stats["sent"], stats["failed"]) == (1, 1)
+
+def test_bad_reset_after_header_is_tolerated(monkeypatch):
+    notifier = Notifier("http://127.0.0.1:1/webhook")
+    response = _Response(None, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "tarih"})
+    response.status_code = 204
+    monkeypatch.setattr(notifier.session, 'post', lambda *args, **kwargs: response)
+    monkeypatch.setattr(notifications.time, 'sleep', lambda seconds: None)
+    notifier._post(["mesaj"])
+    assert notifier.stats()["sent"] == 1
\ No newline at end of file
@@ -0,0 +1,32 @@
+# tests/test_plotter.py
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from candle_buffer import CandleBuffer
+from plotter import Plotter
+
+class _BrokenExecutor:
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("worker öldü")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+def test_broken_pool_is_counted_and_rebuilt():
+    candles = CandleBuffer(10, '15m')
+    for n in range(10):
+        candles.append(1_700_000_000_000 + n * 900_000, 100.0, 101.0, 99.0, 100.5)
+    t = pd.Timestamp(1_700_000_000_000 + 5 * 900_000, unit='ms')
+    trade = {'type': 'long', 'entry_time': t, 'sweep_time': t, 'entry_price': 100.0, 'sl': 99.0, 'tp': 102.0, 'pivot_price': 99.5}
+    plotter = Plotter(workers=1)
+    broken = plotter.executor = _BrokenExecutor()
+    try:
+        assert plotter.save_trade_graph('BTCUSDT', 'safe', trade, candles, is_opening=True) is None
+        assert broken.shut_down
+        assert plotter.executor is not None and plotter.executor is not broken
+        assert plotter.counters["failed"] == 1
+        assert plotter.pending == 0
+    finally:
+        plotter.stop()
\ No newline at end of file
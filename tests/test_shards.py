@@ -0,0 +1,33 @@
+# tests/test_shards.py
+import sqlite3
+import pandas as pd
+from config import CONFIGS
+from data_manager import DataManager
+from engine import TradingEngine
+from fake_exchange import FakeClient, FakeSocketManager, NullNotifier, NullPlotter
+from shards import ShardedDataManager, engine_snapshot
+
+SYMBOL = 'BTCUSDT'
+
+def test_worker_trades_are_written_by_the_supervisor(tmp_path):
+    # Worker işlemleri trades.db'ye yazmaz; anlık görüntüyle gelir, veritabanına tek yazıcı supervisor'dur
+    data_dir = str(tmp_path)
+    worker = DataManager(None, None, client=FakeClient(), symbols=[SYMBOL], data_dir=data_dir, forward_trades=True)
+    engine = TradingEngine(None, None, worker, NullNotifier(), NullPlotter(), twm=FakeSocketManager(), symbols=[SYMBOL],
+                           kline_cache_dir=str(tmp_path / 'klines'))
+    supervisor = ShardedDataManager([SYMBOL], data_dir=data_dir)
+    try:
+        trade = {'type': 'long', 'entry_time': pd.Timestamp('2024-01-01 00:15'), 'exit_time': pd.Timestamp('2024-01-01 02:00'),
+                 'entry_price': 101.0, 'exit_price': 105.0, 'sl': 99.0, 'tp': 105.0, 'pivot_price': 100.0, 'profit': 20.0}
+        worker.close_position(SYMBOL, 'safe', trade, engine)
+        worker.trade_store.flush()
+        with sqlite3.connect(str(tmp_path / 'trades.db')) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == 0
+        supervisor.apply_snapshot(engine_snapshot(0, engine))
+        assert supervisor.get_trade_count(SYMBOL, 'safe') == 1
+        assert len(supervisor.aggregates[SYMBOL]['safe']) == 1
+        assert supervisor.balances[SYMBOL]['safe'] == CONFIGS['safe']['INITIAL_BALANCE'] + 20.0
+        assert engine_snapshot(0, engine)['trades'] == []
+    finally:
+        engine.stop()
+        supervisor.close()
\ No newline at end of file
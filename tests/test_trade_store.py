@@ -0,0 +1,30 @@
+# tests/test_trade_store.py
+import sqlite3
+import pytest
+from trade_store import TradeStore
+
+def _trade(n):
+    return {'type': 'long', 'entry_time': f'2024-01-01 00:{n:02d}:00', 'exit_time': f'2024-01-01 01:{n:02d}:00',
+            'pivot_price': 100.0 + n, 'profit': 10.0}
+
+def test_locked_flush_keeps_rows_and_recovers(tmp_path):
+    path = str(tmp_path / 'trades.db')
+    store = TradeStore(path, batch_interval=60)  # Arka plan yazıcısı test süresince uyur
+    store.conn.execute("PRAGMA busy_timeout = 50")
+    other = sqlite3.connect(path, isolation_level=None)
+    try:
+        # Başka bir süreç (ör. shard) yazma kilidini tutuyor
+        other.execute("BEGIN IMMEDIATE")
+        store.add('BTCUSDT', 'safe', _trade(1))
+        with pytest.raises(sqlite3.OperationalError):
+            store.flush()
+        assert len(store.pending) == 1
+        assert not store.conn.in_transaction
+        other.execute("ROLLBACK")
+        store.add('BTCUSDT', 'safe', _trade(2))
+        store.flush()
+        assert store.pending == []
+        assert store.count('BTCUSDT', 'safe') == 2
+    finally:
+        other.close()
+        store.close()
\ No newline at end of file
@@ -0,0 +1,52 @@
+# trade_stats.py
+from bisect import bisect_left
+import pandas as pd
+
+class TradeAggregates:
+    def __init__(self):
+        # İşlem başına birikimli diziler; yalnızca sona ekleme yapılır
+        self.times = []
+        self.equity = []
+        self.cum_tp = []
+        self.cum_sl = []
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+
+    def add(self, exit_time, profit):
+        exit_time = pd.Timestamp(exit_time)
+        is_tp = profit > 0
+        is_sl = profit < 0
+        equity = (self.equity[-1] if self.equity else 0.0) + profit
+        self.times.append(exit_time.value // 1000)  # mikrosaniye
+        self.equity.append(equity)
+        self.cum_tp.append((self.cum_tp[-1] if self.cum_tp else 0) + is_tp)
+        self.cum_sl.append((self.cum_sl[-1] if self.cum_sl else 0) + is_sl)
+        self.peak = max(self.peak, equity)
+        self.max_drawdown = max(self.max_drawdown, self.peak - equity)
+
+    def _start_index(self, start):
+        if start is None:
+            return 0
+        return bisect_left(self.times, pd.Timestamp(start).value // 1000)
+
+    def window(self, start=None):
+        # (işlem, tp, sl, kâr) — start sonrası kapanan işlemler, birikimli farklardan; kayan 1ay/3ay/6ay
+        # pencereleri gün sınırına denk gelmediği için gün/ay kovaları yerine işlem zamanında ikili arama yapılır
+        i = self._start_index(start)
+        n = len(self.times)
+        if i >= n:
+            return 0, 0, 0, 0.0
+        before = (self.cum_tp[i - 1], self.cum_sl[i - 1], self.equity[i - 1]) if i else (0, 0, 0.0)
+        return n - i, self.cum_tp[-1] - before[0], self.cum_sl[-1] - before[1], self.equity[-1] - before[2]
+
+    def curve(self, start=None):
+        # Dönem başından itibaren birikimli kâr/zarar eğrisi
+        i = self._start_index(start)
+        base = self.equity[i - 1] if i else 0.0
+        return pd.DataFrame({
+            'exit_time': pd.to_datetime(self.times[i:], unit='us'),
+            'equity': [value - base for value in self.equity[i:]],
+        })
+
+    def __len__(self):
+        return len(self.times)
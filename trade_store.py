@@ -0,0 +1,156 @@
+# trade_store.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+def _time_key(value):
+    # Sözlük sırası zaman sırasıyla aynı olsun diye sabit biçim
+    return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+class TradeStore:
+    def __init__(self, path, batch_interval=0.2, forward=False):
+        self.path = path
+        # forward: satırlar bu süreçte yazılmaz, take() ile tek yazıcıya (shard supervisor) aktarılır; aynı dosyaya
+        # yazan süreçler birbirinin yazma kilidine takılmaz
+        self.forward = forward
+        self.batch_interval = batch_interval
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS trades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                config TEXT NOT NULL,
+                type TEXT NOT NULL,
+                entry_time TEXT NOT NULL,
+                exit_time TEXT NOT NULL,
+                pivot_price REAL,
+                profit REAL NOT NULL,
+                data TEXT NOT NULL,
+                UNIQUE (symbol, config, type, entry_time, pivot_price)
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_symbol_config_exit ON trades (symbol, config, exit_time)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)")
+        self.pending = []
+        self.wakeup = threading.Event()
+        self.running = True
+        self.thread = None
+        if not forward:
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _row(self, symbol, config_name, trade):
+        return (symbol, config_name, trade['type'], _time_key(trade['entry_time']), _time_key(trade['exit_time']),
+                trade.get('pivot_price'), float(trade['profit']), json.dumps(trade, default=str))
+
+    def add(self, symbol, config_name, trade):
+        with self.lock:
+            self.pending.append(self._row(symbol, config_name, trade))
+        self.wakeup.set()
+
+    def add_many(self, symbol, config_name, trades):
+        with self.lock:
+            self.pending.extend(self._row(symbol, config_name, trade) for trade in trades)
+        self.wakeup.set()
+
+    def add_rows(self, rows):
+        # Başka süreçte _row() ile hazırlanmış satırlar (take() çıktısı)
+        with self.lock:
+            self.pending.extend(tuple(row) for row in rows)
+        self.wakeup.set()
+
+    def take(self):
+        # forward modunda yazılmayı bekleyen satırlar; alınan satırların yazılması çağıranın sorumluluğundadır
+        with self.lock:
+            rows = self.pending
+            self.pending = []
+        return rows
+
+    def _write(self, rows, migration=None):
+        # Aynı işlem iki kez gelirse (ör. journal tekrar oynatma) yok sayılır
+        # Hata olursa (ör. başka süreç yazma kilidini tutuyor) transaction geri alınır; bağlantı sonraki yazmaya hazır kalır
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO trades (symbol, config, type, entry_time, exit_time, pivot_price, profit, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            if migration is not None:
+                self.conn.execute("INSERT INTO migrations (name) VALUES (?)", (migration,))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+
+    def flush(self):
+        with self.lock:
+            if self.forward or not self.pending:
+                return
+            # Satırlar yalnızca COMMIT başarılı olursa kuyruktan çıkar; başarısız yazma sonraki flush'ta tekrarlanır
+            self._write(self.pending)
+            self.pending = []
+
+    def _run(self):
+        # Yazmalar toplu işlem halinde, tek transaction içinde yapılır
+        while self.running:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            if not self.running:
+                break
+            time.sleep(self.batch_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"İşlem veritabanı yazma hatası: {e}")
+                self.wakeup.set()  # Bekleyen satırlar bir sonraki turda tekrar denenir
+
+    def migrate(self, name, symbol, config_name, trades):
+        # Tek seferlik JSON aktarımı; işaretleme ile aynı transaction içinde
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+                return False
+            self._write([self._row(symbol, config_name, trade) for trade in trades], migration=name)
+            return True
+
+    def _query(self, sql, params):
+        self.flush()
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def count(self, symbol, config_name):
+        return self._query("SELECT COUNT(*) FROM trades WHERE symbol = ? AND config = ?", (symbol, config_name))[0][0]
+
+    def profits(self, symbol, config_name, start=None):
+        start_key = _time_key(start) if start is not None else ''
+        return self._query(
+            "SELECT exit_time, profit FROM trades WHERE symbol = ? AND config = ? AND exit_time >= ? ORDER BY exit_time, id",
+            (symbol, config_name, start_key),
+        )
+
+    def last(self, symbol, config_name, count):
+        rows = self._query(
+            "SELECT data FROM trades WHERE symbol = ? AND config = ? ORDER BY id DESC LIMIT ?",
+            (symbol, config_name, count),
+        )
+        return [json.loads(data) for (data,) in reversed(rows)]
+
+    def get(self, symbol, config_name, index):
+        rows = self._query(
+            "SELECT data FROM trades WHERE symbol = ? AND config = ? ORDER BY id LIMIT 1 OFFSET ?",
+            (symbol, config_name, index),
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        self.flush()
+        with self.lock:
+            self.conn.close()
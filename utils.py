@@ -1,36 +1,79 @@
 # utils.py
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import requests
 import json
+import os
 from datetime import datetime
 
+def _rolling_max(series, window):
+    # out[k] = max(series[k:k + window]); boş pencere (None) hiçbir şeyi engellemez
+    if window == 0:
+        return None
+    if window > len(series):
+        return np.empty(0)
+    return sliding_window_view(series, window).max(axis=1)
+
+def _rolling_min(series, window):
+    if window == 0:
+        return None
+    if window > len(series):
+        return np.empty(0)
+    return sliding_window_view(series, window).min(axis=1)
+
+def _pivot_mask(series, left, right, left_ext, right_ext, compare):
+    n = len(series)
+    if n - right <= left:
+        return np.zeros(0, dtype=bool)
+    center = series[left:n - right]
+    # i için sol pencere series[i - left:i] -> left_ext[i - left], sağ pencere series[i + 1:i + right + 1] -> right_ext[i + 1]
+    mask = np.ones(len(center), dtype=bool)
+    if left_ext is not None:
+        mask &= compare(center, left_ext[:n - right - left])
+    if right_ext is not None:
+        mask &= compare(center, right_ext[left + 1:n - right + 1])
+    return mask
+
+def _to_pivots(series, left, mask):
+    idx = np.flatnonzero(mask) + left
+    return [(int(i), float(series[i])) for i in idx]
+
 def pivot_high(series, left, right):
-    series = np.array(series)
-    pivots = []
-    for i in range(left, len(series) - right):
-        left_slice = series[i - left:i]
-        right_slice = series[i + 1:i + right + 1]
-        if np.all(series[i] > left_slice) and np.all(series[i] > right_slice):
-            pivots.append((i, float(series[i])))
-    return pivots
+    series = np.asarray(series, dtype='float64')
+    mask = _pivot_mask(series, left, right, _rolling_max(series, left), _rolling_max(series, right), np.greater)
+    return _to_pivots(series, left, mask)
 
 def pivot_low(series, left, right):
-    series = np.array(series)
-    pivots = []
-    for i in range(left, len(series) - right):
-        left_slice = series[i - left:i]
-        right_slice = series[i + 1:i + right + 1]
-        if np.all(series[i] < left_slice) and np.all(series[i] < right_slice):
-            pivots.append((i, float(series[i])))
-    return pivots
+    series = np.asarray(series, dtype='float64')
+    mask = _pivot_mask(series, left, right, _rolling_min(series, left), _rolling_min(series, right), np.less)
+    return _to_pivots(series, left, mask)
+
+def pivots_batch(high, low, pairs):
+    # Birden çok (LEFT, RIGHT) çifti için tek geçiş: her farklı pencere boyu bir kez hesaplanır
+    high = np.asarray(high, dtype='float64')
+    low = np.asarray(low, dtype='float64')
+    windows = {w for pair in pairs for w in pair}
+    high_max = {w: _rolling_max(high, w) for w in windows}
+    low_min = {w: _rolling_min(low, w) for w in windows}
+    result = {}
+    for left, right in pairs:
+        ph_mask = _pivot_mask(high, left, right, high_max[left], high_max[right], np.greater)
+        pl_mask = _pivot_mask(low, left, right, low_min[left], low_min[right], np.less)
+        result[(left, right)] = (_to_pivots(high, left, ph_mask), _to_pivots(low, left, pl_mask))
+    return result
 
 def send_discord_message(webhook_url, message):
     payload = {"content": message}
     requests.post(webhook_url, json=payload)
 
 def save_data(filename, data):
-    with open(filename, 'w') as f:
+    # Yarım yazılmış dosya bırakmamak için önce geçici dosyaya yazılıp yerine taşınır
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, 'w') as f:
         json.dump(data, f, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
 
 def load_data(filename, default_data):
     try:
@@ -0,0 +1,166 @@
+# warmup.py
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from settings import WEIGHT_LIMIT_PER_MINUTE, WARMUP_WORKERS, WARMUP_RETRY_BASE, WARMUP_RETRY_MAX
+from metrics import registry
+
+STATE_LABELS = {'pending': "bekliyor", 'loading': "yükleniyor", 'retrying': "tekrar denenecek", 'ready': "hazır"}
+
+class WeightBudget:
+    # Binance istek ağırlığı: son 60 sn içinde harcanan ağırlık limiti aşmayacak şekilde bekletir
+    def __init__(self, limit=WEIGHT_LIMIT_PER_MINUTE, window=60.0):
+        self.limit = limit
+        self.window = window
+        self.events = deque()  # (zaman, ağırlık)
+        self.spent = 0
+        self.paused_until = 0.0
+        self.cond = threading.Condition()
+
+    def _expire(self, now):
+        while self.events and self.events[0][0] <= now - self.window:
+            self.spent -= self.events.popleft()[1]
+
+    def used(self):
+        with self.cond:
+            self._expire(time.monotonic())
+            return self.spent
+
+    def acquire(self, weight):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                if wait <= 0:
+                    self._expire(now)
+                    if self.spent + weight <= self.limit or not self.events:
+                        self.events.append((now, weight))
+                        self.spent += weight
+                        return
+                    wait = self.events[0][0] + self.window - now
+                self.cond.wait(wait)
+
+    def observe(self, client):
+        # Sunucunun bildirdiği kullanılan ağırlık yereldeki sayımdan fazlaysa fark da harcanmış sayılır
+        headers = getattr(getattr(client, 'response', None), 'headers', None) or {}
+        used = headers.get('x-mbx-used-weight-1m')
+        if used is None:
+            return
+        with self.cond:
+            now = time.monotonic()
+            self._expire(now)
+            extra = int(used) - self.spent
+            if extra > 0:
+                self.events.append((now, extra))
+                self.spent += extra
+
+    def pause(self, seconds):
+        with self.cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.cond.notify_all()
+
+def _retry_after(error):
+    # 429/418 veya -1003: Binance'in istediği bekleme süresi (yoksa None)
+    status = getattr(error, 'status_code', None)
+    if status not in (418, 429) and getattr(error, 'code', None) != -1003:
+        return None
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    return float(headers.get('Retry-After', WARMUP_RETRY_MAX))
+
+class Warmup:
+    # Semboller sınırlı bir havuzda eşzamanlı yüklenir; hata alan sembol diğerlerini bekletmeden kendi başına tekrar dener
+    def __init__(self, load, symbols, budget, workers=WARMUP_WORKERS, on_ready=None):
+        self.load = load
+        self.symbols = list(symbols)
+        self.budget = budget
+        self.workers = workers
+        self.on_ready = on_ready
+        self.status = {symbol: {'state': 'pending', 'attempts': 0, 'error': None, 'seconds': None} for symbol in self.symbols}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.executor = None
+        self.timers = {}
+        self.running = False
+        self.started = None
+
+    def start(self):
+        self.running = True
+        self.started = time.monotonic()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='warmup')
+        for symbol in self.symbols:
+            self.executor.submit(self._run, symbol)
+
+    def _run(self, symbol):
+        if not self.running:
+            return
+        with self.lock:
+            status = self.status[symbol]
+            status['state'] = 'loading'
+            status['attempts'] += 1
+            attempt = status['attempts']
+        try:
+            self.load(symbol)
+        except Exception as e:
+            delay = _retry_after(e)
+            if delay is not None:
+                self.budget.pause(delay)  # Limit aşıldı: tüm semboller için istekler durdurulur
+            else:
+                delay = min(WARMUP_RETRY_MAX, WARMUP_RETRY_BASE * 2 ** (attempt - 1)) * (0.5 + random.random() / 2)
+            registry.inc('errors_total', source='warmup')
+            with self.lock:
+                status.update(state='retrying', error=str(e))
+            logging.error(f"Geçmiş veri yükleme hatası [{symbol}] (deneme {attempt}, {delay:.1f} sn sonra tekrar): {e}")
+            self._schedule(symbol, delay)
+            return
+        with self.lock:
+            status.update(state='ready', error=None, seconds=time.monotonic() - self.started)
+            if all(s['state'] == 'ready' for s in self.status.values()):
+                self.done.set()
+        logging.info(f"[{symbol}] hazır ({status['seconds']:.1f} sn, {attempt} deneme)")
+        if self.on_ready:
+            self.on_ready(symbol)
+
+    def _schedule(self, symbol, delay):
+        timer = threading.Timer(delay, self._resubmit, args=(symbol,))
+        timer.daemon = True
+        with self.lock:
+            self.timers[symbol] = timer
+        timer.start()
+
+    def _resubmit(self, symbol):
+        if self.running:
+            self.executor.submit(self._run, symbol)
+
+    def ready(self):
+        with self.lock:
+            return [symbol for symbol, status in self.status.items() if status['state'] == 'ready']
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def describe(self, symbol):
+        with self.lock:
+            status = dict(self.status[symbol])
+        text = STATE_LABELS[status['state']]
+        if status['state'] == 'ready':
+            return f"{text} ({status['seconds']:.1f} sn)"
+        if status['attempts']:
+            text += f" (deneme {status['attempts']})"
+        if status['error']:
+            text += f": {status['error']}"
+        return text
+
+    def report(self):
+        return "\n".join(f"{symbol}: {self.describe(symbol)}" for symbol in self.symbols)
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            timers = list(self.timers.values())
+        for timer in timers:
+            timer.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
\ No newline at end of file